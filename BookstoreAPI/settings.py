@@ -43,6 +43,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'books.middleware.instrumentation_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -124,3 +125,86 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Books app
+
+# Where the paginated listings read total_records from:
+# 'maintained' (row counters kept by signals), 'estimated' (SQLite ANALYZE
+# statistics) or 'exact' (COUNT(*) on every request)
+BOOKS_ROW_COUNT_MODE = 'maintained'
+
+# Rows fetched and encoded per chunk by the streaming list responses
+BOOKS_STREAM_CHUNK_SIZE = 2000
+
+# Rows written per transaction by the bulk endpoints, and the most items a
+# single bulk request may carry
+BOOKS_BULK_BATCH_SIZE = 500
+BOOKS_BULK_MAX_ITEMS = 10000
+
+# Writes of more than INLINE_MAX_ROWS rows (author deletes with their books,
+# bulk requests) run as background jobs on WORKERS threads (books/jobs.py);
+# WORKERS 0 runs them in the request. Jobs sleep PAUSE seconds between
+# chunks so that other writers get the lock
+BOOKS_JOBS = {
+    'WORKERS': 2,
+    'INLINE_MAX_ROWS': 1000,
+    'PAUSE': 0.1,
+}
+
+# Change log behind /api/changes/ (books/changes.py); compact_changes drops
+# the delete tombstones older than TOMBSTONE_DAYS
+BOOKS_CHANGES = {
+    'TOMBSTONE_DAYS': 30,
+}
+
+# Read-through cache of the author/book detail payloads (books/cache.py).
+# Use 'books.cache.DjangoCache' with {'ALIAS': ..., 'TIMEOUT': ...} to share
+# it between processes, or 'books.cache.DummyCache' to turn it off
+BOOKS_DETAIL_CACHE = {
+    'BACKEND': 'books.cache.LocMemLRUCache',
+    'OPTIONS': {
+        'MAX_ENTRIES': 10000,
+        'TIMEOUT': 300,
+    },
+}
+
+# Per-process LRU of the encoded JSON of list rows (books/fragments.py),
+# checked against each row's updated_at; MAX_ENTRIES 0 turns it off
+BOOKS_FRAGMENT_CACHE = {
+    'MAX_ENTRIES': 100000,
+}
+
+# PRAGMA name -> value, run on every new SQLite connection
+# (settings_production.py turns on WAL and friends)
+BOOKS_SQLITE_PRAGMAS = {}
+
+# DATABASES alias that books.routers.ReadReplicaRouter sends the reads of
+# GET/HEAD requests to, when that router is installed
+BOOKS_READ_REPLICA = None
+
+# Per-request timing, query counts and the /metrics histograms
+# (books/metrics.py). SLOW_SAMPLE_RATE of the requests record their SQL and
+# are logged to 'books.slow_requests' when slower than SLOW_REQUEST_MS
+BOOKS_METRICS = {
+    'ENABLED': True,
+    'SLOW_REQUEST_MS': 500,
+    'SLOW_SAMPLE_RATE': 0.1,
+    'SLOW_LOG_SIZE': 50,
+    # /api/metrics/slow/ for everyone (None: in DEBUG), else staff only
+    'EXPOSE_SLOW_REQUESTS': None,
+}
+
+# OpenAPI spec of /swagger/ and /redoc/ (books/openapi.py): built once per code
+# VERSION (default: a hash of the source files), kept in memory and in DIR
+# when set (also written there by the generate_schema command), and sent
+# with Cache-Control max-age MAX_AGE
+BOOKS_SCHEMA = {
+    'DIR': None,
+    'MAX_AGE': 3600,
+    'VERSION': None,
+}
+
+# Serve /swagger/ and /redoc/. When off, drf_yasg is never imported
+# (books/docs.py); settings_api.py turns it off unless BOOKS_API_DOCS=1
+BOOKS_API_DOCS = True
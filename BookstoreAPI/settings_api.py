@@ -0,0 +1,58 @@
+"""
+API-only profile: settings_production.py without what the JSON API does not use.
+
+Select it with DJANGO_SETTINGS_MODULE=BookstoreAPI.settings_api. Compared to
+the production profile it:
+
+- drops the admin, auth, contenttypes, sessions and messages apps and the
+  session, CSRF, auth, messages and clickjacking middleware: the API has no
+  login, no cookies and no HTML pages
+- renders and parses JSON only (the listings still stream NDJSON), with no
+  DRF authentication; form and multipart request bodies get a 415
+- leaves out /swagger/, /redoc/ and the drf_yasg stack, unless the
+  BOOKS_API_DOCS environment variable is 1
+
+Same environment variables as settings_production.py otherwise. Compare the
+profiles with ``python manage.py bench_settings``.
+"""
+
+import os
+
+from BookstoreAPI.settings_production import *  # noqa: F401,F403
+from BookstoreAPI.settings_production import TEMPLATES
+
+BOOKS_API_DOCS = os.environ.get('BOOKS_API_DOCS') == '1'
+
+INSTALLED_APPS = [
+    'rest_framework',
+    'books',
+]
+
+MIDDLEWARE = [
+    'books.middleware.instrumentation_middleware',
+    'books.middleware.read_replica_middleware',
+    'django.middleware.security.SecurityMiddleware',
+    'django.middleware.common.CommonMiddleware',
+]
+
+AUTH_PASSWORD_VALIDATORS = []
+
+if BOOKS_API_DOCS:
+    # The Swagger / ReDoc pages are templates with static assets
+    INSTALLED_APPS += ['django.contrib.staticfiles', 'drf_yasg']
+    TEMPLATES = [{
+        **TEMPLATES[0],
+        'OPTIONS': {'context_processors': ['django.template.context_processors.request']},
+    }]
+else:
+    # The error pages fall back to plain text without a template engine
+    TEMPLATES = []
+
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': ['rest_framework.renderers.JSONRenderer'],
+    'DEFAULT_PARSER_CLASSES': ['rest_framework.parsers.JSONParser'],
+    'DEFAULT_AUTHENTICATION_CLASSES': [],
+    'DEFAULT_PERMISSION_CLASSES': ['rest_framework.permissions.AllowAny'],
+    # request.user stays None instead of importing django.contrib.auth
+    'UNAUTHENTICATED_USER': None,
+}
@@ -0,0 +1,68 @@
+"""
+Production profile of the BookstoreAPI settings.
+
+Select it with DJANGO_SETTINGS_MODULE=BookstoreAPI.settings_production;
+anything not set here comes from settings.py. Environment variables:
+
+- DJANGO_SECRET_KEY, DJANGO_ALLOWED_HOSTS (comma separated)
+- BOOKS_DB_NAME: primary SQLite file (default db.sqlite3)
+- BOOKS_REPLICA_DB_NAME: read replica SQLite file; when set, GET/HEAD
+  requests read from it. A plain file copy of the primary will do, kept
+  fresh with ``python manage.py sync_replica --interval 5``.
+- BOOKS_SCHEMA_DIR: where the OpenAPI spec is kept (default var/schema),
+  filled on deploy by ``python manage.py generate_schema``.
+"""
+
+import os
+
+from BookstoreAPI.settings import *  # noqa: F401,F403
+from BookstoreAPI.settings import BASE_DIR, BOOKS_SCHEMA, MIDDLEWARE, SECRET_KEY
+
+DEBUG = False
+
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', SECRET_KEY)
+
+ALLOWED_HOSTS = os.environ.get('DJANGO_ALLOWED_HOSTS', 'localhost,127.0.0.1').split(',')
+
+
+# Database
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('BOOKS_DB_NAME', BASE_DIR / 'db.sqlite3'),
+        # Reuse connections across requests, checking them before reuse
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+    }
+}
+
+if os.environ.get('BOOKS_REPLICA_DB_NAME'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.environ['BOOKS_REPLICA_DB_NAME'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    BOOKS_READ_REPLICA = 'replica'
+
+DATABASE_ROUTERS = ['books.routers.ReadReplicaRouter']
+
+# First, so that everything a read-only request reads comes from the replica
+MIDDLEWARE = ['books.middleware.read_replica_middleware', *MIDDLEWARE]
+
+BOOKS_SQLITE_PRAGMAS = {
+    # Readers see the last commit instead of waiting for the writer
+    'journal_mode': 'WAL',
+    # With WAL, fsync at checkpoints only; a power loss can lose the last
+    # commits but never corrupts the database
+    'synchronous': 'NORMAL',
+    # 64 MB page cache per connection (negative values are KiB)
+    'cache_size': -64000,
+    # Read through a 256 MB memory map instead of read() calls
+    'mmap_size': 268435456,
+    # Wait up to 5 s for a competing writer before "database is locked"
+    'busy_timeout': 5000,
+}
+
+# Shared by the server processes, which then never build the spec themselves
+BOOKS_SCHEMA = {**BOOKS_SCHEMA, 'DIR': os.environ.get('BOOKS_SCHEMA_DIR', BASE_DIR / 'var' / 'schema')}
@@ -14,28 +14,44 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
+from django.apps import apps
 from django.urls import path, include
-from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
-
-schema_view = get_schema_view(
-   openapi.Info(
-      title="Bookstore API",
-      default_version='v1',
-      description="API documentation for Bookstore API",
-      terms_of_service="https://www.example.com/policies/terms/",
-      contact=openapi.Contact(email="contact@example.com"),
-      license=openapi.License(name="BSD License"),
-   ),
-   public=True,
-   permission_classes=(permissions.AllowAny,),
-)
+from books import docs
+from books.metrics import metrics_view
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
     path('api/', include('books.urls')),
-    path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
-    path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
-]
\ No newline at end of file
+    path('metrics', metrics_view, name='metrics'),
+]
+
+if apps.is_installed('django.contrib.admin'):
+    from django.contrib import admin
+
+    urlpatterns.append(path('admin/', admin.site.urls))
+
+# The docs stack is only imported when served (books/docs.py)
+if docs.enabled():
+    from rest_framework import permissions
+    from drf_yasg.views import get_schema_view
+    from drf_yasg import openapi
+    from books.openapi import cached_schema_view
+
+    api_info = openapi.Info(
+       title="Bookstore API",
+       default_version='v1',
+       description="API documentation for Bookstore API",
+       terms_of_service="https://www.example.com/policies/terms/",
+       contact=openapi.Contact(email="contact@example.com"),
+       license=openapi.License(name="BSD License"),
+    )
+
+    schema_view = cached_schema_view(get_schema_view(
+       api_info,
+       public=True,
+       permission_classes=(permissions.AllowAny,),
+    ), api_info)
+
+    urlpatterns += [
+        path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
+        path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
+    ]
@@ -0,0 +1,298 @@
+"""
+Async variants of the read endpoints, mounted under /api/async/.
+
+Under ASGI every DRF view of books/views.py is run in a worker thread
+through sync_to_async. These views are coroutines instead: they query with
+Django's async ORM (aget, acount, aaggregate, async iteration) and stream
+with async generators, and answer with the same payloads, validators and
+status codes as their synchronous counterparts. Writes stay on the
+synchronous endpoints.
+"""
+
+import json
+
+from django.http import Http404, HttpResponse
+from django.views import View
+from rest_framework import status
+
+from books import cache, conditional, metrics, routers
+from books.counters import arow_count
+from books.filters import BookFilterSerializer
+from books.models import Author, Book
+from books.pagination import InvalidCursor, acursor_paginate
+from books.serializers import (AuthorSerializer, BookSerializer, CursorPaginationSerializer,
+                               FieldsetSerializer, PaginationSerializer)
+from books.streaming import _encode, astreaming_response, stream_mode
+from books.utilities import round_up
+
+
+class JSONResponse(HttpResponse):
+    """
+    ``data`` encoded exactly as rest_framework's JSONRenderer would.
+    """
+
+    def __init__(self, data, status=status.HTTP_200_OK):
+        super().__init__(_encode(data), content_type='application/json', status=status)
+
+
+class AsyncAPIView(View):
+    """
+    Base of the async views: csrf exempt and JSON 404s like APIView, plus the
+    parsing of the fields/expand and filter parameters shared by the lists.
+    """
+
+    model = None
+    serializer_class = None
+    filter_class = None
+    message = None
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        view.csrf_exempt = True
+        return view
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        except Http404:
+            return JSONResponse({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+
+    def request_data(self, request):
+        """
+        The JSON (or form) body of ``request``, or None when it cannot be parsed.
+        """
+
+        if request.content_type != 'application/json':
+            return request.POST
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+
+    def parse(self, params):
+        """
+        ``(values, filters, errors)``: the ValuesSerializer for ?fields= / ?expand=
+        and the validated filters (None for models without any).
+        """
+
+        fieldset = FieldsetSerializer(data=params, context={'serializer_class': self.serializer_class})
+        if not fieldset.is_valid():
+            return None, None, fieldset.errors
+        filters = None
+        if self.filter_class is not None:
+            filters = self.filter_class(data=params)
+            if not filters.is_valid():
+                return None, None, filters.errors
+        return fieldset.values_serializer(), filters, None
+
+    def filter_queryset(self, filters):
+        queryset = self.model.objects.all()
+        return filters.filter_queryset(queryset) if filters is not None else queryset
+
+    def ordering(self, filters):
+        return filters.validated_data['ordering'] if filters is not None else 'id'
+
+    def order_by(self, filters):
+        return filters.order_by() if filters is not None else ('id',)
+
+    def bad_request(self, errors):
+        return JSONResponse({
+            "status": 0,
+            "message": errors}, status = status.HTTP_400_BAD_REQUEST
+        )
+
+
+class AsyncListView(AsyncAPIView):
+
+    #Listing all the rows, streamed on request
+    async def get(self, request):
+        """
+        Async form of /api/authors/ and /api/books/, same parameters.
+        """
+
+        values, filters, errors = self.parse(request.GET)
+        if errors:
+            return self.bad_request(errors)
+
+        queryset = self.filter_queryset(filters)
+        not_modified, etag = await conditional.aevaluate_collection(
+            request, queryset, values, JSONResponse
+        )
+        if not_modified:
+            return not_modified
+
+        queryset = queryset.order_by(*self.order_by(filters))
+        mode = stream_mode(request)
+        if mode:
+            response = astreaming_response(mode, queryset, values, self.message)
+            return conditional.set_validators(response, etag)
+
+        data = await values.aserialize(queryset)
+        response = JSONResponse({
+            "status":  1,
+            "message": self.message,
+            "data": data}, status = status.HTTP_200_OK
+        )
+        return conditional.set_validators(response, etag)
+
+
+class AsyncDetailView(AsyncAPIView):
+
+    #Get a single row
+    async def get(self, request, id):
+        """
+        Async form of GET /api/authors/<int:id>/ and /api/books/<int:id>/.
+        """
+
+        data = cache.peek(self.model, id)
+
+        # Revalidate against updated_at before serializing anything
+        if data is not None or conditional.has_revalidation(request):
+            updated_at = data["updated_at"] if data is not None else await conditional.acurrent_updated_at(self.model, id)
+            not_modified = conditional.evaluate_row(request, self.model, id, updated_at, JSONResponse)
+            if not_modified:
+                return not_modified
+
+        if data is None:
+            generation = cache.generation(self.model, id)
+            with routers.read_only(False):
+                try:
+                    instance = await self.model.objects.aget(id=id)
+                except self.model.DoesNotExist:
+                    raise Http404
+            with metrics.timed('serialize'):
+                data = cache.store(self.model, id, dict(self.serializer_class(instance).data), generation)
+        response = JSONResponse({
+            "status": 1,
+            "message": "success",
+            "data":data}, status = status.HTTP_200_OK
+        )
+        return conditional.set_row_validators(response, self.model, id, data["updated_at"])
+
+
+class AsyncPageView(AsyncAPIView):
+
+    #Listing by page (POST) or by cursor (POST with cursor, or GET)
+    async def post(self, request):
+        """
+        Async form of POST /api/listing-all-authors/ and /api/listing-all-books/.
+        """
+
+        params = self.request_data(request)
+        if params is None:
+            return self.bad_request("JSON object expected")
+        values, filters, errors = self.parse(params)
+        if errors:
+            return self.bad_request(errors)
+
+        if 'cursor' in params:
+            return await self.cursor_page(params, values, filters)
+
+        serializer = PaginationSerializer(data=params)
+        if not serializer.is_valid():
+            return self.bad_request(serializer.errors)
+        page = serializer.validated_data.get('page')
+        page_size = serializer.validated_data.get('page_size')
+
+        # Calculate skip value for pagination
+        skip = (page - 1) * page_size
+
+        queryset = self.filter_queryset(filters)
+        page_rows = values.rows(queryset.order_by(*self.order_by(filters)))[skip: skip + page_size]
+        data = await values.aserialize([row async for row in page_rows])
+        if filters is not None and filters.is_filtered:
+            total_records = await queryset.acount()
+        else:
+            total_records = await arow_count(self.model)
+        num_pages = round_up(total_records / page_size)
+        return JSONResponse({
+            "status":  1,
+            "message": self.message,
+            "paginator":  {
+                "total_records": total_records,
+                "total_pages":num_pages,
+                "current_page":page,
+                "current_page_size": len(data),
+                'next_page': None if (num_pages == page or total_records == 0) else (page+1),
+                'previous_page': (page-1),
+            },
+            "data": data}, status = status.HTTP_200_OK
+        )
+
+    async def get(self, request):
+        """
+        Async form of GET /api/listing-all-authors/ and /api/listing-all-books/.
+        """
+
+        values, filters, errors = self.parse(request.GET)
+        if errors:
+            return self.bad_request(errors)
+
+        not_modified, etag = await conditional.aevaluate_collection(
+            request, self.filter_queryset(filters), values, JSONResponse
+        )
+        if not_modified:
+            return not_modified
+        response = await self.cursor_page(request.GET, values, filters)
+        if response.status_code == status.HTTP_200_OK:
+            conditional.set_validators(response, etag)
+        return response
+
+    async def cursor_page(self, params, values, filters):
+        serializer = CursorPaginationSerializer(data=params)
+        if not serializer.is_valid():
+            return self.bad_request(serializer.errors)
+        page_size = serializer.validated_data.get('page_size')
+        cursor = serializer.validated_data.get('cursor')
+
+        # Seek from the cursor position instead of skipping rows
+        try:
+            data, paginator = await acursor_paginate(
+                self.filter_queryset(filters), values, page_size, cursor, ordering=self.ordering(filters),
+            )
+        except InvalidCursor as e:
+            return self.bad_request({"cursor": [str(e)]})
+        return JSONResponse({
+            "status":  1,
+            "message": self.message,
+            "paginator": paginator,
+            "data": data}, status = status.HTTP_200_OK
+        )
+
+
+class AsyncAuthorListView(AsyncListView):
+    model = Author
+    serializer_class = AuthorSerializer
+    message = "Author details retrieved successfully"
+
+
+class AsyncAuthorDetailView(AsyncDetailView):
+    model = Author
+    serializer_class = AuthorSerializer
+
+
+class AsyncGetAuthorList(AsyncPageView):
+    model = Author
+    serializer_class = AuthorSerializer
+    message = "Author details retrieved successfully"
+
+
+class AsyncBookListView(AsyncListView):
+    model = Book
+    serializer_class = BookSerializer
+    filter_class = BookFilterSerializer
+    message = "Book details retrieved successfully"
+
+
+class AsyncBookDetailView(AsyncDetailView):
+    model = Book
+    serializer_class = BookSerializer
+
+
+class AsyncGetBookList(AsyncPageView):
+    model = Book
+    serializer_class = BookSerializer
+    filter_class = BookFilterSerializer
+    message = "Book details retrieved successfully"
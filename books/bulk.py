@@ -0,0 +1,274 @@
+"""
+Batch create / update / delete for authors and books.
+
+Items are validated one by one without touching the database, then the
+cross-row checks (referenced authors, email collisions) run as a single query
+for the whole request. Valid items are written with ``bulk_create`` /
+``bulk_update`` in transactions of ``BOOKS_BULK_BATCH_SIZE`` rows; a batch that
+fails is rolled back and reported against each of its items, the other batches
+are kept. Deleted authors lose their books first, in transactions of the same
+size, so no cascade holds SQLite's write lock for long.
+"""
+
+from django.conf import settings
+from django.db import DatabaseError, router, transaction
+from django.utils import timezone
+
+from books import counters, stats
+from books.models import Author, Book
+from books.signals import bulk_created, bulk_updated
+
+
+def batch_size():
+    return getattr(settings, 'BOOKS_BULK_BATCH_SIZE', 500)
+
+
+def max_items():
+    return getattr(settings, 'BOOKS_BULK_MAX_ITEMS', 10000)
+
+
+def batches(items, size=None):
+    size = size or batch_size()
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class BulkResult:
+    """
+    Outcome of every item of a bulk request, in request order.
+    """
+
+    def __init__(self, size):
+        self.items = [None] * size
+
+    def ok(self, index, pk):
+        self.items[index] = {"index": index, "status": 1, "id": pk}
+
+    def error(self, index, message):
+        self.items[index] = {"index": index, "status": 0, "message": message}
+
+    @property
+    def succeeded(self):
+        return sum(1 for item in self.items if item and item["status"] == 1)
+
+    @property
+    def failed(self):
+        return len(self.items) - self.succeeded
+
+
+def _validate(serializer_class, items, result, partial=False):
+    valid = {}
+    for index, item in enumerate(items):
+        serializer = serializer_class(data=item, partial=partial)
+        if serializer.is_valid():
+            valid[index] = serializer.validated_data
+        else:
+            result.error(index, serializer.errors)
+    return valid
+
+
+def check_book_authors(valid, result):
+    """
+    Drop the items whose ``author`` does not exist and give the others the
+    author's name (``Book.author_name``), with one query.
+    """
+
+    author_ids = {data['author_id'] for data in valid.values() if 'author_id' in data}
+    names = dict(Author.objects.filter(id__in=author_ids).values_list('id', 'name'))
+    for index, data in list(valid.items()):
+        author_id = data.get('author_id')
+        if author_id is None:
+            continue
+        if author_id not in names:
+            result.error(index, {"author": [f'Invalid pk "{author_id}" - object does not exist.']})
+            del valid[index]
+        else:
+            data['author_name'] = names[author_id]
+
+
+def check_author_emails(valid, result):
+    """
+    Drop the items whose ``email`` is taken by another author or repeated in
+    the request, with one query.
+    """
+
+    emails = [data['email'] for data in valid.values() if 'email' in data]
+    owners = dict(Author.objects.filter(email__in=emails).values_list('email', 'id'))
+    seen = set()
+    for index, data in list(valid.items()):
+        email = data.get('email')
+        if email is None:
+            continue
+        owner = owners.get(email)
+        if email in seen or (owner is not None and owner != data.get('id')):
+            result.error(index, {"email": ["author with this email already exists."]})
+            del valid[index]
+        seen.add(email)
+
+
+def lock_for_write(model):
+    """
+    Take SQLite's write lock now, as the first statement of a transaction.
+
+    Under WAL, a transaction that reads before it writes cannot wait for the
+    lock: when another writer committed in between, SQLite fails it at once
+    with "database is locked". Taking the lock first makes it wait its turn.
+    """
+
+    connection = transaction.get_connection(router.db_for_write(model))
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {connection.ops.quote_name(model._meta.db_table)} WHERE 0")
+
+
+def _write_batches(entries, write, result, progress=None):
+    for batch in batches(entries):
+        try:
+            with transaction.atomic():
+                write([obj for _, obj in batch])
+        except DatabaseError as e:
+            for index, _ in batch:
+                result.error(index, {"non_field_errors": [f"Batch rolled back: {e}"]})
+        else:
+            for index, obj in batch:
+                result.ok(index, obj.pk)
+        if progress:
+            progress(len(batch))
+
+
+def bulk_create(model, serializer_class, items, check=None, progress=None):
+    result = BulkResult(len(items))
+    valid = _validate(serializer_class, items, result)
+    for data in valid.values():
+        data.pop('id', None)
+    if check:
+        check(valid, result)
+
+    def write(objs):
+        created = model.objects.bulk_create(objs)
+        bulk_created.send(sender=model, instances=created)
+
+    _write_batches([(index, model(**data)) for index, data in valid.items()], write, result, progress)
+    return result
+
+
+def bulk_update(model, serializer_class, items, check=None, progress=None):
+    result = BulkResult(len(items))
+    valid = _validate(serializer_class, items, result, partial=True)
+
+    seen = set()
+    for index, data in list(valid.items()):
+        pk = data.get('id')
+        if pk is None or pk in seen:
+            message = "This field is required." if pk is None else "Duplicate id in request."
+            result.error(index, {"id": [message]})
+            del valid[index]
+        seen.add(pk)
+
+    existing = model.objects.in_bulk([data['id'] for data in valid.values()])
+    for index, data in list(valid.items()):
+        if data['id'] not in existing:
+            result.error(index, {"id": ["Not found."]})
+            del valid[index]
+    if check:
+        check(valid, result)
+
+    # bulk_update() skips auto_now, so stamp updated_at ourselves
+    now = timezone.now()
+    fields = {'updated_at'}
+    entries = []
+    for index, data in valid.items():
+        obj = existing[data['id']]
+        for name, value in data.items():
+            if name != 'id':
+                setattr(obj, name, value)
+                fields.add(name)
+        obj.updated_at = now
+        entries.append((index, obj))
+    fields = sorted(fields)
+
+    def write(objs):
+        model.objects.bulk_update(objs, fields)
+        bulk_updated.send(sender=model, instances=objs, fields=fields)
+
+    _write_batches(entries, write, result, progress)
+    return result
+
+
+def bulk_delete(model, ids, progress=None):
+    result = BulkResult(len(ids))
+    existing = set(model.objects.filter(id__in=ids).values_list('id', flat=True))
+    entries = []
+    seen = set()
+    for index, pk in enumerate(ids):
+        if pk not in existing or pk in seen:
+            result.error(index, {"id": ["Not found."]})
+        else:
+            entries.append((index, model(pk=pk)))
+        seen.add(pk)
+
+    if model is Author:
+        # The books go first, batch by batch, so the cascade of a batch of authors is small
+        delete_books_of([obj.pk for _, obj in entries], progress)
+
+    def write(objs):
+        lock_for_write(model)
+        # Related rows cascade and signal per row; apply the counters and rollups once
+        with counters.batch(), stats.batch():
+            model.objects.filter(id__in=[obj.pk for obj in objs]).delete()
+
+    _write_batches(entries, write, result, progress)
+    return result
+
+
+def delete_books_of(author_ids, progress=None):
+    """
+    Delete the books of ``author_ids`` in transactions of batch_size() rows.
+
+    Returns the number of books deleted.
+    """
+
+    deleted = 0
+    while True:
+        with transaction.atomic(), counters.batch(), stats.batch():
+            lock_for_write(Book)
+            pks = list(Book.objects.filter(author_id__in=author_ids).values_list('id', flat=True)[:batch_size()])
+            if pks:
+                Book.objects.filter(id__in=pks).delete()
+        deleted += len(pks)
+        if progress and pks:
+            progress(len(pks))
+        if len(pks) < batch_size():
+            # The last chunk; books added since go with the author's cascade
+            return deleted
+
+
+def delete_authors(pks, progress=None):
+    """
+    Delete the authors ``pks`` with their books, never holding the write
+    lock for more than batch_size() rows: the books first, then the authors.
+
+    Returns the number of rows deleted.
+    """
+
+    deleted = delete_books_of(pks, progress)
+    with transaction.atomic(), counters.batch(), stats.batch():
+        lock_for_write(Author)
+        # Also cascades to books added in the meantime
+        _, per_model = Author.objects.filter(id__in=pks).delete()
+    count = per_model.get(Author._meta.label, 0) + per_model.get(Book._meta.label, 0)
+    if progress:
+        progress(count)
+    return deleted + count
+
+
+def payload_error(items):
+    """
+    Message describing why ``items`` cannot be processed, or None.
+    """
+
+    if not isinstance(items, list) or not items:
+        return "Expected a non-empty list of items."
+    if len(items) > max_items():
+        return f"Ensure this list has no more than {max_items()} items."
+    return None
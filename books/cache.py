@@ -0,0 +1,392 @@
+"""
+Read-through cache for the serialized ``data`` of single authors and books.
+
+The backend is chosen with the ``BOOKS_DETAIL_CACHE`` setting::
+
+    BOOKS_DETAIL_CACHE = {
+        'BACKEND': 'books.cache.LocMemLRUCache',
+        'OPTIONS': {'MAX_ENTRIES': 10000, 'TIMEOUT': 300},
+    }
+
+Entries are keyed by model and primary key and dropped by the signal
+receivers in books/signals.py whenever a row is saved, bulk updated or
+deleted, cascades included.
+
+Every key also has a generation that invalidate() bumps. A reader takes
+the generation before loading the row and store() drops the value when it
+moved in between, so a load that raced a write cannot put the old row
+back after the write's invalidation. Loads that fill the cache read the
+primary, as a replica may not have the write yet (see books/routers.py).
+"""
+
+import itertools
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+_MISSING = object()
+
+
+class BaseDetailCache:
+    """
+    Backends implement get/set/delete_many/clear and the generations of
+    their keys; hits and misses are counted here.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value):
+        raise NotImplementedError
+
+    def delete_many(self, keys):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def generations(self, keys):
+        """
+        Current generation of each of ``keys``, in order.
+        """
+
+        raise NotImplementedError
+
+    def bump(self, keys):
+        """
+        Move the generation of ``keys`` and drop their entries.
+        """
+
+        raise NotImplementedError
+
+    def set_many_current(self, items):
+        """
+        Cache ``(key, value, generation)`` items whose key is still at that generation.
+        """
+
+        current = self.generations([key for key, _, _ in items])
+        self.set_many((key, value) for (key, value, generation), now in zip(items, current)
+                      if generation == now)
+
+    def get_many(self, keys):
+        """
+        Values of ``keys``, in order, _MISSING for the absent ones.
+        """
+
+        return [self.get(key) for key in keys]
+
+    def set_many(self, items):
+        for key, value in items:
+            self.set(key, value)
+
+    def __len__(self):
+        return 0
+
+    def lookup(self, key):
+        value = self.get(key)
+        if value is _MISSING:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": f"{type(self).__module__}.{type(self).__qualname__}",
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+class LocMemLRUCache(BaseDetailCache):
+    """
+    Per-process cache, evicting the least recently used entry once
+    ``MAX_ENTRIES`` is reached and expiring entries after ``TIMEOUT`` seconds.
+    """
+
+    def __init__(self, MAX_ENTRIES=10000, TIMEOUT=300):
+        super().__init__()
+        self.max_entries = MAX_ENTRIES
+        self.timeout = TIMEOUT
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        # Generations of the recently invalidated keys, as many as entries;
+        # a forgotten key reads as the newest generation forgotten so far
+        self._generations = OrderedDict()
+        self._forgotten = 0
+        self._counter = itertools.count(1)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return _MISSING
+            expires, value = entry
+            if expires is not None and expires < time.monotonic():
+                del self._data[key]
+                return _MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires = time.monotonic() + self.timeout if self.timeout is not None else None
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def get_many(self, keys):
+        # One lock round for the whole list
+        now = time.monotonic()
+        values = []
+        with self._lock:
+            data = self._data
+            for key in keys:
+                entry = data.get(key)
+                if entry is None:
+                    values.append(_MISSING)
+                elif entry[0] is not None and entry[0] < now:
+                    del data[key]
+                    values.append(_MISSING)
+                else:
+                    data.move_to_end(key)
+                    values.append(entry[1])
+        return values
+
+    def set_many(self, items):
+        expires = time.monotonic() + self.timeout if self.timeout is not None else None
+        with self._lock:
+            data = self._data
+            for key, value in items:
+                data[key] = (expires, value)
+                data.move_to_end(key)
+            while len(data) > self.max_entries:
+                data.popitem(last=False)
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def generations(self, keys):
+        with self._lock:
+            return [self._generations.get(key, self._forgotten) for key in keys]
+
+    def bump(self, keys):
+        with self._lock:
+            data, generations = self._data, self._generations
+            for key in keys:
+                data.pop(key, None)
+                generations[key] = next(self._counter)
+                generations.move_to_end(key)
+            while len(generations) > self.max_entries:
+                self._forgotten = max(self._forgotten, generations.popitem(last=False)[1])
+
+    def set_many_current(self, items):
+        # Compared and written under one lock round
+        expires = time.monotonic() + self.timeout if self.timeout is not None else None
+        with self._lock:
+            data, generations = self._data, self._generations
+            for key, value, generation in items:
+                if generations.get(key, self._forgotten) == generation:
+                    data[key] = (expires, value)
+                    data.move_to_end(key)
+            while len(data) > self.max_entries:
+                data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class DjangoCache(BaseDetailCache):
+    """
+    Adapter over one of the ``CACHES`` aliases, to share entries between
+    processes (memcached, redis, ...). Eviction is left to that cache.
+    """
+
+    def __init__(self, ALIAS='default', TIMEOUT=300):
+        super().__init__()
+        self.alias = ALIAS
+        self.timeout = TIMEOUT
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def get(self, key):
+        return self.cache.get(key, _MISSING)
+
+    def set(self, key, value):
+        self.cache.set(key, value, self.timeout)
+
+    def get_many(self, keys):
+        found = self.cache.get_many(keys)
+        return [found.get(key, _MISSING) for key in keys]
+
+    def set_many(self, items):
+        self.cache.set_many(dict(items), self.timeout)
+
+    def delete_many(self, keys):
+        self.cache.delete_many(keys)
+
+    def clear(self):
+        self.cache.clear()
+
+    # Generations are counters next to the entries, kept without a timeout.
+    # The compare and the write of set_many_current() are two round trips,
+    # which narrows the race to that gap.
+
+    def generations(self, keys):
+        found = self.cache.get_many([f"{key}:generation" for key in keys])
+        return [found.get(f"{key}:generation", 0) for key in keys]
+
+    def bump(self, keys):
+        for key in keys:
+            try:
+                self.cache.incr(f"{key}:generation")
+            except ValueError:
+                self.cache.set(f"{key}:generation", 1, None)
+        self.cache.delete_many(keys)
+
+
+class DummyCache(BaseDetailCache):
+    """
+    Caches nothing; every lookup is a miss.
+    """
+
+    def get(self, key):
+        return _MISSING
+
+    def set(self, key, value):
+        pass
+
+    def delete_many(self, keys):
+        pass
+
+    def clear(self):
+        pass
+
+    def generations(self, keys):
+        return [0] * len(keys)
+
+    def bump(self, keys):
+        pass
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def detail_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                config = getattr(settings, 'BOOKS_DETAIL_CACHE', {})
+                backend = import_string(config.get('BACKEND', 'books.cache.LocMemLRUCache'))
+                _cache = backend(**config.get('OPTIONS', {}))
+    return _cache
+
+
+def reset_detail_cache():
+    """
+    Drop the configured backend so the next call to detail_cache() rebuilds it.
+    """
+
+    global _cache
+    with _cache_lock:
+        _cache = None
+
+
+def cache_key(model, pk):
+    return f"{model._meta.label_lower}:{pk}"
+
+
+def peek(model, pk):
+    """
+    Cached ``data`` of ``model`` row ``pk``, or None.
+    """
+
+    data = detail_cache().lookup(cache_key(model, pk))
+    return None if data is _MISSING else data
+
+
+def generation(model, pk):
+    """
+    Generation of ``model`` row ``pk``, to take before loading it for store().
+    """
+
+    return detail_cache().generations([cache_key(model, pk)])[0]
+
+
+def generations(model, pks):
+    """
+    Generations of the ``model`` rows ``pks``, as a dict, for store_many().
+    """
+
+    return dict(zip(pks, detail_cache().generations([cache_key(model, pk) for pk in pks])))
+
+
+def store(model, pk, data, generation):
+    """
+    Cache ``data`` unless row ``pk`` was invalidated since ``generation``.
+    """
+
+    detail_cache().set_many_current([(cache_key(model, pk), data, generation)])
+    return data
+
+
+def peek_many(model, pks):
+    """
+    Cached ``data`` of the ``model`` rows ``pks``, as a dict of the ones found.
+    """
+
+    cache = detail_cache()
+    values = cache.get_many([cache_key(model, pk) for pk in pks])
+    found = {pk: data for pk, data in zip(pks, values) if data is not _MISSING}
+    cache.hits += len(found)
+    cache.misses += len(pks) - len(found)
+    return found
+
+
+def store_many(model, items, generations):
+    """
+    Cache the ``data`` of several rows, ``items`` mapping pk to data and
+    ``generations`` pk to the generation taken before loading it.
+    """
+
+    detail_cache().set_many_current(
+        [(cache_key(model, pk), data, generations[pk]) for pk, data in items.items()]
+    )
+
+
+def invalidate(model, pks):
+    """
+    Drop the entries of ``pks`` and bump their generations now and again
+    once the transaction commits, so a concurrent reader cannot put back a
+    copy of the old row in between.
+    """
+
+    keys = [cache_key(model, pk) for pk in pks]
+    if not keys:
+        return
+    cache = detail_cache()
+    cache.bump(keys)
+    transaction.on_commit(lambda: cache.bump(keys))
@@ -0,0 +1,260 @@
+"""
+Catalog feed import / export, in CSV or NDJSON.
+
+A feed row is a book with its author inlined (CATALOG_COLUMNS). Rows with no
+book columns only carry an author, so authors without books survive an
+export / import round trip. Authors are matched by their unique email: the
+first batch of an import that names an email upserts that author (from the
+batch's last row for it), later batches just reference it. Books with an ``id`` are upserted on it and the others
+are created.
+
+Both directions stream: ``read_rows`` parses one line at a time and
+CatalogImporter writes batches of ``batch_size`` rows per transaction, so
+memory stays flat whatever the feed size, apart from the email -> id map of
+the authors (loaded with one query).
+"""
+
+import csv
+import json
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, transaction
+
+from books import denormalized, stats
+from books.models import Author, Book
+from books.signals import bulk_created, bulk_updated
+
+CATALOG_COLUMNS = ['id', 'title', 'published_date', 'price', 'author_name', 'author_email', 'author_bio']
+
+# Feed column -> model field
+BOOK_COLUMNS = {'id': 'id', 'title': 'title', 'published_date': 'published_date', 'price': 'price'}
+AUTHOR_COLUMNS = {'author_name': 'name', 'author_email': 'email', 'author_bio': 'bio'}
+
+FORMATS = ('csv', 'ndjson')
+
+EXTENSIONS = {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson'}
+
+
+def format_for(path):
+    for extension, fmt in EXTENSIONS.items():
+        if path.lower().endswith(extension):
+            return fmt
+    return None
+
+
+def read_rows(stream, fmt):
+    """
+    (line number, row dict) of each row of ``stream``, a text file.
+    """
+
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield number, ValueError(f"Invalid JSON: {e}")
+            continue
+        yield number, row if isinstance(row, dict) else ValueError("Expected a JSON object.")
+
+
+def _blank(value):
+    return value is None or value == ''
+
+
+def _clean(model, columns, row, errors, required):
+    data = {}
+    for column, name in columns.items():
+        value = row.get(column)
+        if _blank(value):
+            if name in required:
+                errors[column] = ["This field is required."]
+            continue
+        try:
+            data[name] = model._meta.get_field(name).clean(str(value), None)
+        except ValidationError as e:
+            errors[column] = e.messages
+    return data
+
+
+def parse_row(row):
+    """
+    (author data, book data or None, errors) of a feed row.
+    """
+
+    errors = {}
+    author = _clean(Author, AUTHOR_COLUMNS, row, errors, required=('name', 'email'))
+    book = None
+    if any(not _blank(row.get(column)) for column in BOOK_COLUMNS):
+        book = _clean(Book, BOOK_COLUMNS, row, errors, required=('title', 'published_date', 'price'))
+    return author, book, errors
+
+
+class ImportResult:
+    def __init__(self):
+        self.rows = 0
+        self.authors_created = 0
+        self.authors_updated = 0
+        self.books_created = 0
+        self.books_updated = 0
+        # (line number, errors) of the rejected rows
+        self.errors = []
+
+
+class CatalogImporter:
+    """
+    Writes parsed feed rows batch by batch; see the module docstring.
+    """
+
+    def __init__(self, batch_size=2000):
+        self.batch_size = batch_size
+        self.author_ids = dict(Author.objects.values_list('email', 'id'))
+        # Emails already upserted by this import
+        self.seen = set()
+        self.result = ImportResult()
+
+    def run(self, rows, progress=None):
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                return self.result
+            self.import_batch(batch)
+            if progress:
+                progress(self.result)
+
+    def import_batch(self, batch):
+        result = self.result
+        parsed = []
+        for number, row in batch:
+            result.rows += 1
+            if isinstance(row, Exception):
+                result.errors.append((number, {"non_field_errors": [str(row)]}))
+                continue
+            author, book, errors = parse_row(row)
+            if errors:
+                result.errors.append((number, errors))
+            else:
+                parsed.append((number, author, book))
+
+        counts = {}
+        try:
+            with transaction.atomic(), stats.batch():
+                author_ids = self.write_authors(parsed, counts)
+                self.write_books(parsed, author_ids, counts)
+        except DatabaseError as e:
+            for number, _, _ in parsed:
+                result.errors.append((number, {"non_field_errors": [f"Batch rolled back: {e}"]}))
+            return
+        # Only what was committed reaches the author map and the totals
+        self.author_ids.update(author_ids)
+        self.seen.update(author_ids)
+        for name, count in counts.items():
+            setattr(result, name, getattr(result, name) + count)
+
+    def write_authors(self, parsed, counts):
+        """
+        Upsert the authors first named in this batch; returns their email -> id.
+        """
+
+        # Last row of the batch wins; authors upserted by an earlier batch are only referenced
+        authors = {}
+        for _, author, _ in parsed:
+            if author['email'] not in self.seen:
+                authors[author['email']] = author
+        ids = {}
+        # A row without author_bio keeps the stored bio
+        for with_bio in (True, False):
+            group = [data for data in authors.values() if ('bio' in data) == with_bio]
+            if not group:
+                continue
+            fields = ['name', 'bio', 'updated_at'] if with_bio else ['name', 'updated_at']
+            objs = Author.objects.bulk_create(
+                [Author(**data) for data in group],
+                update_conflicts=True, unique_fields=['email'], update_fields=fields,
+            )
+            created = [obj for obj in objs if obj.email not in self.author_ids]
+            updated = [obj for obj in objs if obj.email in self.author_ids]
+            bulk_created.send(sender=Author, instances=created)
+            bulk_updated.send(sender=Author, instances=updated, fields=fields)
+            counts['authors_created'] = counts.get('authors_created', 0) + len(created)
+            counts['authors_updated'] = counts.get('authors_updated', 0) + len(updated)
+            ids.update((obj.email, obj.pk) for obj in objs)
+        return ids
+
+    def write_books(self, parsed, author_ids, counts):
+        keyed = {}
+        new = []
+        for _, author, book in parsed:
+            if book is None:
+                continue
+            author_id = author_ids.get(author['email']) or self.author_ids[author['email']]
+            obj = Book(author_id=author_id, **book)
+            if obj.pk is None:
+                new.append(obj)
+            else:
+                keyed[obj.pk] = obj
+
+        denormalized.fill_author_names([*new, *keyed.values()])
+        created, updated = [], []
+        if new:
+            created = Book.objects.bulk_create(new)
+            bulk_created.send(sender=Book, instances=created)
+        if keyed:
+            fields = ['title', 'author', 'author_name', 'published_date', 'price', 'updated_at']
+            # The rows' current values, for the rollups of books/stats.py
+            existing = Book.objects.only('author_id', 'published_date', 'price').in_bulk(list(keyed))
+            for pk, loaded in existing.items():
+                keyed[pk]._loaded_stats = loaded._loaded_stats
+            objs = Book.objects.bulk_create(
+                keyed.values(), update_conflicts=True, unique_fields=['id'], update_fields=fields,
+            )
+            upserted = [obj for obj in objs if obj.pk not in existing]
+            updated = [obj for obj in objs if obj.pk in existing]
+            bulk_created.send(sender=Book, instances=upserted)
+            bulk_updated.send(sender=Book, instances=updated, fields=fields)
+            created = [*created, *upserted]
+        counts['books_created'] = len(created)
+        counts['books_updated'] = len(updated)
+
+
+def export_rows(chunk_size=2000):
+    """
+    Feed rows (tuples in CATALOG_COLUMNS order) of the whole catalog: every
+    book by id, then the authors without books.
+    """
+
+    books = Book.objects.order_by('id').values_list(
+        'id', 'title', 'published_date', 'price', 'author__name', 'author__email', 'author__bio',
+    )
+    for pk, title, published_date, price, name, email, bio in books.iterator(chunk_size=chunk_size):
+        yield pk, title, published_date.isoformat(), str(price), name, email, bio
+    authors = Author.objects.filter(book__isnull=True).order_by('id').values_list('name', 'email', 'bio')
+    for name, email, bio in authors.iterator(chunk_size=chunk_size):
+        yield None, None, None, None, name, email, bio
+
+
+class CatalogWriter:
+    """
+    Writes feed rows to ``stream`` as CSV (with a header line) or NDJSON.
+    """
+
+    def __init__(self, stream, fmt):
+        self.stream = stream
+        self.fmt = fmt
+        if fmt == 'csv':
+            self.csv = csv.writer(stream)
+            self.csv.writerow(CATALOG_COLUMNS)
+
+    def write(self, row):
+        if self.fmt == 'csv':
+            self.csv.writerow(row)
+        else:
+            self.stream.write(json.dumps(dict(zip(CATALOG_COLUMNS, row)), ensure_ascii=False))
+            self.stream.write('\n')
@@ -0,0 +1,178 @@
+"""
+Change log of the catalog, read by /api/changes/ for delta sync.
+
+Triggers on books_book/books_author append a Change row for every insert,
+update and delete, so bulk statements, cascades, ``QuerySet.update()`` and
+raw SQL are all logged; a deleted row leaves a "deleted" tombstone. The id
+of the Change row is the feed cursor: SQLite runs one writer at a time and
+AUTOINCREMENT never reuses an id, so ids grow in commit order and a reader
+that saw cursor N has seen every change up to N.
+
+A mirror reads ``/api/changes/?since=<cursor>`` from the last cursor it
+applied, upserting "created"/"updated" rows and dropping "deleted" ones, so
+a sync reads only the log entries written since. ``compact()`` (the
+``compact_changes`` command) removes the entries superseded by a later one
+for the same row, which no reader needs, and the tombstones older than
+``TOMBSTONE_DAYS``; a cursor older than the newest tombstone removed gets
+410 and must resync from the lists. ``reset()`` empties the log after the
+catalog was replaced behind it (generate_dataset), which every cursor
+handed out so far answers with 410. Settings::
+
+    BOOKS_CHANGES = {'TOMBSTONE_DAYS': 30}
+
+Like those of the search index (books/search.py), the triggers are dropped
+before every ``migrate`` and reinstalled after it; a data migration logs the
+rows it changes itself. Other database backends have no change log.
+"""
+
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from books.models import Change, ChangeCompaction
+
+DEFAULTS = {
+    'TOMBSTONE_DAYS': 30,
+}
+
+TABLE = Change._meta.db_table
+
+# (kind, table) of the logged models
+LOGGED = [('author', 'books_author'), ('book', 'books_book')]
+
+# Ids per DELETE, under SQLite's bound parameter limit; each is a statement
+# of its own, so writers get the lock in between
+DELETE_BATCH_SIZE = 500
+
+# Same text format as the datetimes Django stores in SQLite
+NOW = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+TRIGGERS = [
+    sql
+    for kind, table in LOGGED
+    for sql in (
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_change_insert AFTER INSERT ON {table} BEGIN
+            INSERT INTO {TABLE}(kind, object_id, action, changed_at) VALUES ('{kind}', new.id, 'created', {NOW});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_change_update AFTER UPDATE ON {table} BEGIN
+            INSERT INTO {TABLE}(kind, object_id, action, changed_at) VALUES ('{kind}', new.id, 'updated', {NOW});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_change_delete AFTER DELETE ON {table} BEGIN
+            INSERT INTO {TABLE}(kind, object_id, action, changed_at) VALUES ('{kind}', old.id, 'deleted', {NOW});
+        END""",
+    )
+]
+
+TRIGGER_NAMES = [re.search(r'EXISTS (\w+)', sql).group(1) for sql in TRIGGERS]
+
+
+def config(name):
+    return getattr(settings, 'BOOKS_CHANGES', {}).get(name, DEFAULTS[name])
+
+
+def supported(connection):
+    return connection.vendor == 'sqlite'
+
+
+def install(connection):
+    """
+    Create the change log triggers if missing.
+    """
+
+    if not supported(connection):
+        return
+    with connection.cursor() as cursor:
+        for sql in TRIGGERS:
+            cursor.execute(sql)
+
+
+def uninstall(connection):
+    if not supported(connection):
+        return
+    with connection.cursor() as cursor:
+        for name in TRIGGER_NAMES:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+
+def horizon(using='default'):
+    """
+    The oldest cursor the feed still answers: the newest tombstone compacted away.
+    """
+
+    return ChangeCompaction.objects.using(using).order_by('-id').values_list('horizon', flat=True).first() or 0
+
+
+def latest(using='default'):
+    """
+    The cursor of the newest change, where a mirror that resyncs from the lists continues.
+    """
+
+    newest = Change.objects.using(using).aggregate(cursor=Max('id'))['cursor'] or 0
+    # Compaction may have emptied the log
+    return max(newest, horizon(using))
+
+
+def since(cursor, limit, using='default'):
+    """
+    The first ``limit`` changes after ``cursor``, oldest first.
+    """
+
+    return list(Change.objects.using(using).filter(id__gt=cursor).order_by('id')[:limit])
+
+
+def _delete(ids, using):
+    for start in range(0, len(ids), DELETE_BATCH_SIZE):
+        Change.objects.using(using).filter(id__in=ids[start:start + DELETE_BATCH_SIZE]).delete()
+
+
+def reset(using='default'):
+    """
+    Empty the log and move the horizon past every cursor handed out so far.
+    Returns the new horizon.
+    """
+
+    connection = connections[using]
+    if not supported(connection):
+        return 0
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        # Takes one id, so the horizon is after every cursor handed out and
+        # before every change to come (AUTOINCREMENT never reuses an id)
+        cursor.execute(
+            f"INSERT INTO {TABLE}(kind, object_id, action, changed_at) VALUES ('author', 0, 'deleted', {NOW})"
+        )
+        floor = cursor.lastrowid
+        cursor.execute(f"DELETE FROM {TABLE}")
+        ChangeCompaction.objects.using(using).create(horizon=floor, superseded=cursor.rowcount - 1)
+    return floor
+
+
+def compact(keep_days=None, using='default'):
+    """
+    Remove the superseded entries, then the tombstones older than
+    ``keep_days`` (TOMBSTONE_DAYS). Returns ``(superseded, tombstones,
+    horizon)``: the entries removed and the new oldest cursor served.
+    """
+
+    keep_days = config('TOMBSTONE_DAYS') if keep_days is None else keep_days
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f"SELECT id FROM {TABLE} WHERE id NOT IN "
+            f"(SELECT MAX(id) FROM {TABLE} GROUP BY kind, object_id)"
+        )
+        superseded = [row[0] for row in cursor.fetchall()]
+    _delete(superseded, using)
+
+    cutoff = timezone.now() - timedelta(days=keep_days)
+    tombstones = list(
+        Change.objects.using(using).filter(action=Change.DELETED, changed_at__lt=cutoff).values_list('id', flat=True)
+    )
+    _delete(tombstones, using)
+    floor = max([horizon(using), *tombstones])
+    ChangeCompaction.objects.using(using).create(
+        horizon=floor, superseded=len(superseded), tombstones=len(tombstones)
+    )
+    return len(superseded), len(tombstones), floor
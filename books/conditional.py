@@ -0,0 +1,176 @@
+"""
+ETag / Last-Modified validators for the author and book endpoints.
+
+A row's validators come from its ``updated_at`` alone and a list's from the
+collection version ``(max(updated_at), row count)``, both of which the
+database answers from an index. Revalidations are therefore decided before
+anything is serialized. Lists send an ETag only: deleting a row leaves
+``max(updated_at)`` where it was, so a Last-Modified from it would answer
+If-Modified-Since with 304 after a delete. A list answers JSON or NDJSON under the same
+validators, so responses carry ``Vary: Accept`` for shared caches.
+"""
+
+import hashlib
+
+from django.db.models import Count, Max
+from django.http import Http404
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from books.counters import arow_count, row_count
+
+
+def _as_datetime(updated_at):
+    if isinstance(updated_at, str):
+        return parse_datetime(updated_at.replace('Z', '+00:00'))
+    return updated_at
+
+
+def _timestamp(updated_at):
+    updated_at = _as_datetime(updated_at)
+    return int(updated_at.timestamp()) if updated_at is not None else None
+
+
+def row_etag(model, pk, updated_at):
+    updated_at = _as_datetime(updated_at)
+    micros = int(updated_at.timestamp() * 1_000_000)
+    return quote_etag(f"{model._meta.model_name}-{pk}-{micros:x}")
+
+
+def collection_version(queryset):
+    """
+    ``(max updated_at, number of rows)`` of ``queryset``.
+
+    For a whole table the count comes from the maintained row counters.
+    """
+
+    if not queryset.query.where:
+        latest = queryset.aggregate(latest=Max('updated_at'))['latest']
+        return latest, row_count(queryset.model)
+    version = queryset.aggregate(latest=Max('updated_at'), total=Count('pk'))
+    return version['latest'], version['total']
+
+
+async def acollection_version(queryset):
+    if not queryset.query.where:
+        latest = (await queryset.aaggregate(latest=Max('updated_at')))['latest']
+        return latest, await arow_count(queryset.model)
+    version = await queryset.aaggregate(latest=Max('updated_at'), total=Count('pk'))
+    return version['latest'], version['total']
+
+
+def collection_etag(request, queryset, version):
+    latest, total = version
+    latest = latest.isoformat() if latest else ''
+    key = f"{queryset.model._meta.label_lower}|{latest}|{total}|{request.get_full_path()}"
+    return quote_etag(hashlib.md5(key.encode()).hexdigest())
+
+
+def has_revalidation(request):
+    return 'HTTP_IF_NONE_MATCH' in request.META or 'HTTP_IF_MODIFIED_SINCE' in request.META
+
+
+def current_updated_at(model, pk):
+    """
+    ``updated_at`` of one row, raising Http404 when it does not exist.
+    """
+
+    updated_at = model.objects.filter(pk=pk).values_list('updated_at', flat=True).first()
+    if updated_at is None:
+        raise Http404
+    return updated_at
+
+
+async def acurrent_updated_at(model, pk):
+    updated_at = await model.objects.filter(pk=pk).values_list('updated_at', flat=True).afirst()
+    if updated_at is None:
+        raise Http404
+    return updated_at
+
+
+def evaluate(request, etag, updated_at, response_class=Response):
+    """
+    Response answering the request's preconditions (304, or 412 in the usual
+    ``{"status", "message"}`` shape built with ``response_class``), or None
+    when the view should continue.
+    """
+
+    response = get_conditional_response(request, etag=etag, last_modified=_timestamp(updated_at))
+    if response is None:
+        return None
+    if response.status_code == status.HTTP_412_PRECONDITION_FAILED:
+        return precondition_failed(response_class)
+    set_validators(response, etag, updated_at)
+    return response
+
+
+def precondition_failed(response_class=Response):
+    return response_class({
+        "status": 0,
+        "message": "The resource was modified since the given ETag / date"},
+        status=status.HTTP_412_PRECONDITION_FAILED,
+    )
+
+
+def has_precondition(request):
+    return 'HTTP_IF_MATCH' in request.META or 'HTTP_IF_UNMODIFIED_SINCE' in request.META
+
+
+def set_validators(response, etag, updated_at=None):
+    response['ETag'] = etag
+    patch_vary_headers(response, ('Accept',))
+    timestamp = _timestamp(updated_at)
+    if timestamp is not None:
+        response['Last-Modified'] = http_date(timestamp)
+    return response
+
+
+def evaluate_row(request, model, pk, updated_at, response_class=Response):
+    return evaluate(request, row_etag(model, pk, updated_at), updated_at, response_class)
+
+
+def set_row_validators(response, model, pk, updated_at):
+    return set_validators(response, row_etag(model, pk, updated_at), updated_at)
+
+
+def evaluate_collection(request, queryset, values=None):
+    """
+    ``(response, etag)`` for a list endpoint; ``response`` is the 304 to
+    return, or None.
+
+    When the ValuesSerializer ``values`` inlines related rows (``?expand=``),
+    their table's version is part of the validators too.
+    """
+
+    version = collection_version(queryset)
+    related = [collection_version(model.objects.all()) for model in _related_models(values)]
+    return _evaluate_versions(request, queryset, version, related)
+
+
+async def aevaluate_collection(request, queryset, values=None, response_class=Response):
+    """
+    evaluate_collection() for async views.
+    """
+
+    version = await acollection_version(queryset)
+    related = [await acollection_version(model.objects.all()) for model in _related_models(values)]
+    return _evaluate_versions(request, queryset, version, related, response_class)
+
+
+def _related_models(values):
+    if values is None:
+        return []
+    return [plan.model for _, _, _, plan in values.joined] + [plan.model for _, plan, _ in values.prefetched]
+
+
+def _evaluate_versions(request, queryset, version, related, response_class=Response):
+    latest, total = version
+    for related_latest, related_total in related:
+        if related_latest and (latest is None or related_latest > latest):
+            latest = related_latest
+        total = f"{total}.{related_total}"
+    etag = collection_etag(request, queryset, (latest, total))
+    return evaluate(request, etag, None, response_class), etag
@@ -0,0 +1,150 @@
+"""
+Maintained row counts for the catalog tables.
+
+``COUNT(*)`` on SQLite walks the whole table, so the paginated listings read
+the number of rows from the ``RowCount`` table instead. The counters are kept
+up to date by the model signals in books/signals.py; code paths that skip
+signals (``bulk_create``, raw SQL) must call ``adjust()`` themselves, and the
+``reconcile_counts`` management command repairs any drift.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, router, transaction
+from django.db.models import F
+
+from books.models import RowCount
+
+_batch = ContextVar('row_count_batch', default=None)
+
+
+def _label(model):
+    return model._meta.label
+
+
+def adjust(model, delta):
+    """
+    Add ``delta`` to the maintained row count of ``model``.
+    """
+
+    if not delta:
+        return
+    pending = _batch.get()
+    if pending is not None:
+        pending[model] = pending.get(model, 0) + delta
+        return
+    using = router.db_for_write(RowCount)
+    updated = RowCount.objects.using(using).filter(table=_label(model)).update(count=F('count') + delta)
+    if not updated:
+        # No counter yet: seed it from the table, which already includes delta
+        RowCount.objects.using(using).get_or_create(
+            table=_label(model), defaults={'count': model._default_manager.using(using).count()}
+        )
+
+
+@contextmanager
+def batch():
+    """
+    Collect the ``adjust()`` calls made inside the block and apply them as a
+    single UPDATE per model when it exits.
+
+    Bulk deletes send one post_delete signal per row; wrapping them in
+    ``batch()`` keeps that to one counter write. Nothing is applied if the
+    block raises, so the counters roll back together with the rows.
+    """
+
+    if _batch.get() is not None:
+        yield
+        return
+    token = _batch.set({})
+    try:
+        yield
+        pending = _batch.get()
+    finally:
+        _batch.reset(token)
+    for model, delta in pending.items():
+        adjust(model, delta)
+
+
+def _estimated_count(model, using):
+    # sqlite_stat1 holds the row count ANALYZE saw for every index of a table
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+        if cursor.fetchone() is None:
+            return None
+        cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [model._meta.db_table])
+        row = cursor.fetchone()
+    return int(row[0].split()[0]) if row else None
+
+
+def row_count(model):
+    """
+    Number of rows in ``model``'s table, according to ``BOOKS_ROW_COUNT_MODE``.
+
+    - "maintained" (default): the counter kept by signals, O(1).
+    - "estimated": SQLite's ANALYZE statistics, falling back to the counter.
+    - "exact": a plain ``COUNT(*)``.
+    """
+
+    mode = getattr(settings, 'BOOKS_ROW_COUNT_MODE', 'maintained')
+    using = router.db_for_read(model) or DEFAULT_DB_ALIAS
+    if mode == 'exact':
+        return model._default_manager.using(using).count()
+    if mode == 'estimated':
+        estimate = _estimated_count(model, using)
+        if estimate is not None:
+            return estimate
+    count = RowCount.objects.using(using).filter(table=_label(model)).values_list('count', flat=True).first()
+    if count is None:
+        count = model._default_manager.using(using).count()
+        RowCount.objects.using(router.db_for_write(RowCount)).get_or_create(
+            table=_label(model), defaults={'count': count}
+        )
+    return count
+
+
+async def arow_count(model):
+    """
+    row_count() for async views.
+    """
+
+    mode = getattr(settings, 'BOOKS_ROW_COUNT_MODE', 'maintained')
+    using = router.db_for_read(model) or DEFAULT_DB_ALIAS
+    if mode == 'exact':
+        return await model._default_manager.using(using).acount()
+    if mode == 'estimated':
+        estimate = await sync_to_async(_estimated_count)(model, using)
+        if estimate is not None:
+            return estimate
+    count = await RowCount.objects.using(using).filter(table=_label(model)).values_list('count', flat=True).afirst()
+    if count is None:
+        count = await model._default_manager.using(using).acount()
+        await RowCount.objects.using(router.db_for_write(RowCount)).aget_or_create(
+            table=_label(model), defaults={'count': count}
+        )
+    return count
+
+
+def reconcile(models, dry_run=False):
+    """
+    Recount ``models`` and overwrite their counters.
+
+    Returns a list of ``(label, stored, actual)`` tuples.
+    """
+
+    results = []
+    for model in models:
+        using = router.db_for_write(RowCount)
+        with transaction.atomic(using=using):
+            actual = model._default_manager.using(using).count()
+            stored = RowCount.objects.using(using).filter(table=_label(model)).values_list('count', flat=True).first()
+            if not dry_run:
+                RowCount.objects.using(using).update_or_create(table=_label(model), defaults={'count': actual})
+        results.append((_label(model), stored, actual))
+    return results
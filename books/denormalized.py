@@ -0,0 +1,155 @@
+"""
+Denormalized columns: ``Book.author_name``, the name of the book's author,
+and ``Author.book_count``, the number of the author's books.
+
+Lists render them from the row itself, without a join or a COUNT per author.
+In exchange every write that changes them writes the copies too, in the same
+transaction:
+
+- A book created or given another author takes the author's name: from the
+  Author instance when it is loaded, else with one query for the whole batch
+  (``fill_author_names()``). The bulk paths copy it from the query that
+  checks the authors exist (``bulk.check_book_authors()``).
+- Renamed authors pass their new name on to their books (``rename_authors()``).
+- ``book_count`` follows the per-author entries books/stats.py records for
+  every book written, so it is adjusted wherever the rollups are: single
+  writes, the bulk paths, cascades and the catalog import. Authors with the
+  same change share one UPDATE (``adjust_book_counts()``).
+
+Both bump ``updated_at`` of the rows they change, which keys the fragment
+cache and the ETags, and drop them from the detail cache. Writes that skip
+the signals (raw SQL, ``QuerySet.update()``) leave the copies stale: the
+``reconcile_denormalized`` management command finds and repairs them.
+"""
+
+from django.db import router, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from books import cache
+from books.models import Author, Book
+
+# Authors per statement of rename_authors() / rebuild()
+BATCH_SIZE = 500
+
+
+def fill_author_names(books, using=None):
+    """
+    Set ``author_name`` of ``books`` (Book instances) from their author.
+    Authors not loaded with the book are looked up with one query. Returns
+    the books whose author does not exist, which get an empty name.
+    """
+
+    missing = []
+    for book in books:
+        if Book.author.is_cached(book) and book.author is not None and book.author.pk == book.author_id:
+            book.author_name = book.author.name
+        else:
+            missing.append(book)
+    if not missing:
+        return []
+    names = dict(
+        Author.objects.using(using).filter(pk__in={book.author_id for book in missing}).values_list('pk', 'name')
+    )
+    unknown = []
+    for book in missing:
+        book.author_name = names.get(book.author_id, '')
+        if book.author_id not in names:
+            unknown.append(book)
+    return unknown
+
+
+def _name_of_author():
+    return Subquery(Author.objects.filter(pk=OuterRef('author_id')).values('name')[:1])
+
+
+def _count_of_books():
+    return Coalesce(Subquery(
+        Book.objects.filter(author_id=OuterRef('pk')).order_by()
+        .values('author_id').annotate(count=Count('id')).values('count')
+    ), 0)
+
+
+def rename_authors(pks, using=None):
+    """
+    Copy the stored names of the authors ``pks`` to their books whose
+    ``author_name`` differs. Returns the number of books updated.
+    """
+
+    using = using or router.db_for_write(Book)
+    now = timezone.now()
+    renamed = 0
+    pks = list(pks)
+    for start in range(0, len(pks), BATCH_SIZE):
+        stale = Book.objects.using(using).filter(author_id__in=pks[start:start + BATCH_SIZE]).exclude(
+            author_name=_name_of_author()
+        )
+        ids = list(stale.values_list('pk', flat=True))
+        if ids:
+            renamed += Book.objects.using(using).filter(pk__in=ids).update(
+                author_name=_name_of_author(), updated_at=now
+            )
+            cache.invalidate(Book, ids)
+    return renamed
+
+
+def adjust_book_counts(deltas, using=None):
+    """
+    Add ``deltas`` (author id -> change in number of books) to the authors'
+    ``book_count``, with one UPDATE per distinct change.
+    """
+
+    by_delta = {}
+    for pk, delta in deltas.items():
+        if delta:
+            by_delta.setdefault(delta, []).append(pk)
+    if not by_delta:
+        return
+    using = using or router.db_for_write(Author)
+    now = timezone.now()
+    for delta, pks in by_delta.items():
+        Author.objects.using(using).filter(pk__in=pks).update(book_count=F('book_count') + delta, updated_at=now)
+    cache.invalidate(Author, [pk for pks in by_delta.values() for pk in pks])
+
+
+def stale_books(using=None):
+    """
+    The books whose ``author_name`` is not their author's name.
+    """
+
+    return Book.objects.using(using).exclude(author_name=_name_of_author())
+
+
+def stale_authors(using=None):
+    """
+    The authors whose ``book_count`` is not their number of books.
+    """
+
+    return Author.objects.using(using).alias(actual=_count_of_books()).filter(~Q(book_count=F('actual')))
+
+
+def _rewrite(model, ids, values, using):
+    now = timezone.now()
+    for start in range(0, len(ids), BATCH_SIZE):
+        batch = ids[start:start + BATCH_SIZE]
+        with transaction.atomic(using=using):
+            model.objects.using(using).filter(pk__in=batch).update(**values, updated_at=now)
+        cache.invalidate(model, batch)
+    return len(ids)
+
+
+def rebuild(using=None):
+    """
+    Rewrite the stale copies, in transactions of BATCH_SIZE rows. Returns
+    the number of ``(books, authors)`` repaired.
+    """
+
+    using = using or router.db_for_write(Book)
+    books = _rewrite(
+        Book, list(stale_books(using).values_list('pk', flat=True)), {'author_name': _name_of_author()}, using
+    )
+    authors = _rewrite(
+        Author, list(stale_authors(using).values_list('pk', flat=True)), {'book_count': _count_of_books()}, using
+    )
+    return books, authors
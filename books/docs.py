@@ -0,0 +1,37 @@
+"""
+The API docs stack (drf_yasg), loaded only when ``BOOKS_API_DOCS`` is on.
+
+books/views.py takes ``openapi`` and ``swagger_auto_schema`` from here. With
+the docs off they are stand-ins that accept the same arguments and keep
+nothing, so a process serving only the API never imports drf_yasg (nor the
+pkg_resources its ``__init__`` loads), and the URLconf has no /swagger/ or
+/redoc/ routes.
+"""
+
+from django.conf import settings
+
+
+def enabled():
+    return getattr(settings, 'BOOKS_API_DOCS', True)
+
+
+def _ignore(*args, **kwargs):
+    return None
+
+
+class _Openapi:
+    # openapi.Parameter(...), openapi.TYPE_STRING, ... all become _ignore
+    def __getattr__(self, name):
+        return _ignore
+
+
+def _swagger_auto_schema(**kwargs):
+    return lambda view_method: view_method
+
+
+if enabled():
+    from drf_yasg import openapi
+    from drf_yasg.utils import swagger_auto_schema
+else:
+    openapi = _Openapi()
+    swagger_auto_schema = _swagger_auto_schema
@@ -0,0 +1,78 @@
+"""
+Filtering and ordering of the book lists.
+
+Every filter and ordering below is served by an index of books_book (see
+``Book.Meta.indexes``), and ``python manage.py check_query_plans`` verifies
+with EXPLAIN QUERY PLAN that no combination of them falls back to a full
+table scan.
+"""
+
+from rest_framework import serializers
+
+ORDERING_FIELDS = ('id', 'title', 'price', 'published_date', 'author', 'author_name')
+ORDERINGS = [prefix + name for name in ORDERING_FIELDS for prefix in ('', '-')]
+
+
+def prefix_upper_bound(prefix):
+    # Strings compare by code point (BINARY collation on UTF-8), so the first
+    # string after every "<prefix>..." is the prefix with its last character
+    # bumped by one. U+10FFFF has no successor and is dropped, surrogates
+    # cannot be stored and are skipped; None when nothing is left to bump.
+    prefix = prefix.rstrip(chr(0x10FFFF))
+    if not prefix:
+        return None
+    code = ord(prefix[-1]) + 1
+    if 0xD800 <= code <= 0xDFFF:
+        code = 0xE000
+    return prefix[:-1] + chr(code)
+
+
+class BookFilterSerializer(serializers.Serializer):
+    author = serializers.IntegerField(required=False, min_value=1)
+    min_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    max_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    published_from = serializers.DateField(required=False)
+    published_to = serializers.DateField(required=False)
+    title_prefix = serializers.CharField(required=False, allow_blank=True, max_length=200, trim_whitespace=False)
+    ordering = serializers.ChoiceField(choices=ORDERINGS, default='id')
+
+    @property
+    def is_filtered(self):
+        # A blank parameter (?title_prefix=) filters nothing
+        return any(key != 'ordering' and value not in ('', None) for key, value in self.validated_data.items())
+
+    def filter_queryset(self, queryset):
+        """
+        ``queryset`` narrowed by the validated filters (ordering is not applied).
+        """
+
+        data = self.validated_data
+        if 'author' in data:
+            queryset = queryset.filter(author_id=data['author'])
+        if 'min_price' in data:
+            queryset = queryset.filter(price__gte=data['min_price'])
+        if 'max_price' in data:
+            queryset = queryset.filter(price__lte=data['max_price'])
+        if 'published_from' in data:
+            queryset = queryset.filter(published_date__gte=data['published_from'])
+        if 'published_to' in data:
+            queryset = queryset.filter(published_date__lte=data['published_to'])
+        if data.get('title_prefix'):
+            # A range rather than LIKE 'prefix%', which SQLite cannot answer
+            # from an index on a case-sensitive column
+            prefix = data['title_prefix']
+            queryset = queryset.filter(title__gte=prefix)
+            upper_bound = prefix_upper_bound(prefix)
+            if upper_bound is not None:
+                queryset = queryset.filter(title__lt=upper_bound)
+        return queryset
+
+    def order_by(self):
+        """
+        ``order_by()`` arguments for the ordering, with id as the tie-breaker.
+        """
+
+        ordering = self.validated_data['ordering']
+        if ordering.lstrip('-') == 'id':
+            return (ordering,)
+        return (ordering, '-id' if ordering.startswith('-') else 'id')
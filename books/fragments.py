@@ -0,0 +1,198 @@
+"""
+Per-row cache of the encoded JSON of list responses.
+
+Each entry is keyed by model and primary key and holds the row's
+``updated_at`` as stored, with the row's encoded JSON for each output
+(ValuesSerializer ``output_key``: fields and time zone) asked so far.
+``encode_rows()`` first reads only ``(id, updated_at)`` of the rows of a
+list; rows whose stamp matches their entry are taken as they are, the
+others are fetched in full, serialized, encoded and stored. The response
+data is an EncodedRows that FragmentJSONRenderer joins into the envelope,
+so a warm list costs one narrow query and a concatenation.
+
+Every write path stamps ``updated_at`` (``bulk_update`` included, see
+books/bulk.py), so a changed row always misses. Expanded outputs depend on
+related rows and are not cached. Settings::
+
+    BOOKS_FRAGMENT_CACHE = {'MAX_ENTRIES': 100000}
+
+MAX_ENTRIES rows per process, least recently used dropped first; 0 turns
+the cache off. Lists longer than that are rendered without it.
+"""
+
+import json
+import threading
+
+from django.conf import settings
+from django.db.models import CharField
+from django.db.models.functions import Cast
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+
+from books import metrics
+from books.cache import _MISSING, DummyCache, LocMemLRUCache
+from books.streaming import EncodedRows, _encode, encode_envelope
+
+DEFAULTS = {
+    'MAX_ENTRIES': 100000,
+}
+
+# The stamp as stored: compared, never parsed into a datetime
+STAMP = Cast('updated_at', output_field=CharField())
+
+# Past this share of stale rows, refetching the list itself is cheaper than
+# looking the rows up by id
+REFETCH_RATIO = 0.5
+
+# Ids per "id IN (...)" query, under SQLite's bound parameter limit
+ID_BATCH_SIZE = 500
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def config(name):
+    return getattr(settings, 'BOOKS_FRAGMENT_CACHE', {}).get(name, DEFAULTS[name])
+
+
+def fragment_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                max_entries = config('MAX_ENTRIES')
+                _cache = LocMemLRUCache(MAX_ENTRIES=max_entries, TIMEOUT=None) if max_entries else DummyCache()
+    return _cache
+
+
+def reset_fragment_cache():
+    global _cache
+    with _cache_lock:
+        _cache = None
+
+
+def enabled(values):
+    """
+    Whether the output of the ValuesSerializer ``values`` goes through the cache.
+    """
+
+    return not values.joined and not values.prefetched and not isinstance(fragment_cache(), DummyCache)
+
+
+class KeyPlan:
+    """
+    Stands in for a ValuesSerializer in KeysetPaginator, fetching only the
+    id, the sort key and the stamp (last) of each row.
+    """
+
+    def __init__(self, columns=('id',)):
+        self.columns = list(columns)
+
+    def including(self, *columns):
+        missing = [column for column in columns if column not in self.columns]
+        return KeyPlan([*self.columns, *missing]) if missing else self
+
+    def index(self, column):
+        return self.columns.index(column)
+
+    def rows(self, queryset):
+        return queryset.values_list(*self.columns, STAMP)
+
+
+def encode_rows(queryset, values):
+    """
+    The rows of ``queryset`` (ordered, possibly sliced) rendered through the
+    ValuesSerializer ``values``: an EncodedRows, or a list of dicts when the
+    output is not cached.
+    """
+
+    if not enabled(values):
+        return values.serialize(queryset)
+    keys = list(queryset.values_list('id', STAMP))
+    if len(keys) > fragment_cache().max_entries:
+        # It would only push its own rows out of the cache
+        return values.serialize(queryset)
+    return encode_keyed(keys, values, queryset)
+
+
+def encode_keyed(keys, values, queryset=None):
+    """
+    EncodedRows of the rows with these ``(id, stamp)`` ``keys``, in order.
+    Stale rows are fetched by id, or by running ``queryset`` (the one the
+    keys come from) again when most of them are.
+    """
+
+    cache = fragment_cache()
+    label = values.model._meta.label_lower
+    output = values.output_key
+    entries = cache.get_many([(label, pk) for pk, _ in keys])
+    encoded = []
+    # pk -> (stamp, its other outputs) of the rows to encode
+    stale = {}
+    for (pk, stamp), entry in zip(keys, entries):
+        if entry is not _MISSING and entry[0] == stamp:
+            fragment = entry[1].get(output)
+            outputs = entry[1]
+        else:
+            fragment, outputs = None, {}
+        encoded.append(fragment)
+        if fragment is None:
+            stale[pk] = (stamp, outputs)
+    cache.hits += len(keys) - len(stale)
+    cache.misses += len(stale)
+    if not stale:
+        return EncodedRows(encoded)
+
+    refetch = queryset is not None and len(stale) > len(keys) * REFETCH_RATIO
+    fresh = _encode_rows(list(stale), values, queryset if refetch else None)
+    cache.set_many(
+        ((label, pk), (stale[pk][0], {**stale[pk][1], output: fragment}))
+        for pk, fragment in fresh.items() if pk in stale
+    )
+    # Rows deleted since the keys were read are left out
+    return EncodedRows(
+        fragment if fragment is not None else fresh[pk]
+        for (pk, _), fragment in zip(keys, encoded)
+        if fragment is not None or pk in fresh
+    )
+
+
+def _encode_rows(pks, values, queryset=None):
+    # pk -> encoded row, for the stale ``pks``
+    if queryset is not None:
+        rows = list(values.rows(queryset))
+    else:
+        manager = values.model._base_manager
+        rows = []
+        for start in range(0, len(pks), ID_BATCH_SIZE):
+            rows.extend(values.rows(manager.filter(id__in=pks[start:start + ID_BATCH_SIZE]).order_by()))
+    data = values.serialize(rows)
+    id_index = values.index('id')
+    with metrics.timed('serialize'):
+        return {row[id_index]: _encode(item) for row, item in zip(rows, data)}
+
+
+class FragmentJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that joins an EncodedRows ``data`` into the envelope as it
+    is; the output is the same, byte for byte.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not isinstance(data, dict) or not isinstance(data.get("data"), EncodedRows):
+            return super().render(data, accepted_media_type, renderer_context)
+        formatted = self.get_indent(accepted_media_type, renderer_context or {}) or not self.compact
+        if formatted or self.ensure_ascii:
+            # Rare formatted output: decode and let JSONRenderer lay it out
+            rows = json.loads(b'[' + b','.join(data["data"]) + b']')
+            return super().render({**data, "data": rows}, accepted_media_type, renderer_context)
+        return encode_envelope(data)
+
+
+def renderer_classes(*extra):
+    """
+    The default renderers with FragmentJSONRenderer for JSONRenderer, then ``extra``.
+    """
+
+    defaults = [cls for cls in api_settings.DEFAULT_RENDERER_CLASSES if cls is not JSONRenderer]
+    return [FragmentJSONRenderer, *defaults, *extra]
@@ -0,0 +1,123 @@
+"""
+Background jobs for the writes too large to run inside a request.
+
+Deleting an author cascades to every one of their books and a bulk request
+can carry thousands of rows; written inside the request, they hold SQLite's
+write lock until the last row is done and every other writer waits. Past
+``INLINE_MAX_ROWS`` rows the views create a Job instead, answer 202 with its
+/api/jobs/<id>/ URL and hand the work to a pool of ``WORKERS`` threads of the
+same process. Jobs write in transactions of BOOKS_BULK_BATCH_SIZE rows
+(books/bulk.py), so the lock is released between chunks, and count the rows
+written so far in ``Job.done``. Between chunks a job sleeps ``PAUSE``
+seconds: a writer waiting on the lock polls for it (every 100 ms at most,
+SQLite's busy handler) and would otherwise find the job holding it again.
+
+Settings (``BOOKS_JOBS``)::
+
+    BOOKS_JOBS = {
+        'WORKERS': 2,
+        'INLINE_MAX_ROWS': 1000,
+        'PAUSE': 0.1,
+    }
+
+With WORKERS 0 a job runs in the request that submits it. The pool belongs
+to the server process: a job interrupted by a restart stays "running".
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from books import bulk
+from books.models import Job
+
+logger = logging.getLogger('books.jobs')
+
+DEFAULTS = {
+    'WORKERS': 2,
+    'INLINE_MAX_ROWS': 1000,
+    'PAUSE': 0.1,
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def config(name):
+    return getattr(settings, 'BOOKS_JOBS', {}).get(name, DEFAULTS[name])
+
+
+def executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(config('WORKERS'), thread_name_prefix='books-job')
+    return _executor
+
+
+def inline(rows):
+    """
+    Whether a write of ``rows`` rows is done in the request.
+    """
+
+    return rows <= config('INLINE_MAX_ROWS')
+
+
+def submit(kind, total, work, *args):
+    """
+    Create a Job of ``total`` rows running ``work(*args, progress=...)``,
+    which returns the job's (JSON) result, once the current transaction
+    commits.
+    """
+
+    job = Job.objects.create(kind=kind, total=total)
+    if config('WORKERS') == 0:
+        run(job.pk, work, args)
+        job.refresh_from_db()
+        return job
+    transaction.on_commit(lambda: executor().submit(_run_in_worker, job.pk, work, args))
+    return job
+
+
+def _run_in_worker(pk, work, args):
+    try:
+        run(pk, work, args)
+    finally:
+        # The worker thread's own connections
+        connections.close_all()
+
+
+def run(pk, work, args):
+    Job.objects.filter(pk=pk).update(status=Job.RUNNING, started_at=timezone.now())
+
+    def progress(rows):
+        Job.objects.filter(pk=pk).update(done=F('done') + rows)
+        time.sleep(config('PAUSE'))
+
+    try:
+        result = work(*args, progress=progress)
+    except Exception as e:
+        logger.exception("Job %s failed", pk)
+        Job.objects.filter(pk=pk).update(status=Job.FAILED, error=str(e), finished_at=timezone.now())
+    else:
+        Job.objects.filter(pk=pk).update(status=Job.SUCCEEDED, result=result, finished_at=timezone.now())
+
+
+def delete_author(pk, progress=None):
+    return {"id": pk, "deleted": bulk.delete_authors([pk], progress)}
+
+
+def bulk_write(operation, *args, progress=None):
+    """
+    ``operation`` (bulk.bulk_create / bulk_update / bulk_delete) as a job.
+    """
+
+    result = operation(*args, progress=progress)
+    return {"succeeded": result.succeeded, "failed": result.failed, "items": result.items}
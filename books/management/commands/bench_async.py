@@ -0,0 +1,147 @@
+import asyncio
+import datetime
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client, override_settings
+
+from books import counters
+from books.models import Author, Book
+
+SEED_DOMAIN = 'bench-async.example.com'
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare throughput and latency of the same read requests served "
+        "through the WSGI handler (one thread per concurrent client), through "
+        "the ASGI handler on the synchronous views, and through the ASGI "
+        "handler on the async views under /api/async/. Runs in-process against "
+        "the configured database; an empty catalog is seeded with --rows books "
+        "which are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help="Requests per mode (default 2000).")
+        parser.add_argument('--concurrency', type=int, default=64, help="Concurrent clients (default 64).")
+        parser.add_argument('--rows', type=int, default=2000, help="Books to seed into an empty catalog.")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed of the request mix.")
+
+    def handle(self, *args, **options):
+        seeded = False
+        if not Book.objects.exists():
+            self.seed(options['rows'])
+            seeded = True
+        try:
+            paths = self.request_mix(options['requests'], options['seed'])
+            concurrency = options['concurrency']
+            self.stdout.write(f"{len(paths)} requests, concurrency {concurrency}")
+            # The test clients send "Host: testserver"
+            with override_settings(ALLOWED_HOSTS=['testserver']):
+                self.report("WSGI  sync views", self.run_wsgi(paths, concurrency))
+                self.report("ASGI  sync views", asyncio.run(self.run_asgi(paths, concurrency)))
+                async_paths = [path.replace('/api/', '/api/async/', 1) for path in paths]
+                self.report("ASGI async views", asyncio.run(self.run_asgi(async_paths, concurrency)))
+        finally:
+            if seeded:
+                self.cleanup()
+
+    def request_mix(self, total, seed):
+        book_ids = list(Book.objects.values_list('id', flat=True)[:1000])
+        author_ids = list(Author.objects.values_list('id', flat=True)[:1000])
+        if not book_ids or not author_ids:
+            raise CommandError("The catalog needs at least one author and one book")
+        rng = random.Random(seed)
+        templates = [
+            lambda: f"/api/books/{rng.choice(book_ids)}/",
+            lambda: f"/api/authors/{rng.choice(author_ids)}/",
+            lambda: "/api/listing-all-books/?page_size=20",
+            lambda: "/api/listing-all-books/?page_size=20&ordering=-price&expand=author",
+            lambda: "/api/listing-all-authors/?page_size=10&expand=books",
+        ]
+        return [rng.choice(templates)() for _ in range(total)]
+
+    def run_wsgi(self, paths, concurrency):
+        latencies = []
+        lock = threading.Lock()
+
+        def worker(share):
+            client = Client()
+            timings = []
+            try:
+                for path in share:
+                    start = time.perf_counter()
+                    response = client.get(path)
+                    timings.append(time.perf_counter() - start)
+                    self.expect_ok(path, response)
+            finally:
+                connections.close_all()
+            with lock:
+                latencies.extend(timings)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as executor:
+            list(executor.map(worker, [paths[i::concurrency] for i in range(concurrency)]))
+        return len(paths) / (time.perf_counter() - start), latencies
+
+    async def run_asgi(self, paths, concurrency):
+        client = AsyncClient()
+        latencies = []
+
+        async def worker(share):
+            for path in share:
+                start = time.perf_counter()
+                response = await client.get(path)
+                latencies.append(time.perf_counter() - start)
+                self.expect_ok(path, response)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(paths[i::concurrency]) for i in range(concurrency)))
+        return len(paths) / (time.perf_counter() - start), latencies
+
+    def expect_ok(self, path, response):
+        if response.status_code != 200:
+            raise CommandError(f"GET {path} answered {response.status_code}")
+
+    def report(self, label, result):
+        throughput, latencies = result
+        latencies.sort()
+
+        def percentile(p):
+            return latencies[int(p * (len(latencies) - 1))] * 1000
+
+        self.stdout.write(
+            f"{label}  {throughput:>8,.0f} req/s  "
+            f"p50 {percentile(0.50):7.2f} ms  p95 {percentile(0.95):7.2f} ms  p99 {percentile(0.99):7.2f} ms"
+        )
+
+    def seed(self, rows):
+        authors = Author.objects.bulk_create(
+            Author(name=f"Bench author {i}", email=f"author-{i}@{SEED_DOMAIN}", bio="Seeded by bench_async")
+            for i in range(max(rows // 20, 1))
+        )
+        start = datetime.date(1950, 1, 1)
+        books = Book.objects.bulk_create(
+            (
+                Book(
+                    title=f"Bench book {i}",
+                    author=authors[i % len(authors)],
+                    published_date=start + datetime.timedelta(days=i % 25000),
+                    price=Decimal(i % 10000) / 100,
+                )
+                for i in range(rows)
+            ),
+            batch_size=1000,
+        )
+        # bulk_create() sends no signals
+        counters.adjust(Author, len(authors))
+        counters.adjust(Book, len(books))
+
+    def cleanup(self):
+        with counters.batch():
+            Author.objects.filter(email__endswith=f"@{SEED_DOMAIN}").delete()
@@ -0,0 +1,364 @@
+import datetime
+import itertools
+import json
+import platform
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from decimal import Decimal
+
+import django
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Max, Min
+from django.test import Client, override_settings
+from django.utils import timezone
+
+from books import counters
+from books.models import Author, Book
+from books.urls import urlpatterns
+
+# Rows created by the write scenarios, deleted again at the end of the run
+MARK = '@bench-endpoints.invalid'
+
+
+class Scenario:
+    """
+    Requests against one route: ``make(ctx)`` returns ``(path, body)``.
+    ``scale`` shrinks the number of requests of scenarios that read a whole
+    table per request.
+    """
+
+    def __init__(self, name, route, method, make, writes=False, scale=1.0):
+        self.name = name
+        self.route = route
+        self.method = method
+        self.make = make
+        self.writes = writes
+        self.scale = scale
+
+
+async def _drain(chunks):
+    async for _ in chunks:
+        pass
+
+
+def _book_payload(ctx):
+    return {
+        "title": f"Bench {next(ctx.serial)}",
+        "author": ctx.bench_author,
+        "published_date": "2001-02-03",
+        "price": "12.50",
+    }
+
+
+def _author_payload(ctx):
+    serial = next(ctx.serial)
+    return {"name": f"Bench {serial}", "email": f"author-{serial}{MARK}", "bio": "Created by bench_endpoints"}
+
+
+SCENARIOS = [
+    Scenario('authors.list', 'authors/', 'GET', lambda ctx: ("/api/authors/?stream=ndjson&fields=id,name", None),
+             scale=0.02),
+    Scenario('authors.detail', 'authors/<int:id>/', 'GET', lambda ctx: (f"/api/authors/{ctx.author()}/", None)),
+    Scenario('books.list', 'books/', 'GET', lambda ctx: (f"/api/books/?author={ctx.author()}", None)),
+    Scenario('books.list.filtered', 'books/', 'GET',
+             lambda ctx: ("/api/books/?min_price=10&max_price=10.50&ordering=-published_date", None)),
+    Scenario('books.detail', 'books/<int:id>/', 'GET', lambda ctx: (f"/api/books/{ctx.book()}/", None)),
+    Scenario('authors.page.offset', 'listing-all-authors/', 'POST',
+             lambda ctx: ("/api/listing-all-authors/", {"page": ctx.rng.randint(1, 50), "page_size": 20})),
+    Scenario('authors.page.cursor', 'listing-all-authors/', 'GET',
+             lambda ctx: ("/api/listing-all-authors/?page_size=20&expand=books", None)),
+    Scenario('books.page.offset', 'listing-all-books/', 'POST',
+             lambda ctx: ("/api/listing-all-books/", {"page": ctx.rng.randint(1, 50), "page_size": 20})),
+    Scenario('books.page.cursor', 'listing-all-books/', 'GET',
+             lambda ctx: ("/api/listing-all-books/?page_size=20&ordering=price&expand=author", None)),
+    Scenario('search', 'search/', 'GET',
+             lambda ctx: (f"/api/search/?q={ctx.rng.choice(['silent', 'garden', 'kafka', 'the lost'])}", None)),
+    Scenario('cache.stats', 'cache/stats/', 'GET', lambda ctx: ("/api/cache/stats/", None)),
+    Scenario('async.authors.list', 'async/authors/', 'GET',
+             lambda ctx: ("/api/async/authors/?stream=ndjson&fields=id,name", None), scale=0.02),
+    Scenario('async.authors.detail', 'async/authors/<int:id>/', 'GET',
+             lambda ctx: (f"/api/async/authors/{ctx.author()}/", None)),
+    Scenario('async.books.list', 'async/books/', 'GET', lambda ctx: (f"/api/async/books/?author={ctx.author()}", None)),
+    Scenario('async.books.detail', 'async/books/<int:id>/', 'GET', lambda ctx: (f"/api/async/books/{ctx.book()}/", None)),
+    Scenario('async.authors.page', 'async/listing-all-authors/', 'GET',
+             lambda ctx: ("/api/async/listing-all-authors/?page_size=20", None)),
+    Scenario('async.books.page', 'async/listing-all-books/', 'GET',
+             lambda ctx: ("/api/async/listing-all-books/?page_size=20&ordering=price", None)),
+    Scenario('authors.create', 'authors/', 'POST', lambda ctx: ("/api/authors/", _author_payload(ctx)), writes=True),
+    Scenario('authors.update', 'authors/<int:id>/', 'PUT',
+             lambda ctx: (f"/api/authors/{ctx.victim(Author)}/", _author_payload(ctx)), writes=True),
+    Scenario('authors.delete', 'authors/<int:id>/', 'DELETE',
+             lambda ctx: (f"/api/authors/{ctx.victim(Author)}/", None), writes=True),
+    Scenario('books.create', 'books/', 'POST', lambda ctx: ("/api/books/", _book_payload(ctx)), writes=True),
+    Scenario('books.update', 'books/<int:id>/', 'PUT',
+             lambda ctx: (f"/api/books/{ctx.victim(Book)}/", _book_payload(ctx)), writes=True),
+    Scenario('books.delete', 'books/<int:id>/', 'DELETE',
+             lambda ctx: (f"/api/books/{ctx.victim(Book)}/", None), writes=True),
+    Scenario('authors.bulk.create', 'authors/bulk/', 'POST',
+             lambda ctx: ("/api/authors/bulk/", [_author_payload(ctx) for _ in range(10)]), writes=True),
+    Scenario('authors.bulk.update', 'authors/bulk/', 'PUT',
+             lambda ctx: ("/api/authors/bulk/", [{"id": ctx.victim(Author), **_author_payload(ctx)} for _ in range(10)]),
+             writes=True),
+    Scenario('authors.bulk.delete', 'authors/bulk/', 'DELETE',
+             lambda ctx: ("/api/authors/bulk/", {"ids": [ctx.victim(Author) for _ in range(10)]}), writes=True),
+    Scenario('books.bulk.create', 'books/bulk/', 'POST',
+             lambda ctx: ("/api/books/bulk/", [_book_payload(ctx) for _ in range(10)]), writes=True),
+    Scenario('books.bulk.update', 'books/bulk/', 'PUT',
+             lambda ctx: ("/api/books/bulk/", [{"id": ctx.victim(Book), **_book_payload(ctx)} for _ in range(10)]),
+             writes=True),
+    Scenario('books.bulk.delete', 'books/bulk/', 'DELETE',
+             lambda ctx: ("/api/books/bulk/", {"ids": [ctx.victim(Book) for _ in range(10)]}), writes=True),
+]
+
+
+class Context:
+    """
+    Ids and fixtures the scenarios draw from; safe to share between threads.
+    """
+
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.serial = itertools.count(1)
+        self.book_ids = self.sample_ids(Book)
+        self.author_ids = self.sample_ids(Author)
+        if not self.book_ids or not self.author_ids:
+            raise CommandError("The catalog is empty; run generate_dataset first")
+        self.bench_author = None
+        self.victims = {Author: deque(), Book: deque()}
+
+    def sample_ids(self, model, size=2000):
+        bounds = model.objects.aggregate(low=Min('id'), high=Max('id'))
+        if bounds['low'] is None:
+            return []
+        candidates = {self.rng.randint(bounds['low'], bounds['high']) for _ in range(size)}
+        return sorted(model.objects.filter(id__in=candidates).values_list('id', flat=True))
+
+    def book(self):
+        with self.lock:
+            return self.rng.choice(self.book_ids)
+
+    def author(self):
+        with self.lock:
+            return self.rng.choice(self.author_ids)
+
+    def victim(self, model):
+        return self.victims[model].popleft()
+
+    def prepare_writes(self, scenarios, requests):
+        """
+        Create the rows the update/delete scenarios will consume.
+        """
+
+        needed = Counter()
+        for scenario in scenarios:
+            if scenario.method in ('PUT', 'DELETE'):
+                model = Author if scenario.name.startswith('authors') else Book
+                needed[model] += requests * (10 if '.bulk.' in scenario.name else 1)
+        stamp = timezone.now()
+        owner = Author.objects.create(name="Bench owner", email=f"owner-{stamp.timestamp()}{MARK}", bio="")
+        self.bench_author = owner.id
+        authors = Author.objects.bulk_create(
+            Author(name=f"Victim {i}", email=f"victim-{stamp.timestamp()}-{i}{MARK}", bio="")
+            for i in range(needed[Author])
+        )
+        books = Book.objects.bulk_create(
+            Book(title=f"Victim {i}", author=owner, published_date=datetime.date(2000, 1, 1), price=Decimal('1.00'))
+            for i in range(needed[Book])
+        )
+        # bulk_create() sends no signals
+        counters.adjust(Author, len(authors))
+        counters.adjust(Book, len(books))
+        self.victims[Author].extend(author.id for author in authors)
+        self.victims[Book].extend(book.id for book in books)
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test every route of books/urls.py at a given concurrency, in-process "
+        "(default) or against a running server (--url). Reports throughput, "
+        "p50/p95/p99 latency and, in-process, SQL queries per request; --output "
+        "saves the results as JSON and --compare diffs them against an earlier run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help="Requests per scenario (default 500).")
+        parser.add_argument('--concurrency', type=int, default=16, help="Concurrent clients (default 16).")
+        parser.add_argument('--url', help="Base URL of a running server, e.g. http://127.0.0.1:8000")
+        parser.add_argument('--only', nargs='*', default=[], help="Scenario name prefixes to run.")
+        parser.add_argument('--writes', action='store_true', help="Include the write scenarios.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help="Write the results to this JSON file.")
+        parser.add_argument('--compare', help="JSON results of an earlier run to compare with.")
+
+    def handle(self, *args, **options):
+        scenarios = [
+            scenario for scenario in SCENARIOS
+            if (options['writes'] or not scenario.writes)
+            and (not options['only'] or any(scenario.name.startswith(prefix) for prefix in options['only']))
+        ]
+        self.check_coverage()
+        ctx = Context(options['seed'])
+        if any(scenario.writes for scenario in scenarios):
+            ctx.prepare_writes(scenarios, options['requests'])
+
+        results = {}
+        try:
+            # The test client sends "Host: testserver"
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                for scenario in scenarios:
+                    results[scenario.name] = self.run(scenario, ctx, options)
+                    self.report(scenario.name, results[scenario.name])
+        finally:
+            if ctx.bench_author is not None:
+                with counters.batch():
+                    Author.objects.filter(email__endswith=MARK).delete()
+
+        payload = {"meta": self.meta(options), "results": results}
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(payload, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+        if options['compare']:
+            with open(options['compare']) as f:
+                self.compare(json.load(f)["results"], results)
+
+    def check_coverage(self):
+        covered = {scenario.route for scenario in SCENARIOS}
+        missing = [str(pattern.pattern) for pattern in urlpatterns if str(pattern.pattern) not in covered]
+        if missing:
+            self.stdout.write(self.style.WARNING(f"Routes without a scenario: {', '.join(missing)}"))
+
+    def run(self, scenario, ctx, options):
+        requests = [scenario.make(ctx) for _ in range(max(int(options['requests'] * scenario.scale), 1))]
+        concurrency = max(min(options['concurrency'], len(requests)), 1)
+        send = self.http_sender(options['url']) if options['url'] else self.client_sender()
+        latencies, queries, statuses = [], [], Counter()
+        lock = threading.Lock()
+
+        def worker(share):
+            timings, counts, codes = [], [], Counter()
+            try:
+                for path, body in share:
+                    count = [0]
+                    start = time.perf_counter()
+                    code = send(scenario.method, path, body, count)
+                    timings.append(time.perf_counter() - start)
+                    counts.append(count[0])
+                    codes[code] += 1
+            finally:
+                connections.close_all()
+            with lock:
+                latencies.extend(timings)
+                queries.extend(counts)
+                statuses.update(codes)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as executor:
+            list(executor.map(worker, [requests[i::concurrency] for i in range(concurrency)]))
+        elapsed = time.perf_counter() - start
+
+        latencies.sort()
+
+        def percentile(p):
+            return round(latencies[int(p * (len(latencies) - 1))] * 1000, 3)
+
+        return {
+            "method": scenario.method,
+            "route": scenario.route,
+            "requests": len(latencies),
+            "concurrency": concurrency,
+            "errors": sum(count for code, count in statuses.items() if code >= 400),
+            "statuses": {str(code): count for code, count in sorted(statuses.items())},
+            "throughput": round(len(latencies) / elapsed, 1),
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+            "queries_per_request": None if options['url'] else round(sum(queries) / len(queries), 2),
+        }
+
+    def client_sender(self):
+        local = threading.local()
+
+        def count_queries(counter):
+            def wrapper(execute, sql, params, many, context):
+                counter[0] += 1
+                return execute(sql, params, many, context)
+            return wrapper
+
+        def send(method, path, body, counter):
+            if not hasattr(local, 'client'):
+                local.client = Client(raise_request_exception=False)
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(count_queries(counter)))
+                response = getattr(local.client, method.lower())(
+                    path, json.dumps(body) if body is not None else None, content_type='application/json'
+                ) if method != 'GET' else local.client.get(path)
+                if not response.streaming:
+                    pass
+                elif hasattr(response.streaming_content, '__aiter__'):
+                    async_to_sync(_drain)(response.streaming_content)
+                else:
+                    for _ in response.streaming_content:
+                        pass
+            return response.status_code
+
+        return send
+
+    def http_sender(self, base_url):
+        def send(method, path, body, counter):
+            data = json.dumps(body).encode() if body is not None else None
+            request = urllib.request.Request(
+                base_url.rstrip('/') + path, data=data, method=method,
+                headers={'Content-Type': 'application/json'},
+            )
+            try:
+                with urllib.request.urlopen(request) as response:
+                    response.read()
+                    return response.status
+            except urllib.error.HTTPError as e:
+                return e.code
+
+        return send
+
+    def report(self, name, result):
+        queries = result['queries_per_request']
+        self.stdout.write(
+            f"{name:24} {result['throughput']:>9,.1f} req/s  p50 {result['p50_ms']:8.2f}  "
+            f"p95 {result['p95_ms']:8.2f}  p99 {result['p99_ms']:8.2f} ms  "
+            f"{'-' if queries is None else queries:>6} q/req"
+            + (self.style.ERROR(f"  {result['errors']} errors {result['statuses']}") if result['errors'] else "")
+        )
+
+    def compare(self, before, after):
+        self.stdout.write("\nChange against the earlier run (throughput, p95):")
+        for name, result in after.items():
+            old = before.get(name)
+            if not old:
+                continue
+            throughput = (result['throughput'] - old['throughput']) / old['throughput'] * 100
+            p95 = (result['p95_ms'] - old['p95_ms']) / old['p95_ms'] * 100 if old['p95_ms'] else 0
+            self.stdout.write(f"{name:24} {throughput:+7.1f}%  {p95:+7.1f}%")
+
+    def meta(self, options):
+        return {
+            "timestamp": timezone.now().isoformat(),
+            "target": options['url'] or "in-process",
+            "requests": options['requests'],
+            "concurrency": options['concurrency'],
+            "authors": Author.objects.count(),
+            "books": Book.objects.count(),
+            "settings": settings.SETTINGS_MODULE,
+            "python": platform.python_version(),
+            "django": django.get_version(),
+        }
@@ -0,0 +1,72 @@
+import datetime
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from books.models import Author, Book
+from books.serializers import AuthorSerializer, BookSerializer, ValuesSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare list serialization throughput (rows/sec) of the ModelSerializers "
+        "and the ValuesSerializer fast path. Rows are seeded in a transaction that "
+        "is rolled back, unless --existing is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20000, help="Books to seed (default 20000).")
+        parser.add_argument('--repeat', type=int, default=3, help="Runs per serializer, best is kept.")
+        parser.add_argument('--existing', action='store_true', help="Measure the rows already in the database.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if not options['existing']:
+                self.seed(options['rows'])
+            for label, serializer_class, model in (
+                ("books", BookSerializer, Book),
+                ("authors", AuthorSerializer, Author),
+            ):
+                queryset = model.objects.all()
+                total = queryset.count()
+                if not total:
+                    continue
+                before = self.best(lambda: serializer_class(queryset.all(), many=True).data, options['repeat'])
+                values = ValuesSerializer.for_serializer(serializer_class)
+                after = self.best(lambda: values.serialize(queryset.all()), options['repeat'])
+                self.stdout.write(
+                    f"{label:8} {total:>9} rows  "
+                    f"ModelSerializer {total / before:>11,.0f} rows/s  "
+                    f"ValuesSerializer {total / after:>11,.0f} rows/s  "
+                    f"x{before / after:.1f}"
+                )
+            transaction.set_rollback(True)
+
+    def best(self, func, repeat):
+        timings = []
+        for _ in range(max(repeat, 1)):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    def seed(self, rows):
+        authors = Author.objects.bulk_create(
+            Author(name=f"Bench author {i}", email=f"bench-{i}@example.com", bio="Seeded by bench_serializers")
+            for i in range(max(rows // 20, 1))
+        )
+        start = datetime.date(1950, 1, 1)
+        Book.objects.bulk_create(
+            (
+                Book(
+                    title=f"Bench book {i}",
+                    author=authors[i % len(authors)],
+                    published_date=start + datetime.timedelta(days=i % 25000),
+                    price=Decimal(i % 10000) / 100,
+                )
+                for i in range(rows)
+            ),
+            batch_size=1000,
+        )
@@ -0,0 +1,126 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+PROFILES = ['BookstoreAPI.settings', 'BookstoreAPI.settings_production', 'BookstoreAPI.settings_api']
+
+# Run in a fresh interpreter per profile and run: times the cold start up to
+# the first response, then the per-request cost of a few routes
+CHILD = r'''
+import json, resource, statistics, sys, time
+start = time.perf_counter()
+import django
+from django.conf import settings
+django.setup()
+setup = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+urlconf = time.perf_counter()
+from django.test import Client
+settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, 'testserver']
+client = Client()
+first = client.get('/api/stats/')
+ready = time.perf_counter()
+ready_at = time.time()
+modules = len(sys.modules)
+
+from books.models import Author, Book
+book = Book.objects.order_by('id').values_list('id', flat=True).first()
+author = Author.objects.order_by('id').values_list('id', flat=True).first()
+paths = {
+    'book detail': f'/api/books/{book}/',
+    'author detail': f'/api/authors/{author}/',
+    'books page': '/api/listing-all-books/?page_size=20',
+    'catalog stats': '/api/stats/',
+    'not found': '/api/books/0/',
+}
+requests = {}
+for name, path in paths.items():
+    client.get(path)
+    timings = []
+    for _ in range(REQUESTS):
+        begin = time.perf_counter()
+        client.get(path)
+        timings.append(time.perf_counter() - begin)
+    requests[name] = statistics.median(timings)
+print(json.dumps({
+    'status': first.status_code,
+    'setup': setup - start,
+    'urlconf': urlconf - setup,
+    'first_request': ready - urlconf,
+    'ready_at': ready_at,
+    'modules': modules,
+    'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'requests': requests,
+}))
+'''
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the cold start and per-request overhead of settings profiles. "
+        "Each run starts a fresh interpreter with DJANGO_SETTINGS_MODULE set to "
+        "the profile and times django.setup(), loading the URLconf and the first "
+        "request, then the median time of a few read routes through the test "
+        "client. Runs against each profile's own database; the production "
+        "profiles switch it to WAL mode."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'profiles', nargs='*', default=PROFILES,
+            help=f"Settings modules to compare (default: {', '.join(PROFILES)}).",
+        )
+        parser.add_argument('--runs', type=int, default=5, help="Interpreters started per profile (default 5).")
+        parser.add_argument('--requests', type=int, default=300, help="Requests per route and run (default 300).")
+
+    def handle(self, *args, **options):
+        results = {}
+        for profile in options['profiles']:
+            self.stdout.write(f"{profile}: {options['runs']} runs")
+            results[profile] = [self.run(profile, options['requests']) for _ in range(options['runs'])]
+
+        self.stdout.write("\nCold start, median of the runs (ms):")
+        width = max(len(profile) for profile in results)
+        self.stdout.write(
+            f"{'profile':<{width}}  {'process':>8}  {'setup':>7}  {'urlconf':>7}  {'1st req':>7}  "
+            f"{'modules':>7}  {'RSS MB':>6}"
+        )
+        for profile, runs in results.items():
+            def median(key):
+                return statistics.median(run[key] for run in runs)
+            self.stdout.write(
+                f"{profile:<{width}}  {median('process') * 1000:8.1f}  {median('setup') * 1000:7.1f}  "
+                f"{median('urlconf') * 1000:7.1f}  {median('first_request') * 1000:7.1f}  "
+                f"{median('modules'):7.0f}  {median('rss_mb'):6.1f}"
+            )
+
+        routes = list(next(iter(results.values()))[0]['requests'])
+        self.stdout.write("\nPer request, median (µs):")
+        self.stdout.write(f"{'profile':<{width}}  " + '  '.join(f'{route:>13}' for route in routes))
+        for profile, runs in results.items():
+            self.stdout.write(f"{profile:<{width}}  " + '  '.join(
+                f"{statistics.median(run['requests'][route] for run in runs) * 1e6:13.0f}" for route in routes
+            ))
+
+    def run(self, profile, requests):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': profile}
+        spawned = time.time()
+        completed = subprocess.run(
+            [sys.executable, '-c', CHILD.replace('REQUESTS', str(requests))],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if completed.returncode:
+            raise CommandError(f"{profile} failed:\n{completed.stderr}")
+        result = json.loads(completed.stdout.splitlines()[-1])
+        # From the spawn to the first response, interpreter start included
+        result['process'] = result['ready_at'] - spawned
+        if result['status'] != 200:
+            raise CommandError(f"{profile}: GET /api/stats/ answered {result['status']}")
+        return result
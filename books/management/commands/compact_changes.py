@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from books import changes
+
+
+class Command(BaseCommand):
+    help = (
+        "Compact the change log behind /api/changes/: drop the entries superseded by a "
+        "later change of the same row, and the delete tombstones older than --keep-days. "
+        "Mirrors whose cursor is older than the newest tombstone dropped must resync."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-days', type=int, default=None,
+            help="Keep the tombstones of the last N days (default BOOKS_CHANGES['TOMBSTONE_DAYS']).",
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        superseded, tombstones, horizon = changes.compact(options['keep_days'])
+        self.stdout.write(
+            f"Removed {superseded} superseded entries and {tombstones} tombstones in "
+            f"{time.perf_counter() - start:.2f}s; the feed answers cursors from {horizon} on"
+        )
@@ -0,0 +1,52 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from books import catalog
+
+
+class Command(BaseCommand):
+    help = (
+        "Write the whole catalog as a feed that import_catalog reads back: CSV "
+        "or NDJSON, one book with its author per row, then one row per author "
+        "without books. Rows are fetched in chunks and written as they come."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Output file, or - for stdout.")
+        parser.add_argument('--format', choices=catalog.FORMATS, help="Default: from the file extension.")
+        parser.add_argument('--chunk-size', type=int, default=2000, help="Rows fetched per query (default 2000).")
+        parser.add_argument('--progress-every', type=int, default=100_000, help="Report progress every N rows.")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or catalog.format_for(path)
+        if fmt is None:
+            raise CommandError("Cannot tell the feed format from the path; pass --format")
+        try:
+            stream = sys.stdout if path == '-' else open(path, 'w', newline='', encoding='utf-8')
+        except OSError as e:
+            raise CommandError(f"Cannot write {path}: {e}")
+        # Progress goes to stderr when the feed itself goes to stdout
+        report = self.stderr if stream is sys.stdout else self.stdout
+
+        start = time.perf_counter()
+        rows = 0
+        try:
+            writer = catalog.CatalogWriter(stream, fmt)
+            for row in catalog.export_rows(chunk_size=options['chunk_size']):
+                writer.write(row)
+                rows += 1
+                if rows % options['progress_every'] == 0:
+                    report.write(f"{rows} rows ({rows / (time.perf_counter() - start):,.0f} rows/s)")
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
+            else:
+                stream.flush()
+
+        elapsed = time.perf_counter() - start
+        report.write(self.style.SUCCESS(
+            f"Exported {rows} rows in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/s)"
+        ))
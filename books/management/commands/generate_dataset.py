@@ -0,0 +1,182 @@
+import datetime
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+
+from books import cache, changes, counters, denormalized, search, stats
+from books.models import Author, AuthorStats, Book, YearStats
+
+SIZES = {'10k': 10_000, '1m': 1_000_000, '10m': 10_000_000}
+
+FIRST_NAMES = [
+    'Ada', 'Bram', 'Clara', 'Dmitri', 'Elena', 'Farid', 'Grace', 'Haruki', 'Ines', 'Jonas',
+    'Kemi', 'Leo', 'Maya', 'Nikolai', 'Olga', 'Pablo', 'Quinn', 'Rosa', 'Soren', 'Tove',
+]
+LAST_NAMES = [
+    'Achebe', 'Borges', 'Calvino', 'Duras', 'Eco', 'Ferrante', 'Grass', 'Hesse', 'Ishiguro', 'Joyce',
+    'Kafka', 'Lessing', 'Mann', 'Nabokov', 'Oz', 'Pamuk', 'Queneau', 'Rushdie', 'Saramago', 'Tolstoy',
+]
+ADJECTIVES = [
+    'Silent', 'Crimson', 'Hidden', 'Last', 'Broken', 'Golden', 'Distant', 'Burning', 'Quiet', 'Endless',
+    'Lost', 'Secret', 'Winter', 'Bitter', 'Wandering', 'Glass', 'Iron', 'Paper', 'Hollow', 'Northern',
+]
+NOUNS = [
+    'River', 'Garden', 'Empire', 'Letter', 'Harbor', 'Forest', 'Mirror', 'Island', 'Library', 'Station',
+    'Orchard', 'Lantern', 'Kingdom', 'Voyage', 'Window', 'Mountain', 'Archive', 'Bridge', 'Tide', 'Atlas',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill an empty catalog with a reproducible synthetic dataset: the same "
+        "--seed and size always give the same rows and ids. Rows are written "
+        "with multi-row inserts in large transactions; the row counters, search "
+        "index, statistics rollups, denormalized author columns and planner "
+        "statistics are rebuilt at the end. The change log is emptied rather than "
+        "filled: mirrors of /api/changes/ get 410 and resync."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('size', nargs='?', choices=sorted(SIZES), default='10k', help="Number of books.")
+        parser.add_argument('--books', type=int, help="Exact number of books (overrides size).")
+        parser.add_argument('--books-per-author', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=50_000, help="Rows per transaction.")
+        parser.add_argument('--clear', action='store_true', help="Delete the existing catalog first.")
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        using = options['database']
+        connection = connections[using]
+        total_books = options['books'] if options['books'] is not None else SIZES[options['size']]
+        total_authors = max(total_books // max(options['books_per_author'], 1), 1)
+
+        if Author.objects.using(using).exists() or Book.objects.using(using).exists():
+            if not options['clear']:
+                raise CommandError("The catalog is not empty; pass --clear to replace it")
+        start = time.perf_counter()
+
+        # The search triggers would index row by row and the secondary indexes
+        # take random inserts; both are rebuilt in bulk once the rows are in.
+        # The change log triggers would log every row: the log is emptied
+        # instead and the mirrors resync from the lists (books/changes.py)
+        changes.uninstall(connection)
+        try:
+            self.load(connection, using, options, total_authors, total_books)
+        finally:
+            changes.reset(using)
+            changes.install(connection)
+        cache.detail_cache().clear()
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {total_authors} authors and {total_books} books in {time.perf_counter() - start:.1f}s"
+        ))
+
+    def load(self, connection, using, options, total_authors, total_books):
+        """
+        Write the rows, then rebuild everything derived from them.
+        """
+
+        search.uninstall(connection)
+        indexes = self.drop_indexes(connection, [Author, Book])
+        try:
+            if options['clear']:
+                with transaction.atomic(using=using), connection.cursor() as cursor:
+                    cursor.execute(f"DELETE FROM {AuthorStats._meta.db_table}")
+                    cursor.execute(f"DELETE FROM {YearStats._meta.db_table}")
+                    cursor.execute(f"DELETE FROM {Book._meta.db_table}")
+                    cursor.execute(f"DELETE FROM {Author._meta.db_table}")
+
+            rng = random.Random(options['seed'])
+            now = timezone.now()
+            self.insert(connection, Author, ['id', 'name', 'email', 'bio', 'created_at', 'updated_at'],
+                        self.authors(connection.ops, rng, total_authors, now), total_authors, options['batch_size'])
+            # Books are written with their author_name; book_count is counted at the end
+            names = dict(Author.objects.using(using).values_list('id', 'name'))
+            self.insert(connection, Book,
+                        ['id', 'title', 'author_id', 'author_name', 'published_date', 'price', 'created_at', 'updated_at'],
+                        self.books(connection.ops, rng, total_books, names, now), total_books, options['batch_size'])
+        finally:
+            self.stdout.write(f"Rebuilding {len(indexes)} indexes and the search index...")
+            with connection.cursor() as cursor:
+                for sql in indexes:
+                    cursor.execute(sql)
+            with transaction.atomic(using=using):
+                search.rebuild(connection)
+
+        counters.reconcile([Author, Book])
+        stats.rebuild()
+        denormalized.rebuild()
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+
+    def drop_indexes(self, connection, models):
+        """
+        Drop the secondary indexes of ``models``' tables, returning the SQL
+        that recreates them. Only done on SQLite.
+        """
+
+        if connection.vendor != 'sqlite':
+            return []
+        tables = [model._meta.db_table for model in models]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL "
+                "AND tbl_name IN (%s)" % ', '.join(['%s'] * len(tables)),
+                tables,
+            )
+            indexes = cursor.fetchall()
+            for name, _ in indexes:
+                cursor.execute(f"DROP INDEX {connection.ops.quote_name(name)}")
+        return [sql for _, sql in indexes]
+
+    def authors(self, ops, rng, total, now):
+        stamp = ops.adapt_datetimefield_value(now)
+        for pk in range(1, total + 1):
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            noun, other = rng.choice(NOUNS), rng.choice(NOUNS)
+            yield (
+                pk,
+                f"{first} {last}",
+                f"{first}.{last}.{pk}@example.org".lower(),
+                f"{first} {last} writes about the {noun.lower()} and the {other.lower()}.",
+                stamp,
+                stamp,
+            )
+
+    def books(self, ops, rng, total, names, now):
+        stamp = ops.adapt_datetimefield_value(now)
+        epoch = datetime.date(1900, 1, 1)
+        for pk in range(1, total + 1):
+            cents = rng.randrange(99, 20000)
+            title = f"The {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {pk}"
+            author_id = rng.randrange(len(names)) + 1
+            yield (
+                pk,
+                title,
+                author_id,
+                names[author_id],
+                ops.adapt_datefield_value(epoch + datetime.timedelta(days=rng.randrange(45000))),
+                ops.adapt_decimalfield_value(Decimal(cents).scaleb(-2), 10, 2),
+                stamp,
+                stamp,
+            )
+
+    def insert(self, connection, model, columns, rows, total, batch_size):
+        table = connection.ops.quote_name(model._meta.db_table)
+        sql = "INSERT INTO %s (%s) VALUES (%s)" % (
+            table, ', '.join(connection.ops.quote_name(c) for c in columns), ', '.join(['%s'] * len(columns))
+        )
+        start = time.perf_counter()
+        done = 0
+        while done < total:
+            batch = [row for _, row in zip(range(batch_size), rows)]
+            with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+                cursor.executemany(sql, batch)
+            done += len(batch)
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f"{model._meta.verbose_name_plural}: {done}/{total} ({done / elapsed:,.0f} rows/s)")
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from drf_yasg.renderers import OpenAPIRenderer, SwaggerYAMLRenderer
+
+from books import docs, openapi
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the OpenAPI spec served by /swagger/ and /redoc/ and save it in "
+        "BOOKS_SCHEMA['DIR'] under the current code version, so no server "
+        "process has to build it. Run it on deploy."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--yaml', action='store_true', help="Also save the YAML encoding.")
+
+    def handle(self, *args, **options):
+        if not docs.enabled():
+            raise CommandError("The API docs are off (BOOKS_API_DOCS), there is no spec to build")
+        if openapi.config('DIR') is None:
+            raise CommandError("Set BOOKS_SCHEMA['DIR'] to where the spec should be saved")
+        start = time.perf_counter()
+        schema = openapi.schema_view_class().generate()
+        for renderer in (OpenAPIRenderer, SwaggerYAMLRenderer) if options['yaml'] else (OpenAPIRenderer,):
+            path = openapi.write(renderer().render(schema), openapi.extension(renderer))
+            self.stdout.write(f"Wrote {path}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Schema version {openapi.code_version()} built in {time.perf_counter() - start:.2f}s"
+        ))
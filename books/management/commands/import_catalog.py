@@ -0,0 +1,59 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from books import catalog
+
+
+class Command(BaseCommand):
+    help = (
+        "Load a catalog feed (CSV or NDJSON, one book with its author per row) "
+        "in batched transactions. Authors are upserted on their email, books "
+        "with an id on their id; other books are created. Reads the file line "
+        "by line, so feeds of any size fit in memory."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Feed file, or - for stdin.")
+        parser.add_argument('--format', choices=catalog.FORMATS, help="Default: from the file extension.")
+        parser.add_argument('--batch-size', type=int, default=2000, help="Rows per transaction (default 2000).")
+        parser.add_argument('--show-errors', type=int, default=20, help="Rejected rows to list (default 20).")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or catalog.format_for(path)
+        if fmt is None:
+            raise CommandError("Cannot tell the feed format from the path; pass --format")
+        try:
+            stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        except OSError as e:
+            raise CommandError(f"Cannot read {path}: {e}")
+
+        start = time.perf_counter()
+
+        def progress(result):
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f"{result.rows} rows ({result.rows / elapsed:,.0f} rows/s), "
+                              f"{len(result.errors)} rejected")
+
+        try:
+            importer = catalog.CatalogImporter(batch_size=options['batch_size'])
+            result = importer.run(catalog.read_rows(stream, fmt), progress)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        for number, errors in result.errors[:options['show_errors']]:
+            self.stderr.write(f"Line {number}: {errors}")
+        if len(result.errors) > options['show_errors']:
+            self.stderr.write(f"... and {len(result.errors) - options['show_errors']} more rejected rows")
+
+        elapsed = time.perf_counter() - start
+        style = self.style.WARNING if result.errors else self.style.SUCCESS
+        self.stdout.write(style(
+            f"Imported {result.rows - len(result.errors)}/{result.rows} rows in {elapsed:.1f}s "
+            f"({result.rows / elapsed:,.0f} rows/s): authors {result.authors_created} created, "
+            f"{result.authors_updated} updated; books {result.books_created} created, "
+            f"{result.books_updated} updated"
+        ))
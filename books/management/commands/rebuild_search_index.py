@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from books import search
+
+
+class Command(BaseCommand):
+    help = "Recreate the FTS5 search index (and its triggers) from the books and authors tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help="Database alias to reindex.")
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if not search.supported(connection):
+            raise CommandError("The search index needs an SQLite database with FTS5.")
+        start = time.perf_counter()
+        with transaction.atomic(using=options['database']):
+            books, authors = search.rebuild(connection)
+        self.stdout.write(
+            f"Indexed {books} books and {authors} authors in {time.perf_counter() - start:.2f}s"
+        )
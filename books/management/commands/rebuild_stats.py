@@ -0,0 +1,16 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from books import stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the per-author and per-year statistics rollups from the books table."
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        authors, years = stats.rebuild()
+        self.stdout.write(
+            f"Rebuilt {authors} author and {years} year rollups in {time.perf_counter() - start:.2f}s"
+        )
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from books import counters
+from books.models import Author, Book
+
+
+class Command(BaseCommand):
+    help = "Recount the Author and Book tables and repair the maintained row counters."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Report drift without writing the corrected counts.",
+        )
+
+    def handle(self, *args, **options):
+        for label, stored, actual in counters.reconcile([Author, Book], dry_run=options['dry_run']):
+            if stored == actual:
+                self.stdout.write(f"{label}: {actual} (ok)")
+            else:
+                self.stdout.write(self.style.WARNING(f"{label}: stored {stored}, actual {actual}"))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from books import denormalized
+
+
+class Command(BaseCommand):
+    help = (
+        "Check the denormalized Book.author_name and Author.book_count columns against the "
+        "authors and books tables and repair the stale rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Report the stale rows without rewriting them.",
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        if options['dry_run']:
+            books, authors = denormalized.stale_books().count(), denormalized.stale_authors().count()
+        else:
+            books, authors = denormalized.rebuild()
+        for label, stale in (('Book.author_name', books), ('Author.book_count', authors)):
+            if stale:
+                verb = 'stale' if options['dry_run'] else 'repaired'
+                self.stdout.write(self.style.WARNING(f"{label}: {stale} rows {verb}"))
+            else:
+                self.stdout.write(f"{label}: ok")
+        self.stdout.write(f"Checked in {time.perf_counter() - start:.2f}s")
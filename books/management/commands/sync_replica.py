@@ -0,0 +1,50 @@
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from books.routers import replica_alias
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary SQLite database onto the read replica file with "
+        "SQLite's online backup API. Readers of the replica keep seeing the "
+        "previous copy until the new one is complete."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float,
+            help="Keep running and copy again every INTERVAL seconds.",
+        )
+        parser.add_argument('--replica', help="Replica alias (default BOOKS_READ_REPLICA).")
+
+    def handle(self, *args, **options):
+        alias = options['replica'] or replica_alias()
+        if not alias or alias not in connections:
+            raise CommandError("No read replica is configured (BOOKS_READ_REPLICA / --replica)")
+        primary, replica = connections[DEFAULT_DB_ALIAS], connections[alias]
+        if primary.vendor != 'sqlite' or replica.vendor != 'sqlite':
+            raise CommandError("sync_replica copies SQLite files only")
+        if primary.settings_dict['NAME'] == replica.settings_dict['NAME']:
+            raise CommandError("The replica and the primary are the same file")
+
+        while True:
+            start = time.perf_counter()
+            self.copy(primary.settings_dict['NAME'], replica.settings_dict['NAME'])
+            self.stdout.write(f"Copied {primary.settings_dict['NAME']} to {replica.settings_dict['NAME']} "
+                              f"in {time.perf_counter() - start:.2f}s")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def copy(self, source_name, target_name):
+        source = sqlite3.connect(source_name)
+        target = sqlite3.connect(target_name)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
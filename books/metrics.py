@@ -0,0 +1,305 @@
+"""
+Per-request performance instrumentation.
+
+``books.middleware.instrumentation_middleware`` opens a RequestStats for each
+request; the execute wrapper that books/signals.py installs on every
+database connection adds each query's count and time to it, and
+``timed('serialize')`` blocks add the time spent turning rows into data
+(database time inside them is not counted twice). When the response leaves
+the middleware it gets a ``Server-Timing`` header and the numbers feed the
+histograms that ``/metrics`` exposes in the Prometheus text format.
+
+A sample (``SLOW_SAMPLE_RATE``) of the requests also records the SQL they
+run; when one of those is slower than ``SLOW_REQUEST_MS`` it is logged to
+the ``books.slow_requests`` logger and kept among the ``SLOW_LOG_SIZE``
+slowest, listed by /api/metrics/slow/. That list shows other requests' SQL
+and is served to staff only, unless ``EXPOSE_SLOW_REQUESTS`` (by default
+``DEBUG``).
+
+Settings (``BOOKS_METRICS``)::
+
+    BOOKS_METRICS = {
+        'ENABLED': True,
+        'SLOW_REQUEST_MS': 500,
+        'SLOW_SAMPLE_RATE': 0.1,
+        'SLOW_LOG_SIZE': 50,
+        'EXPOSE_SLOW_REQUESTS': None,
+    }
+
+Metrics are per process. Streamed bodies are produced after the middleware
+returns, so their queries and size are not part of the numbers.
+"""
+
+import bisect
+import heapq
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.http import HttpResponse
+
+logger = logging.getLogger('books.slow_requests')
+
+DEFAULTS = {
+    'ENABLED': True,
+    'SLOW_REQUEST_MS': 500,
+    'SLOW_SAMPLE_RATE': 0.1,
+    'SLOW_LOG_SIZE': 50,
+    'EXPOSE_SLOW_REQUESTS': None,
+}
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_current = ContextVar('request_stats', default=None)
+
+
+def config(name):
+    return getattr(settings, 'BOOKS_METRICS', {}).get(name, DEFAULTS[name])
+
+
+def slow_requests_exposed(user):
+    """
+    Whether ``user`` may read the slow request log. ``user`` is None without
+    django.contrib.auth (BookstoreAPI/settings_api.py).
+    """
+
+    expose = config('EXPOSE_SLOW_REQUESTS')
+    return getattr(user, 'is_staff', False) or (settings.DEBUG if expose is None else bool(expose))
+
+
+class RequestStats:
+    __slots__ = ('start', 'queries', 'db_time', 'serialize_time', 'sql')
+
+    def __init__(self, record_sql=False):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        # (sql, seconds) of every query, for sampled requests only
+        self.sql = [] if record_sql else None
+
+
+@contextmanager
+def measure(record_sql=False):
+    """
+    Collect the RequestStats of the block.
+    """
+
+    stats = RequestStats(record_sql)
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Connection execute wrapper adding each query to the current RequestStats.
+    """
+
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        stats.queries += 1
+        stats.db_time += elapsed
+        if stats.sql is not None:
+            stats.sql.append((sql, elapsed))
+
+
+@contextmanager
+def timed(segment):
+    """
+    Add the time of the block, less its database time, to ``segment``
+    ("serialize") of the current request.
+    """
+
+    stats = _current.get()
+    if stats is None:
+        yield
+        return
+    start, db_time = time.perf_counter(), stats.db_time
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start - (stats.db_time - db_time)
+        setattr(stats, f'{segment}_time', getattr(stats, f'{segment}_time') + elapsed)
+
+
+class Histogram:
+    """
+    Prometheus histogram with one series per label value tuple.
+    """
+
+    def __init__(self, name, documentation, labels, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_values, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((key, (counts[:], total)) for key, (counts, total) in self._series.items())
+        for label_values, (counts, total) in series:
+            labels = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(self.labels, label_values))
+            cumulative = 0
+            for bound, count in zip([*self.buckets, '+Inf'], counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{labels}}} {total}')
+            lines.append(f'{self.name}_count{{{labels}}} {cumulative}')
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+SECONDS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HISTOGRAMS = {
+    'duration': Histogram(
+        'bookstore_request_duration_seconds', "Wall time of a request, until the response headers.",
+        ('route', 'method', 'status'), SECONDS,
+    ),
+    'db_time': Histogram(
+        'bookstore_request_db_duration_seconds', "Time spent in database queries per request.",
+        ('route', 'method'), SECONDS,
+    ),
+    'queries': Histogram(
+        'bookstore_request_db_queries', "Database queries per request.",
+        ('route', 'method'), (0, 1, 2, 3, 5, 10, 20, 50, 100),
+    ),
+    'serialize_time': Histogram(
+        'bookstore_request_serialize_duration_seconds', "Time spent serializing rows per request.",
+        ('route', 'method'), SECONDS,
+    ),
+    'size': Histogram(
+        'bookstore_response_size_bytes', "Size of the (non-streamed) response bodies.",
+        ('route', 'method'), (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+    ),
+}
+
+_slow = []
+_slow_lock = threading.Lock()
+_slow_serial = 0
+
+
+def route_of(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.route if match is not None else 'unmatched'
+
+
+def should_sample():
+    rate = config('SLOW_SAMPLE_RATE')
+    return rate >= 1 or (rate > 0 and random.random() < rate)
+
+
+def finish(request, response, stats):
+    """
+    Add ``stats`` to the histograms and the Server-Timing header of ``response``.
+    """
+
+    elapsed = time.perf_counter() - stats.start
+    route, method = route_of(request), request.method
+    HISTOGRAMS['duration'].observe((route, method, str(response.status_code)), elapsed)
+    HISTOGRAMS['db_time'].observe((route, method), stats.db_time)
+    HISTOGRAMS['queries'].observe((route, method), stats.queries)
+    HISTOGRAMS['serialize_time'].observe((route, method), stats.serialize_time)
+    if not response.streaming:
+        HISTOGRAMS['size'].observe((route, method), len(response.content))
+
+    response['Server-Timing'] = (
+        f'app;dur={elapsed * 1000:.2f}, '
+        f'db;dur={stats.db_time * 1000:.2f};desc="{stats.queries} queries", '
+        f'ser;dur={stats.serialize_time * 1000:.2f}'
+    )
+    if stats.sql is not None and elapsed * 1000 >= config('SLOW_REQUEST_MS'):
+        record_slow(request, response, stats, elapsed)
+    return response
+
+
+def record_slow(request, response, stats, elapsed):
+    global _slow_serial
+    entry = {
+        "path": request.get_full_path(),
+        "method": request.method,
+        "route": route_of(request),
+        "status": response.status_code,
+        "duration_ms": round(elapsed * 1000, 2),
+        "db_ms": round(stats.db_time * 1000, 2),
+        "serialize_ms": round(stats.serialize_time * 1000, 2),
+        "queries": [{"sql": sql, "ms": round(seconds * 1000, 3)} for sql, seconds in stats.sql],
+    }
+    logger.warning(
+        "Slow request %s %s: %.1f ms, %d queries in %.1f ms",
+        entry["method"], entry["path"], entry["duration_ms"], stats.queries, entry["db_ms"],
+        extra={"slow_request": entry},
+    )
+    with _slow_lock:
+        _slow_serial += 1
+        # Min-heap on duration: the fastest of the kept entries is dropped first
+        item = (entry["duration_ms"], _slow_serial, entry)
+        if len(_slow) < config('SLOW_LOG_SIZE'):
+            heapq.heappush(_slow, item)
+        else:
+            heapq.heappushpop(_slow, item)
+
+
+def slow_requests():
+    """
+    The slowest sampled requests, slowest first.
+    """
+
+    with _slow_lock:
+        return [entry for _, _, entry in sorted(_slow, reverse=True)]
+
+
+def reset():
+    for histogram in HISTOGRAMS.values():
+        histogram.clear()
+    with _slow_lock:
+        _slow.clear()
+
+
+def render():
+    lines = []
+    for histogram in HISTOGRAMS.values():
+        lines.extend(histogram.render())
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """
+    Histograms of this process in the Prometheus text exposition format.
+
+    - Method: GET
+    - URL: /metrics
+    """
+
+    return HttpResponse(render(), content_type=PROMETHEUS_CONTENT_TYPE)
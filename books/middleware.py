@@ -0,0 +1,50 @@
+from asgiref.sync import iscoroutinefunction
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.decorators import sync_and_async_middleware
+
+from books import metrics, routers
+
+READ_ONLY_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+@sync_and_async_middleware
+def instrumentation_middleware(get_response):
+    """
+    Time each request, count its queries and serialization time, and add a
+    Server-Timing header; see books/metrics.py. Keep it near the top of
+    MIDDLEWARE so the other middleware is part of the request's time.
+    """
+
+    if not metrics.config('ENABLED'):
+        raise MiddlewareNotUsed
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            with metrics.measure(metrics.should_sample()) as stats:
+                response = await get_response(request)
+            return metrics.finish(request, response, stats)
+    else:
+        def middleware(request):
+            with metrics.measure(metrics.should_sample()) as stats:
+                response = get_response(request)
+            return metrics.finish(request, response, stats)
+    return middleware
+
+
+@sync_and_async_middleware
+def read_replica_middleware(get_response):
+    """
+    Flag read-only requests so ReadReplicaRouter serves their reads from the
+    replica. Streaming bodies are produced after the flag is cleared and read
+    from the primary.
+    """
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            with routers.read_only(request.method in READ_ONLY_METHODS):
+                return await get_response(request)
+    else:
+        def middleware(request):
+            with routers.read_only(request.method in READ_ONLY_METHODS):
+                return get_response(request)
+    return middleware
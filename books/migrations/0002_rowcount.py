@@ -0,0 +1,32 @@
+# Generated by Django 5.0.2 on 2026-10-16 23:36
+
+from django.db import migrations, models
+
+
+def seed_row_counts(apps, schema_editor):
+    RowCount = apps.get_model('books', 'RowCount')
+    db_alias = schema_editor.connection.alias
+    for name in ('Author', 'Book'):
+        model = apps.get_model('books', name)
+        RowCount.objects.using(db_alias).create(
+            table=f'books.{name}', count=model.objects.using(db_alias).count()
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RowCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table', models.CharField(max_length=100, unique=True)),
+                ('count', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(seed_row_counts, migrations.RunPython.noop),
+    ]
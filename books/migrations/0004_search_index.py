@@ -0,0 +1,50 @@
+# Generated by Django 5.0.2 on 2026-10-16 23:45
+
+from django.db import migrations
+
+# The FTS tables as this migration created them; the triggers that keep them
+# in step are not part of the migration state, books/signals.py installs
+# them after every migrate (and reindexes both tables)
+TABLES = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS books_book_fts USING fts5(title, author_name)",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS books_author_fts USING fts5(name, bio)",
+]
+
+TRIGGERS = [
+    'books_book_fts_insert', 'books_book_fts_update', 'books_book_fts_delete', 'books_author_fts_insert',
+    'books_author_fts_update', 'books_author_fts_rename', 'books_author_fts_delete',
+]
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in TABLES:
+        schema_editor.execute(sql)
+    schema_editor.execute(
+        "INSERT INTO books_book_fts(rowid, title, author_name) "
+        "SELECT b.id, b.title, a.name FROM books_book b JOIN books_author a ON a.id = b.author_id"
+    )
+    schema_editor.execute(
+        "INSERT INTO books_author_fts(rowid, name, bio) SELECT id, name, bio FROM books_author"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for name in TRIGGERS:
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {name}")
+    schema_editor.execute("DROP TABLE IF EXISTS books_book_fts")
+    schema_editor.execute("DROP TABLE IF EXISTS books_author_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0003_updated_at_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
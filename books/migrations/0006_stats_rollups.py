@@ -0,0 +1,60 @@
+# Generated by Django 5.0.2 on 2026-10-17 00:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import ExtractYear
+
+
+def seed_stats(apps, schema_editor):
+    Author = apps.get_model('books', 'Author')
+    Book = apps.get_model('books', 'Book')
+    AuthorStats = apps.get_model('books', 'AuthorStats')
+    YearStats = apps.get_model('books', 'YearStats')
+    db_alias = schema_editor.connection.alias
+    aggregates = dict(book_count=Count('id'), price_sum=Sum('price'), price_min=Min('price'), price_max=Max('price'))
+    books = Book.objects.using(db_alias).order_by()
+    AuthorStats.objects.using(db_alias).bulk_create(
+        [AuthorStats(**row) for row in books.values('author_id').annotate(**aggregates)], batch_size=5000,
+    )
+    AuthorStats.objects.using(db_alias).bulk_create(
+        [AuthorStats(author_id=pk) for pk in Author.objects.using(db_alias).filter(book__isnull=True).values_list('id', flat=True)],
+        batch_size=5000,
+    )
+    YearStats.objects.using(db_alias).bulk_create(
+        [YearStats(**row) for row in books.annotate(year=ExtractYear('published_date')).values('year').annotate(**aggregates)],
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0005_book_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='YearStats',
+            fields=[
+                ('year', models.IntegerField(primary_key=True, serialize=False)),
+                ('book_count', models.BigIntegerField(default=0)),
+                ('price_sum', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('price_min', models.DecimalField(decimal_places=2, max_digits=10, null=True)),
+                ('price_max', models.DecimalField(decimal_places=2, max_digits=10, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='books.author')),
+                ('book_count', models.BigIntegerField(default=0)),
+                ('price_sum', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('price_min', models.DecimalField(decimal_places=2, max_digits=10, null=True)),
+                ('price_max', models.DecimalField(decimal_places=2, max_digits=10, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['book_count', 'author'], name='authorstats_count_idx')],
+            },
+        ),
+        migrations.RunPython(seed_stats, migrations.RunPython.noop),
+    ]
@@ -4,13 +4,118 @@ class Author(models.Model):
     name = models.CharField(max_length=100)
     email = models.EmailField(unique=True)
     bio = models.TextField()
+    # Number of the author's books, kept by books/denormalized.py
+    book_count = models.BigIntegerField(default=0, db_default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['book_count', 'id'], name='author_book_count_id_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The name the books' author_name copies hold
+        if 'name' not in instance.get_deferred_fields():
+            instance._loaded_name = instance.name
+        return instance
 
 class Book(models.Model):
     title = models.CharField(max_length=200)
     author = models.ForeignKey(Author, on_delete=models.CASCADE)
+    # Name of the author, kept by books/denormalized.py
+    author_name = models.CharField(max_length=100, default='', db_default='', editable=False)
     published_date = models.DateField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
\ No newline at end of file
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        # One per filter/ordering of books/filters.py; id is the keyset tie-breaker
+        indexes = [
+            models.Index(fields=['author', 'published_date'], name='book_author_published_idx'),
+            models.Index(fields=['price', 'id'], name='book_price_id_idx'),
+            models.Index(fields=['published_date', 'id'], name='book_published_id_idx'),
+            models.Index(fields=['title', 'id'], name='book_title_id_idx'),
+            models.Index(fields=['author_name', 'id'], name='book_author_name_id_idx'),
+        ]
+
+    def save(self, *args, update_fields=None, **kwargs):
+        # A new author comes with their name (filled in by books/signals.py)
+        if update_fields is not None and {'author', 'author_id'} & set(update_fields):
+            update_fields = [*update_fields, 'author_name']
+        super().save(*args, update_fields=update_fields, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The (author, year, price) the rollups of books/stats.py hold for this row
+        if not instance.get_deferred_fields() & {'author_id', 'published_date', 'price'}:
+            instance._loaded_stats = (instance.author_id, instance.published_date.year, instance.price)
+        return instance
+
+class RowCount(models.Model):
+    table = models.CharField(max_length=100, unique=True)
+    count = models.BigIntegerField(default=0)
+
+class AuthorStats(models.Model):
+    # Rollup of the author's books, kept by books/stats.py
+    author = models.OneToOneField(Author, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    book_count = models.BigIntegerField(default=0)
+    price_sum = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    price_min = models.DecimalField(max_digits=10, decimal_places=2, null=True)
+    price_max = models.DecimalField(max_digits=10, decimal_places=2, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['book_count', 'author'], name='authorstats_count_idx'),
+        ]
+
+class YearStats(models.Model):
+    # Rollup of the books published in a year, kept by books/stats.py
+    year = models.IntegerField(primary_key=True)
+    book_count = models.BigIntegerField(default=0)
+    price_sum = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    price_min = models.DecimalField(max_digits=10, decimal_places=2, null=True)
+    price_max = models.DecimalField(max_digits=10, decimal_places=2, null=True)
+
+class Job(models.Model):
+    # Background write run by books/jobs.py, polled at /api/jobs/<id>/
+    PENDING = 'pending'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUSES = [(PENDING, 'Pending'), (RUNNING, 'Running'), (SUCCEEDED, 'Succeeded'), (FAILED, 'Failed')]
+
+    kind = models.CharField(max_length=50)
+    status = models.CharField(max_length=20, choices=STATUSES, default=PENDING)
+    # Rows to write and written so far, cascades included
+    total = models.BigIntegerField(default=0)
+    done = models.BigIntegerField(default=0)
+    result = models.JSONField(null=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True)
+    finished_at = models.DateTimeField(null=True)
+
+class Change(models.Model):
+    # Change log entry written by the triggers of books/changes.py; the id is
+    # the /api/changes/ cursor
+    CREATED = 'created'
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+    ACTIONS = [(CREATED, 'Created'), (UPDATED, 'Updated'), (DELETED, 'Deleted')]
+
+    kind = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=20, choices=ACTIONS)
+    changed_at = models.DateTimeField()
+
+class ChangeCompaction(models.Model):
+    # One per compact_changes run; cursors older than the latest horizon get 410
+    horizon = models.BigIntegerField()
+    superseded = models.BigIntegerField(default=0)
+    tombstones = models.BigIntegerField(default=0)
+    compacted_at = models.DateTimeField(auto_now_add=True)
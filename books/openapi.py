@@ -0,0 +1,173 @@
+"""
+The OpenAPI spec behind /swagger/ and /redoc/, built once per code version.
+
+To build the spec the Swagger / ReDoc pages load (``?format=openapi``),
+drf_yasg walks every view and its ``swagger_auto_schema`` decorators.
+``cached_schema_view`` wraps its SchemaView so the spec is built once per
+process and code version, or read from ``BOOKS_SCHEMA['DIR']``, where the
+``generate_schema`` management command writes it at deploy time. It is sent
+with an ETag and ``Cache-Control: max-age``.
+
+The code version is ``BOOKS_SCHEMA['VERSION']`` when set, else a hash of the
+project's source files and of the drf_yasg / DRF versions. The spec is built
+without a request, so it names no host: the UIs call the host they were
+loaded from.
+"""
+
+import functools
+import hashlib
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+import drf_yasg
+import rest_framework
+from django.apps import apps
+from django.conf import settings
+from django.http import HttpResponse
+from django.urls import reverse
+from django.urls.resolvers import get_resolver
+from drf_yasg.codecs import OpenAPICodecYaml
+from drf_yasg.renderers import OpenAPIRenderer, SwaggerJSONRenderer, SwaggerYAMLRenderer
+
+from books import conditional
+
+DEFAULTS = {
+    'DIR': None,
+    'MAX_AGE': 3600,
+    'VERSION': None,
+}
+
+_lock = threading.Lock()
+# (version, extension) -> encoded spec
+_specs = {}
+
+
+def config(name):
+    return getattr(settings, 'BOOKS_SCHEMA', {}).get(name, DEFAULTS[name])
+
+
+@functools.cache
+def code_version():
+    if config('VERSION'):
+        return str(config('VERSION'))
+    digest = hashlib.sha256(f'{drf_yasg.__version__} {rest_framework.__version__}'.encode())
+    base = Path(settings.BASE_DIR).resolve()
+    roots = {Path(app.path).resolve() for app in apps.get_app_configs()}
+    roots.add(Path(settings.BASE_DIR, *settings.ROOT_URLCONF.split('.')[:-1]).resolve())
+    for root in sorted(root for root in roots if root.is_relative_to(base)):
+        for path in sorted(root.rglob('*.py')):
+            digest.update(str(path.relative_to(base)).encode())
+            digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+# The drf_yasg renderers that encode the spec itself, rather than a UI page
+SPEC_RENDERERS = (OpenAPIRenderer, SwaggerJSONRenderer, SwaggerYAMLRenderer)
+
+
+def extension(renderer):
+    return 'yaml' if renderer.codec_class is OpenAPICodecYaml else 'json'
+
+
+def spec_path(ext):
+    directory = config('DIR')
+    return Path(directory, f'openapi-{code_version()}.{ext}') if directory else None
+
+
+def etag(ext):
+    return f'"{code_version()}-{ext}"'
+
+
+def cached_schema_view(schema_view, info):
+    """
+    Subclass of the drf_yasg SchemaView class ``schema_view`` serving its
+    spec from the cache.
+    """
+
+    class CachedSchemaView(schema_view):
+
+        @classmethod
+        def generate(cls):
+            return cls.generator_class(info, '').get_schema(None, public=True)
+
+        @classmethod
+        def spec(cls, renderer):
+            """
+            The encoded spec for the spec renderer class ``renderer``.
+            """
+
+            key = (code_version(), extension(renderer))
+            spec = _specs.get(key)
+            if spec is None:
+                with _lock:
+                    spec = _specs.get(key)
+                    if spec is None:
+                        spec = load(key[1])
+                    if spec is None:
+                        spec = renderer().render(cls.generate())
+                        save(spec, key[1])
+                    _specs[key] = spec
+            return spec
+
+        def get(self, request, version='', format=None):
+            renderer = request.accepted_renderer
+            if not isinstance(renderer, SPEC_RENDERERS):
+                # The UI pages only link to the spec
+                return super().get(request, version, format)
+            ext = extension(renderer)
+            not_modified = conditional.evaluate(request, etag(ext), None)
+            if not_modified is None:
+                response = HttpResponse(
+                    self.spec(type(renderer)), content_type=f'{renderer.media_type}; charset=utf-8'
+                )
+                conditional.set_validators(response, etag(ext), None)
+            else:
+                response = not_modified
+            response['Cache-Control'] = f"public, max-age={config('MAX_AGE')}"
+            return response
+
+    return CachedSchemaView
+
+
+def load(ext):
+    path = spec_path(ext)
+    try:
+        return path.read_bytes() if path else None
+    except FileNotFoundError:
+        return None
+
+
+def save(spec, ext):
+    # Lets the other processes of this code version skip building it
+    if spec_path(ext) is None:
+        return
+    try:
+        write(spec, ext)
+    except OSError:
+        pass
+
+
+def write(spec, ext):
+    """
+    Save ``spec`` in BOOKS_SCHEMA['DIR'] for the current code version.
+    """
+
+    path = spec_path(ext)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Written aside and renamed, so a reader never sees half a file
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix='.openapi-')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(spec)
+    os.chmod(tmp, 0o644)
+    os.replace(tmp, path)
+    return path
+
+
+def schema_view_class():
+    """
+    The CachedSchemaView class of the URLconf's /swagger/ route.
+    """
+
+    return get_resolver().resolve(reverse('schema-swagger-ui')).func.cls
@@ -0,0 +1,185 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+from books import fragments
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(ordering, key, pk, backwards=False):
+    """
+    Pack the position of a row into an opaque, url-safe cursor string.
+    """
+
+    payload = {"o": ordering, "k": key, "i": pk, "b": int(backwards)}
+    raw = json.dumps(payload, separators=(',', ':'), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Unpack a cursor created by encode_cursor().
+
+    Raises InvalidCursor when the string was not produced by this module.
+    """
+
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return payload["o"], payload["k"], int(payload["i"]), bool(payload["b"])
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise InvalidCursor("Invalid cursor")
+
+
+class KeysetPaginator:
+    """
+    Seek ("keyset") pagination over a queryset.
+
+    Rows are ordered by ``(sort_key, id)`` and each page starts right after the
+    last row seen, so the database walks an index from a known position instead
+    of counting and skipping ``OFFSET`` rows. Page 10,000 costs the same as
+    page 1, and rows inserted or deleted between requests never shift a row
+    onto the wrong page.
+    """
+
+    def __init__(self, queryset, page_size, ordering='id', values=None):
+        self.queryset = queryset
+        self.page_size = page_size
+        self.ordering = ordering
+        self.descending = ordering.startswith('-')
+        self.sort_field = ordering.lstrip('-')
+        if self.sort_field == 'pk':
+            self.sort_field = 'id'
+        self.model_field = queryset.model._meta.get_field(self.sort_field)
+        # With a ValuesSerializer the page is fetched as its values_list() tuples
+        if values is not None:
+            values = values.including(self.model_field.attname)
+        self.values = values
+        if values is not None:
+            key_index, pk_index = values.index(self.model_field.attname), values.index('id')
+            self._key = lambda row: row[key_index]
+            self._pk = lambda row: row[pk_index]
+
+    def _key(self, row):
+        return getattr(row, self.model_field.attname)
+
+    def _pk(self, row):
+        return row.pk
+
+    def _seek(self, key, pk, forwards):
+        # "after" in the requested direction; descending orders flip it
+        after = forwards != self.descending
+        op = 'gt' if after else 'lt'
+        if self.sort_field == 'id':
+            return Q(**{f'id__{op}': pk})
+        # (key >= k) AND (key > k OR id > i) keeps the range condition on the
+        # sort column alone, which is what lets an index on it serve the seek
+        return Q(**{f'{self.sort_field}__{op}e': key}) & (
+            Q(**{f'{self.sort_field}__{op}': key}) | Q(**{f'id__{op}': pk})
+        )
+
+    def _order_by(self, forwards):
+        descending = self.descending != (not forwards)
+        prefix = '-' if descending else ''
+        if self.sort_field == 'id':
+            return (f'{prefix}id',)
+        return (f'{prefix}{self.sort_field}', f'{prefix}id')
+
+    def paginate(self, cursor=None):
+        """
+        Return ``(rows, next_cursor, prev_cursor)`` for the page at ``cursor``.
+        """
+
+        queryset, backwards = self._page_queryset(cursor)
+        return self._page(list(queryset), cursor, backwards)
+
+    async def apaginate(self, cursor=None):
+        """
+        paginate() for async views.
+        """
+
+        queryset, backwards = self._page_queryset(cursor)
+        return self._page([row async for row in queryset], cursor, backwards)
+
+    def _page_queryset(self, cursor):
+        backwards = False
+        queryset = self.queryset
+        if cursor:
+            ordering, key, pk, backwards = decode_cursor(cursor)
+            if ordering != self.ordering:
+                raise InvalidCursor("Cursor does not match the requested ordering")
+            if self.sort_field != 'id':
+                try:
+                    key = self.model_field.to_python(key)
+                except (ValidationError, TypeError, ValueError):
+                    raise InvalidCursor("Invalid cursor")
+            queryset = queryset.filter(self._seek(key, pk, forwards=not backwards))
+
+        queryset = queryset.order_by(*self._order_by(forwards=not backwards))
+        if self.values is not None:
+            queryset = self.values.rows(queryset)
+        return queryset[:self.page_size + 1], backwards
+
+    def _page(self, rows, cursor, backwards):
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if backwards:
+            rows.reverse()
+
+        if not rows:
+            return rows, None, None
+
+        first, last = rows[0], rows[-1]
+        if backwards:
+            next_cursor = encode_cursor(self.ordering, self._key(last), self._pk(last))
+            prev_cursor = encode_cursor(self.ordering, self._key(first), self._pk(first), True) if has_more else None
+        else:
+            next_cursor = encode_cursor(self.ordering, self._key(last), self._pk(last)) if has_more else None
+            prev_cursor = encode_cursor(self.ordering, self._key(first), self._pk(first), True) if cursor else None
+        return rows, next_cursor, prev_cursor
+
+
+def cursor_paginate(queryset, values, page_size, cursor=None, ordering='id'):
+    """
+    Serialize one keyset page of ``queryset`` with the ValuesSerializer
+    ``values`` and build its ``paginator`` block.
+    """
+
+    if fragments.enabled(values):
+        # Only the keys of the page are read; the rows come from the fragment cache
+        paginator = KeysetPaginator(queryset, page_size, ordering, fragments.KeyPlan())
+        rows, next_cursor, prev_cursor = paginator.paginate(cursor)
+        data = fragments.encode_keyed([(row[0], row[-1]) for row in rows], values)
+        return data, _paginator(paginator, data, next_cursor, prev_cursor)
+
+    paginator = KeysetPaginator(queryset, page_size, ordering, values)
+    rows, next_cursor, prev_cursor = paginator.paginate(cursor)
+    data = paginator.values.serialize(rows)
+    return data, _paginator(paginator, data, next_cursor, prev_cursor)
+
+
+async def acursor_paginate(queryset, values, page_size, cursor=None, ordering='id'):
+    """
+    cursor_paginate() for async views.
+    """
+
+    paginator = KeysetPaginator(queryset, page_size, ordering, values)
+    rows, next_cursor, prev_cursor = await paginator.apaginate(cursor)
+    data = await paginator.values.aserialize(rows)
+    return data, _paginator(paginator, data, next_cursor, prev_cursor)
+
+
+def _paginator(paginator, data, next_cursor, prev_cursor):
+    return {
+        "ordering": paginator.ordering,
+        "page_size": paginator.page_size,
+        "current_page_size": len(data),
+        "next_cursor": next_cursor,
+        "prev_cursor": prev_cursor,
+    }
@@ -0,0 +1,59 @@
+"""
+Read/write routing between the primary database and a read replica.
+
+``ReadReplicaRouter`` sends reads made while serving a read-only request
+(GET/HEAD/OPTIONS, flagged by ``books.middleware.read_replica_middleware``)
+to the ``BOOKS_READ_REPLICA`` alias and everything else to ``default``.
+Reads made by a POST/PUT/DELETE stay on the primary, so a request always
+sees its own writes. Without a configured replica every query goes to the
+primary. The detail reads that fill books/cache.py also use the primary,
+so a lagging replica cannot put back a row that a write just invalidated.
+
+A replica can be as simple as a file copy of the primary SQLite database,
+refreshed with ``python manage.py sync_replica``.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+_read_only = ContextVar('read_only_request', default=False)
+
+
+def replica_alias():
+    alias = getattr(settings, 'BOOKS_READ_REPLICA', None)
+    return alias if alias in settings.DATABASES else None
+
+
+@contextmanager
+def read_only(enabled=True):
+    """
+    Route the reads of the block to the replica (when ``enabled``).
+    """
+
+    token = _read_only.set(enabled)
+    try:
+        yield
+    finally:
+        _read_only.reset(token)
+
+
+class ReadReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        if _read_only.get():
+            return replica_alias() or DEFAULT_DB_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas are copies of the migrated primary
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,176 @@
+"""
+Full-text search over book titles, author names and author bios.
+
+Two SQLite FTS5 tables mirror the catalog, with the row id of the indexed
+book/author as their rowid:
+
+- books_book_fts(title, author_name)
+- books_author_fts(name, bio)
+
+Triggers on books_book/books_author keep them in step with every write,
+including bulk statements, cascades and raw SQL. They live outside the
+migration state: each names the other table, and a migration that rebuilds a
+table (SQLite copies it) fails on a trigger naming the table it drops. So
+``drop_triggers()`` runs before every ``migrate`` and ``install()`` after it,
+reindexing whatever the migrations wrote meanwhile (see books/signals.py);
+``rebuild()`` repopulates both tables from scratch. Other database backends
+have no search index.
+"""
+
+import re
+
+from django.db import connections
+
+BOOK_TABLE = 'books_book_fts'
+AUTHOR_TABLE = 'books_author_fts'
+
+# Column weights for bm25(): a hit in the title/name counts ten times a hit
+# in the author name of a book / the bio of an author
+BOOK_RANK = 'bm25(10.0, 1.0)'
+AUTHOR_RANK = 'bm25(10.0, 1.0)'
+
+TABLES = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {BOOK_TABLE} USING fts5(title, author_name)",
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {AUTHOR_TABLE} USING fts5(name, bio)",
+]
+
+TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS books_book_fts_insert AFTER INSERT ON books_book BEGIN
+        INSERT INTO {BOOK_TABLE}(rowid, title, author_name)
+        VALUES (new.id, new.title, (SELECT name FROM books_author WHERE id = new.author_id));
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS books_book_fts_update AFTER UPDATE OF title, author_id ON books_book
+    WHEN old.title IS NOT new.title OR old.author_id IS NOT new.author_id BEGIN
+        UPDATE {BOOK_TABLE}
+        SET title = new.title, author_name = (SELECT name FROM books_author WHERE id = new.author_id)
+        WHERE rowid = new.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS books_book_fts_delete AFTER DELETE ON books_book BEGIN
+        DELETE FROM {BOOK_TABLE} WHERE rowid = old.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS books_author_fts_insert AFTER INSERT ON books_author BEGIN
+        INSERT INTO {AUTHOR_TABLE}(rowid, name, bio) VALUES (new.id, new.name, new.bio);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS books_author_fts_update AFTER UPDATE OF name, bio ON books_author
+    WHEN old.name IS NOT new.name OR old.bio IS NOT new.bio BEGIN
+        UPDATE {AUTHOR_TABLE} SET name = new.name, bio = new.bio WHERE rowid = new.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS books_author_fts_rename AFTER UPDATE OF name ON books_author
+    WHEN old.name IS NOT new.name BEGIN
+        UPDATE {BOOK_TABLE} SET author_name = new.name
+        WHERE rowid IN (SELECT id FROM books_book WHERE author_id = new.id);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS books_author_fts_delete AFTER DELETE ON books_author BEGIN
+        DELETE FROM {AUTHOR_TABLE} WHERE rowid = old.id;
+    END""",
+]
+
+TRIGGER_NAMES = [re.search(r'EXISTS (\w+)', sql).group(1) for sql in TRIGGERS]
+
+
+def supported(connection):
+    return connection.vendor == 'sqlite'
+
+
+def install(connection):
+    """
+    Create the FTS tables, their rank functions and the sync triggers if missing.
+    """
+
+    if not supported(connection):
+        return
+    with connection.cursor() as cursor:
+        for sql in TABLES + TRIGGERS:
+            cursor.execute(sql)
+        cursor.execute(f"INSERT INTO {BOOK_TABLE}({BOOK_TABLE}, rank) VALUES ('rank', %s)", [BOOK_RANK])
+        cursor.execute(f"INSERT INTO {AUTHOR_TABLE}({AUTHOR_TABLE}, rank) VALUES ('rank', %s)", [AUTHOR_RANK])
+
+
+def drop_triggers(connection):
+    if not supported(connection):
+        return
+    with connection.cursor() as cursor:
+        for name in TRIGGER_NAMES:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+
+def uninstall(connection):
+    if not supported(connection):
+        return
+    drop_triggers(connection)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {BOOK_TABLE}")
+        cursor.execute(f"DROP TABLE IF EXISTS {AUTHOR_TABLE}")
+
+
+def rebuild(connection):
+    """
+    Reindex every book and author. Returns ``(books, authors)`` indexed.
+    """
+
+    install(connection)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {BOOK_TABLE}")
+        cursor.execute(
+            f"INSERT INTO {BOOK_TABLE}(rowid, title, author_name) "
+            "SELECT b.id, b.title, a.name FROM books_book b JOIN books_author a ON a.id = b.author_id"
+        )
+        books = cursor.rowcount
+        cursor.execute(f"DELETE FROM {AUTHOR_TABLE}")
+        cursor.execute(f"INSERT INTO {AUTHOR_TABLE}(rowid, name, bio) SELECT id, name, bio FROM books_author")
+        authors = cursor.rowcount
+        cursor.execute(f"INSERT INTO {BOOK_TABLE}({BOOK_TABLE}) VALUES ('optimize')")
+        cursor.execute(f"INSERT INTO {AUTHOR_TABLE}({AUTHOR_TABLE}) VALUES ('optimize')")
+    return books, authors
+
+
+def match_expression(query):
+    """
+    FTS5 query matching rows that contain every word of ``query``, the last
+    one as a prefix (search as you type). Words are quoted so user input can
+    never be read as FTS5 syntax.
+    """
+
+    words = re.findall(r'\w+', query)
+    if not words:
+        return None
+    terms = ['"%s"' % word for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def _matches(cursor, table, expression, limit, offset):
+    cursor.execute(
+        f"SELECT rowid, rank FROM {table} WHERE {table} MATCH %s ORDER BY rank LIMIT %s OFFSET %s",
+        [expression, limit, offset],
+    )
+    return cursor.fetchall()
+
+
+def _count(cursor, table, expression):
+    cursor.execute(f"SELECT count(*) FROM {table} WHERE {table} MATCH %s", [expression])
+    return cursor.fetchone()[0]
+
+
+def search(expression, kinds, limit, offset, using='default'):
+    """
+    Ranked ``(kind, id, score)`` hits for ``expression`` and the total number
+    of matches. ``kinds`` is a subset of ("book", "author"); lower bm25
+    scores are better matches.
+    """
+
+    tables = {'book': BOOK_TABLE, 'author': AUTHOR_TABLE}
+    hits = []
+    total = 0
+    with connections[using].cursor() as cursor:
+        for kind in kinds:
+            # With several kinds each table must supply a full window before
+            # they are merged by score
+            window = limit if len(kinds) == 1 else limit + offset
+            start = offset if len(kinds) == 1 else 0
+            hits.extend((kind, rowid, score) for rowid, score in _matches(cursor, tables[kind], expression, window, start))
+            total += _count(cursor, tables[kind], expression)
+    if len(kinds) > 1:
+        hits.sort(key=lambda hit: hit[2])
+        hits = hits[offset:offset + limit]
+    return hits, total
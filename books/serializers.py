@@ -1,5 +1,12 @@
+import threading
+
+from django.conf import settings
+from django.utils import timezone
 from rest_framework import serializers
-from books.models import Author, Book
+from rest_framework.fields import ISO_8601
+from rest_framework.settings import api_settings
+from books import metrics
+from books.models import Author, Book, Job
 
 class AuthorSerializer(serializers.ModelSerializer):
     class Meta:
@@ -11,6 +18,354 @@ class BookSerializer(serializers.ModelSerializer):
         model = Book
         fields = '__all__'
 
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = '__all__'
+
 class PaginationSerializer(serializers.Serializer):
     page = serializers.IntegerField(min_value=1, required=True)
-    page_size = serializers.IntegerField(min_value=1, required=True)
\ No newline at end of file
+    page_size = serializers.IntegerField(min_value=1, required=True)
+
+class CursorPaginationSerializer(serializers.Serializer):
+    page_size = serializers.IntegerField(min_value=1, required=True)
+    cursor = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+
+class AuthorWriteSerializer(serializers.ModelSerializer):
+    # No uniqueness query: the UNIQUE constraint checks the email (books/writes.py)
+    email = serializers.EmailField(max_length=254)
+
+    class Meta:
+        model = Author
+        fields = ['name', 'email', 'bio']
+
+class BookWriteSerializer(serializers.ModelSerializer):
+    # No query for the author: the FOREIGN KEY constraint checks it (books/writes.py)
+    author = serializers.IntegerField(source='author_id')
+
+    class Meta:
+        model = Book
+        fields = ['title', 'author', 'published_date', 'price']
+
+class BulkAuthorSerializer(AuthorWriteSerializer):
+    # Ids and emails are checked for the whole batch at once in books/bulk.py
+    id = serializers.IntegerField(required=False)
+
+    class Meta(AuthorWriteSerializer.Meta):
+        fields = ['id', *AuthorWriteSerializer.Meta.fields]
+
+class BulkBookSerializer(BookWriteSerializer):
+    id = serializers.IntegerField(required=False)
+
+    class Meta(BookWriteSerializer.Meta):
+        fields = ['id', *BookWriteSerializer.Meta.fields]
+
+class BulkDeleteSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+
+class BatchReadSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=1000)
+
+
+class SearchSerializer(serializers.Serializer):
+    q = serializers.CharField(required=True, max_length=200)
+    type = serializers.ChoiceField(choices=['all', 'books', 'authors'], default='all')
+    page = serializers.IntegerField(min_value=1, default=1)
+    page_size = serializers.IntegerField(min_value=1, max_value=100, default=20)
+
+STATS_ORDERINGS = {
+    'author': ('author',),
+    'books': ('book_count', 'author'),
+    '-books': ('-book_count', '-author'),
+}
+
+class StatsQuerySerializer(serializers.Serializer):
+    page = serializers.IntegerField(min_value=1, default=1)
+    page_size = serializers.IntegerField(min_value=1, max_value=1000, default=100)
+    ordering = serializers.ChoiceField(choices=list(STATS_ORDERINGS), default='author')
+
+class ChangesQuerySerializer(serializers.Serializer):
+    since = serializers.IntegerField(min_value=0, default=0)
+    page_size = serializers.IntegerField(min_value=1, max_value=1000, default=100)
+
+class RollupSerializer(serializers.Serializer):
+    # Common fields of AuthorStats, YearStats and the catalog totals
+    book_count = serializers.IntegerField()
+    price_min = serializers.DecimalField(max_digits=10, decimal_places=2)
+    price_max = serializers.DecimalField(max_digits=10, decimal_places=2)
+    price_avg = serializers.SerializerMethodField()
+
+    def get_price_avg(self, obj):
+        book_count, price_sum = _get(obj, 'book_count'), _get(obj, 'price_sum')
+        if not book_count:
+            return None
+        return self.fields['price_min'].to_representation(price_sum / book_count)
+
+def _get(obj, name):
+    return obj[name] if isinstance(obj, dict) else getattr(obj, name)
+
+class AuthorStatsSerializer(RollupSerializer):
+    author = serializers.IntegerField(source='author_id')
+
+class YearStatsSerializer(RollupSerializer):
+    year = serializers.IntegerField()
+
+class CatalogStatsSerializer(RollupSerializer):
+    author_count = serializers.IntegerField()
+
+def _utc_datetime(value):
+    if not value:
+        return None
+    value = value.isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+def _iso_date(value):
+    return value.isoformat() if value else None
+
+def _decimal(field):
+    # The database already returns values quantized to the field's places,
+    # in which case DRF's quantize() is a no-op and only the formatting is left
+    exponent = -field.decimal_places
+    to_representation = field.to_representation
+
+    def convert(value):
+        if value is not None and value.as_tuple().exponent == exponent:
+            return format(value, 'f')
+        return to_representation(value)
+    return convert
+
+def _converter(field):
+    """
+    Function turning a raw column value into the representation ``field``
+    would produce, or None when the value is already in that form.
+    """
+
+    if isinstance(field, (serializers.CharField, serializers.IntegerField,
+                          serializers.PrimaryKeyRelatedField, serializers.BooleanField)):
+        # str/int columns come back from the database as they are rendered
+        return None
+    if isinstance(field, serializers.DateTimeField):
+        output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+        utc = settings.USE_TZ and timezone.get_current_timezone_name() == 'UTC'
+        if utc and not hasattr(field, 'timezone') and output_format and output_format.lower() == ISO_8601:
+            return _utc_datetime
+    elif isinstance(field, serializers.DecimalField):
+        coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+        if coerce_to_string and not field.localize and field.decimal_places is not None:
+            return _decimal(field)
+    elif isinstance(field, serializers.DateField):
+        output_format = getattr(field, 'format', api_settings.DATE_FORMAT)
+        if output_format and output_format.lower() == ISO_8601:
+            return _iso_date
+    return field.to_representation
+
+# Relations a list can inline with ?expand=: name -> (serializer of the
+# related rows, FK on the related model for reverse relations, else None)
+EXPANSIONS = {
+    BookSerializer: {'author': (AuthorSerializer, None)},
+    AuthorSerializer: {'books': (BookSerializer, 'author')},
+}
+
+class ValuesSerializer:
+    """
+    Read-only fast path for a ModelSerializer, over ``values_list()`` tuples.
+
+    Rows are never turned into model instances and each field goes through a
+    converter compiled once per serializer class, but the output is the same,
+    key for key and byte for byte, as ``serializer_class(rows, many=True).data``.
+
+    ``fields`` keeps only some of the serializer's fields, and only their
+    columns are selected. ``expand`` inlines relations from EXPANSIONS: a
+    forward FK becomes extra joined columns of the same query, a reverse
+    relation costs one ``IN`` query per serialized batch. ``extra`` columns
+    are fetched (e.g. for keyset pagination) but not rendered.
+    """
+
+    _plans = {}
+    _plans_lock = threading.Lock()
+    _max_plans = 256
+
+    def __init__(self, serializer_class, fields=None, expand=(), extra=()):
+        serializer = serializer_class()
+        model = serializer.Meta.model
+        self.serializer_class = serializer_class
+        self.model = model
+        self._fields = tuple(fields) if fields is not None else None
+        self._expand = tuple(expand)
+        self._extra = tuple(extra)
+        # Plans with the same output_key render a row the same way
+        self.output_key = (serializer_class, self._fields, self._expand, timezone.get_current_timezone_name())
+        self.names = []
+        self.columns = []
+        self.converters = []
+        self.joined = []
+        self.prefetched = []
+        hidden = []
+        expansions = EXPANSIONS.get(serializer_class, {})
+        for name, field in serializer.fields.items():
+            if field.write_only or (fields is not None and name not in fields):
+                continue
+            self.names.append(name)
+            self.columns.append(model._meta.get_field(field.source).attname)
+            if name in expand:
+                related = ValuesSerializer.for_serializer(expansions[name][0])
+                start = len(hidden)
+                hidden.extend(f'{field.source}__{column}' for column in related.columns)
+                self.joined.append((name, start, len(hidden), related))
+                continue
+            converter = _converter(field)
+            if converter is not None:
+                self.converters.append((name, converter))
+        for name in expand:
+            related_serializer, related_fk = expansions[name]
+            if related_fk is not None:
+                self.prefetched.append((name, ValuesSerializer.for_serializer(related_serializer), related_fk))
+        for column in ('id', *extra):
+            if column not in self.columns and column not in hidden:
+                hidden.append(column)
+        # Joined columns are addressed relative to the end of the visible ones
+        offset = len(self.columns)
+        self.joined = [(name, offset + start, offset + end, related) for name, start, end, related in self.joined]
+        self.columns.extend(hidden)
+
+    @classmethod
+    def for_serializer(cls, serializer_class, fields=None, expand=(), extra=()):
+        key = (
+            serializer_class,
+            tuple(fields) if fields is not None else None,
+            tuple(expand),
+            tuple(extra),
+            timezone.get_current_timezone_name(),
+        )
+        plan = cls._plans.get(key)
+        if plan is None:
+            plan = cls(serializer_class, fields, expand, extra)
+            with cls._plans_lock:
+                if len(cls._plans) >= cls._max_plans:
+                    cls._plans.clear()
+                plan = cls._plans.setdefault(key, plan)
+        return plan
+
+    def including(self, *columns):
+        """
+        The same plan, also fetching ``columns``.
+        """
+
+        missing = tuple(column for column in columns if column not in self.columns)
+        if not missing:
+            return self
+        return ValuesSerializer.for_serializer(
+            self.serializer_class, self._fields, self._expand, self._extra + missing
+        )
+
+    def index(self, column):
+        return self.columns.index(column)
+
+    def rows(self, queryset):
+        return queryset.values_list(*self.columns)
+
+    def to_representation(self, row):
+        data = dict(zip(self.names, row))
+        for name, converter in self.converters:
+            data[name] = converter(data[name])
+        for name, start, end, related in self.joined:
+            data[name] = related.to_representation(row[start:end])
+        return data
+
+    def serialize(self, rows):
+        """
+        Representations of ``rows``, a queryset or an iterable of tuples.
+        """
+
+        if hasattr(rows, 'values_list'):
+            rows = self.rows(rows)
+        to_representation = self.to_representation
+        with metrics.timed('serialize'):
+            if not self.prefetched:
+                return [to_representation(row) for row in rows]
+            rows = list(rows)
+            data = [to_representation(row) for row in rows]
+            for name, related, fk_index, ids, queryset in self._prefetches(rows):
+                self._attach(data, name, related, fk_index, ids, queryset)
+            return data
+
+    async def aserialize(self, rows):
+        """
+        serialize() for async views: querysets are fetched with the async ORM.
+        """
+
+        if hasattr(rows, 'values_list'):
+            rows = [row async for row in self.rows(rows)]
+        with metrics.timed('serialize'):
+            data = [self.to_representation(row) for row in rows]
+        for name, related, fk_index, ids, queryset in self._prefetches(rows):
+            related_rows = [row async for row in queryset]
+            with metrics.timed('serialize'):
+                self._attach(data, name, related, fk_index, ids, related_rows)
+        return data
+
+    def _prefetches(self, rows):
+        if not rows or not self.prefetched:
+            return
+        id_index = self.index('id')
+        ids = [row[id_index] for row in rows]
+        for name, related, related_fk in self.prefetched:
+            fk_column = related.model._meta.get_field(related_fk).attname
+            related = related.including(fk_column)
+            queryset = related.model.objects.filter(**{f'{fk_column}__in': ids}).order_by('id')
+            yield name, related, related.index(fk_column), ids, related.rows(queryset)
+
+    def _attach(self, data, name, related, fk_index, ids, related_rows):
+        grouped = {pk: [] for pk in ids}
+        for related_row in related_rows:
+            grouped[related_row[fk_index]].append(related.to_representation(related_row))
+        for item, pk in zip(data, ids):
+            item[name] = grouped[pk]
+
+class FieldsetSerializer(serializers.Serializer):
+    """
+    ``fields`` and ``expand`` list parameters (comma separated) of a list
+    endpoint, resolved into a ValuesSerializer for ``context['serializer_class']``.
+    """
+
+    fields = serializers.CharField(required=False, allow_blank=True)
+    expand = serializers.CharField(required=False, allow_blank=True)
+
+    def _names(self, value):
+        return [name.strip() for name in (value or '').split(',') if name.strip()]
+
+    def to_internal_value(self, data):
+        # Query strings carry comma separated names, JSON bodies may send lists
+        data = {key: data[key] for key in ('fields', 'expand') if key in data}
+        for key, value in data.items():
+            if isinstance(value, (list, tuple)):
+                data[key] = ','.join(str(item) for item in value)
+        return super().to_internal_value(data)
+
+    def validate_fields(self, value):
+        names = self._names(value)
+        known = self.context['serializer_class']().fields
+        unknown = [name for name in names if name not in known]
+        if unknown:
+            raise serializers.ValidationError(f"Unknown fields: {', '.join(unknown)}")
+        return names or None
+
+    def validate_expand(self, value):
+        names = self._names(value)
+        allowed = EXPANSIONS.get(self.context['serializer_class'], {})
+        unknown = [name for name in names if name not in allowed]
+        if unknown:
+            raise serializers.ValidationError(
+                f"Cannot expand: {', '.join(unknown)}. Allowed: {', '.join(allowed) or 'none'}"
+            )
+        return names
+
+    def values_serializer(self):
+        serializer_class = self.context['serializer_class']
+        fields = self.validated_data.get('fields')
+        expand = self.validated_data.get('expand') or []
+        if fields is not None:
+            # A forward relation is only expanded when its field is requested
+            known = serializer_class().fields
+            expand = [name for name in expand if name in fields or name not in known]
+        return ValuesSerializer.for_serializer(serializer_class, fields, expand)
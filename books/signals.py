@@ -0,0 +1,194 @@
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import IntegrityError, connections
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_migrate, pre_save
+from django.dispatch import Signal, receiver
+
+from books import cache, changes, counters, denormalized, fragments, metrics, search, stats
+from books.models import Author, Book
+
+# Sent by the bulk write paths, which bypass the per-row model signals.
+# bulk_created: sender=model, instances=[created objects]
+# bulk_updated: sender=model, instances=[updated objects], fields=[field names]
+bulk_created = Signal()
+bulk_updated = Signal()
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Book)
+def count_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.adjust(sender, 1)
+
+
+@receiver(post_delete, sender=Author)
+@receiver(post_delete, sender=Book)
+def count_deleted(sender, instance, **kwargs):
+    counters.adjust(sender, -1)
+
+
+@receiver(bulk_created, sender=Author)
+@receiver(bulk_created, sender=Book)
+def count_bulk_created(sender, instances, **kwargs):
+    counters.adjust(sender, len(instances))
+
+
+@receiver(post_save, sender=Author)
+def add_author_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        stats.add_authors([instance.pk])
+
+
+@receiver(bulk_created, sender=Author)
+def add_bulk_author_stats(sender, instances, **kwargs):
+    stats.add_authors([instance.pk for instance in instances])
+
+
+@receiver(pre_save, sender=Book)
+def load_book_stats(sender, instance, raw=False, **kwargs):
+    # Books saved over a row without loading it first look the old values up
+    if not raw and instance.pk is not None and not hasattr(instance, '_loaded_stats'):
+        instance._loaded_stats = stats.loaded_entry(instance.pk)
+
+
+@receiver(pre_save, sender=Book)
+def fill_author_name(sender, instance, raw=False, update_fields=None, **kwargs):
+    # A new book, or one given another author, copies the author's name;
+    # Book.save() adds author_name to the update_fields naming the author
+    if raw or (update_fields is not None and 'author_name' not in update_fields):
+        return
+    loaded = getattr(instance, '_loaded_stats', None)
+    if instance._state.adding or loaded is None or loaded[0] != instance.author_id:
+        # The lookup is the FOREIGN KEY check too, before anything is written
+        if denormalized.fill_author_names([instance], kwargs['using']):
+            raise IntegrityError("FOREIGN KEY constraint failed")
+
+
+@receiver(post_save, sender=Author)
+def rename_books(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if created or raw or (update_fields is not None and 'name' not in update_fields):
+        return
+    # An author saved without being loaded first counts as renamed;
+    # rename_authors() only rewrites the copies that differ
+    if instance.name != getattr(instance, '_loaded_name', None):
+        denormalized.rename_authors([instance.pk], kwargs['using'])
+        instance._loaded_name = instance.name
+
+
+@receiver(bulk_updated, sender=Author)
+def rename_bulk_updated(sender, instances, fields, **kwargs):
+    if 'name' not in fields:
+        return
+    renamed = [instance for instance in instances if instance.name != getattr(instance, '_loaded_name', None)]
+    denormalized.rename_authors([instance.pk for instance in renamed])
+    for instance in renamed:
+        instance._loaded_name = instance.name
+
+
+@receiver(post_save, sender=Book)
+def roll_up_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    loaded = None if created else getattr(instance, '_loaded_stats', None)
+    entry = stats.book_entry(instance)
+    if entry != loaded:
+        stats.record(removed=[loaded] if loaded else [], added=[entry])
+    instance._loaded_stats = entry
+
+
+@receiver(post_delete, sender=Book)
+def roll_up_deleted(sender, instance, **kwargs):
+    stats.record(removed=[getattr(instance, '_loaded_stats', None) or stats.book_entry(instance)])
+
+
+@receiver(bulk_created, sender=Book)
+def roll_up_bulk_created(sender, instances, **kwargs):
+    entries = [stats.book_entry(instance) for instance in instances]
+    stats.record(added=entries)
+    for instance, entry in zip(instances, entries):
+        instance._loaded_stats = entry
+
+
+@receiver(bulk_updated, sender=Book)
+def roll_up_bulk_updated(sender, instances, **kwargs):
+    # The instances were loaded from the database, so they know their old values
+    removed, added = [], []
+    for instance in instances:
+        loaded, entry = getattr(instance, '_loaded_stats', None), stats.book_entry(instance)
+        if entry != loaded:
+            removed.extend([loaded] if loaded else [])
+            added.append(entry)
+            instance._loaded_stats = entry
+    stats.record(removed, added)
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Author)
+@receiver(post_delete, sender=Book)
+def invalidate_detail(sender, instance, **kwargs):
+    cache.invalidate(sender, [instance.pk])
+
+
+@receiver(bulk_updated, sender=Author)
+@receiver(bulk_updated, sender=Book)
+def invalidate_bulk_updated(sender, instances, **kwargs):
+    cache.invalidate(sender, [instance.pk for instance in instances])
+
+
+@receiver(setting_changed)
+def reset_detail_cache(setting, **kwargs):
+    if setting == 'BOOKS_DETAIL_CACHE':
+        cache.reset_detail_cache()
+    elif setting == 'BOOKS_FRAGMENT_CACHE':
+        fragments.reset_fragment_cache()
+
+
+@receiver(pre_migrate)
+def drop_triggers(sender, using, **kwargs):
+    # A migration that rebuilds books_book/books_author fails on the triggers
+    # of the other table naming it; they are back after migrate
+    if sender.name == 'books':
+        search.drop_triggers(connections[using])
+        changes.uninstall(connections[using])
+
+
+@receiver(post_migrate)
+def install_search_index(sender, using, plan=None, **kwargs):
+    if sender.name != 'books':
+        return
+    connection = connections[using]
+    if search.BOOK_TABLE not in connection.introspection.table_names():
+        return
+    if any(migration.app_label == 'books' for migration, _ in plan or ()):
+        # The migrations wrote without the triggers
+        search.rebuild(connection)
+    else:
+        search.install(connection)
+
+
+@receiver(post_migrate)
+def install_change_log(sender, using, **kwargs):
+    # Migrations log the rows they change themselves (see 0009)
+    if sender.name == 'books' and changes.TABLE in connections[using].introspection.table_names():
+        changes.install(connections[using])
+
+
+@receiver(connection_created)
+def set_sqlite_pragmas(sender, connection, **kwargs):
+    # BOOKS_SQLITE_PRAGMAS, applied to every new SQLite connection
+    pragmas = getattr(settings, 'BOOKS_SQLITE_PRAGMAS', None)
+    if not pragmas or connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+
+
+@receiver(connection_created)
+def install_query_metrics(sender, connection, **kwargs):
+    # Per-request query counts and times for books.metrics; the wrapper list
+    # outlives reconnects of the same connection, so install it only once
+    if metrics.record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(metrics.record_query)
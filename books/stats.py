@@ -0,0 +1,239 @@
+"""
+Rollups of the catalog statistics: per author and per publication year, the
+number of books and their price sum, min and max.
+
+The /api/stats/ endpoints read these tables instead of aggregating the books
+table. The model signals in books/signals.py pass every book write to
+``record()`` as removed / added ``(author_id, year, price)`` entries, which
+become one UPDATE per affected author and year. A min / max is recomputed
+from the books table (through the author and published_date indexes) only
+when a removed price was the extreme. ``Author.book_count`` follows the
+same per-author groups (books/denormalized.py). Code paths that skip signals
+(raw SQL, ``QuerySet.update()``) must call ``rebuild()``, which the
+``rebuild_stats`` management command runs.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from decimal import Decimal
+
+from django.db import connections, router, transaction
+from django.db.models import Case, Count, F, Max, Min, Subquery, Sum, Value, When
+from django.db.models.constants import OnConflict
+from django.db.models.functions import Coalesce, ExtractYear, Greatest, Least
+
+from books import denormalized
+from books.models import Author, AuthorStats, Book, YearStats
+
+_batch = ContextVar('stats_batch', default=None)
+
+# Rollup model -> (index of its key in an entry, books lookup of a key, books expression of the key)
+ROLLUPS = {
+    AuthorStats: (0, 'author_id', F('author_id')),
+    YearStats: (1, 'published_date__year', ExtractYear('published_date')),
+}
+
+# Past this many authors, a change is cheaper to apply by recomputing their
+# rollups from the books (one indexed query) than with one UPDATE each
+RECOMPUTE_AUTHORS = 50
+
+AGGREGATES = {
+    'book_count': lambda: Count('id'),
+    'price_sum': lambda: Sum('price'),
+    'price_min': lambda: Min('price'),
+    'price_max': lambda: Max('price'),
+}
+
+
+def book_entry(instance):
+    """
+    The ``(author_id, year, price)`` a book adds to the rollups.
+    """
+
+    published_date = Book._meta.get_field('published_date').to_python(instance.published_date)
+    price = Book._meta.get_field('price').to_python(instance.price)
+    return (instance.author_id, published_date.year, price)
+
+
+def loaded_entry(pk):
+    """
+    The entry of the stored row ``pk``, or None.
+    """
+
+    row = Book.objects.filter(pk=pk).values_list('author_id', 'published_date', 'price').first()
+    return (row[0], row[1].year, row[2]) if row else None
+
+
+def record(removed=(), added=()):
+    """
+    Take ``removed`` entries out of the rollups and put ``added`` ones in.
+    """
+
+    if not removed and not added:
+        return
+    pending = _batch.get()
+    if pending is not None:
+        pending[0].extend(removed)
+        pending[1].extend(added)
+        return
+    using = router.db_for_write(AuthorStats)
+    for model in ROLLUPS:
+        groups = _groups(model, removed, added)
+        if model is AuthorStats:
+            denormalized.adjust_book_counts({key: group['count'] for key, group in groups.items()}, using)
+        if model is AuthorStats and len(groups) > RECOMPUTE_AUTHORS:
+            _recompute_authors(list(groups), using)
+            continue
+        for key, group in groups.items():
+            _apply(model, key, group, using)
+
+
+@contextmanager
+def batch():
+    """
+    Collect the ``record()`` calls made inside the block and apply them
+    together when it exits: one UPDATE per affected author and year.
+    Nothing is applied if the block raises.
+    """
+
+    if _batch.get() is not None:
+        yield
+        return
+    token = _batch.set(([], []))
+    try:
+        yield
+        removed, added = _batch.get()
+    finally:
+        _batch.reset(token)
+    record(removed, added)
+
+
+def _groups(model, removed, added):
+    index = ROLLUPS[model][0]
+    groups = {}
+    for sign, entries in ((-1, removed), (1, added)):
+        for entry in entries:
+            group = groups.setdefault(entry[index], {'count': 0, 'sum': Decimal(0), -1: [], 1: []})
+            group['count'] += sign
+            group['sum'] += sign * entry[2]
+            group[sign].append(entry[2])
+    return groups
+
+
+def _books(model, key, using):
+    return Book.objects.using(using).filter(**{ROLLUPS[model][1]: key}).order_by()
+
+
+def _extreme(model, key, using, aggregate):
+    # Grouped on the rollup key so it can stand as a scalar subquery
+    return Subquery(
+        _books(model, key, using).annotate(rollup_key=ROLLUPS[model][2])
+        .values('rollup_key').annotate(value=aggregate('price')).values('value')
+    )
+
+
+def _apply(model, key, group, using):
+    updates = {
+        'book_count': F('book_count') + group['count'],
+        'price_sum': F('price_sum') + group['sum'],
+    }
+    for name, aggregate, pick, combine in (('price_min', Min, min, Least), ('price_max', Max, max, Greatest)):
+        value = F(name)
+        if group[1]:
+            added = Value(pick(group[1]))
+            value = Coalesce(combine(value, added), added)
+        if group[-1]:
+            # Only a removed extreme needs the books table
+            value = Case(
+                When(**{f'{name}__in': group[-1]}, then=_extreme(model, key, using, aggregate)),
+                default=value,
+            )
+        updates[name] = value
+    updated = model.objects.using(using).filter(pk=key).update(**updates)
+    if not updated and group[1]:
+        # No rollup row yet: seed it from the books, which already include the change
+        if model is AuthorStats:
+            _recompute_authors([key], using)
+        else:
+            _insert_select(YearStats, _year_rollups(using).filter(published_date__year=key), using, upsert=True)
+
+
+def _author_rollups(using, pks=None):
+    # Authors without books get zeros through the outer join
+    queryset = Author.objects.using(using).order_by().annotate(
+        rollup_count=Count('book'),
+        rollup_sum=Coalesce(Sum('book__price'), Value(Decimal(0))),
+        rollup_min=Min('book__price'),
+        rollup_max=Max('book__price'),
+    ).values_list('id', 'rollup_count', 'rollup_sum', 'rollup_min', 'rollup_max')
+    return queryset if pks is None else queryset.filter(id__in=pks)
+
+
+def _year_rollups(using):
+    return (
+        Book.objects.using(using).order_by().annotate(year=ExtractYear('published_date'))
+        .values('year').annotate(**{name: make() for name, make in AGGREGATES.items()})
+        .values_list('year', *AGGREGATES)
+    )
+
+
+def _insert_select(model, queryset, using, upsert=False):
+    """
+    INSERT the rows of ``queryset`` (in the order of ``model``'s columns)
+    into ``model``'s table with a single statement, overwriting existing
+    rows when ``upsert``.
+    """
+
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    key = model._meta.pk.column
+    columns = [key, *AGGREGATES]
+    select, params = queryset.query.get_compiler(using).as_sql()
+    sql = f"INSERT INTO {quote(model._meta.db_table)} ({', '.join(map(quote, columns))}) {select}"
+    if upsert:
+        sql += ' ' + connection.ops.on_conflict_suffix_sql(None, OnConflict.UPDATE, list(AGGREGATES), [key])
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+def _recompute_authors(pks, using, batch_size=500):
+    for start in range(0, len(pks), batch_size):
+        _insert_select(AuthorStats, _author_rollups(using, pks[start:start + batch_size]), using, upsert=True)
+
+
+def add_authors(pks):
+    """
+    Create the rollup rows of new authors.
+    """
+
+    _recompute_authors(list(pks), router.db_for_write(AuthorStats))
+
+
+def rebuild():
+    """
+    Recompute both rollup tables from the books table.
+
+    Returns the number of author and year rows.
+    """
+
+    using = router.db_for_write(AuthorStats)
+    with transaction.atomic(using=using):
+        AuthorStats.objects.using(using).all().delete()
+        YearStats.objects.using(using).all().delete()
+        authors = _insert_select(AuthorStats, _author_rollups(using), using)
+        years = _insert_select(YearStats, _year_rollups(using), using)
+    return authors, years
+
+
+def totals():
+    """
+    Books and price min / max / sum of the whole catalog, from the year rollups.
+    """
+
+    return YearStats.objects.filter(book_count__gt=0).aggregate(
+        book_count=Coalesce(Sum('book_count'), 0),
+        price_sum=Sum('price_sum'),
+        price_min=Min('price_min'),
+        price_max=Max('price_max'),
+    )
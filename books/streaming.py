@@ -0,0 +1,174 @@
+"""
+Streaming renderers for the unpaginated list endpoints.
+
+The queryset is walked with ``iterator(chunk_size=...)`` and every chunk is
+encoded and handed to the server before the next one is fetched, so memory
+stays bounded by the chunk size instead of growing with the table. The
+``a*`` variants do the same with the async ORM for the async views.
+"""
+
+import itertools
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+NDJSON_CONTENT_TYPE = 'application/x-ndjson'
+
+# Same output settings as rest_framework's JSONRenderer (compact, unicode)
+_encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+def _encode(data):
+    return _encoder.encode(data).replace('\u2028', '\\u2028').replace('\u2029', '\\u2029').encode()
+
+
+class EncodedRows(list):
+    """
+    Rows already encoded to JSON, as bytes: the ``data`` of a response that
+    the renderers splice in as they are (books/fragments.py).
+    """
+
+
+def encode_envelope(data):
+    """
+    _encode(data), where an EncodedRows under "data" (the envelope's last
+    key) is joined in without being decoded.
+    """
+
+    rows = data.get("data") if isinstance(data, dict) else None
+    if not isinstance(rows, EncodedRows):
+        return _encode(data)
+    head = {key: value for key, value in data.items() if key != "data"}
+    prefix = _encode(head)[:-1] + (b',' if head else b'')
+    return prefix + b'"data":[' + b','.join(rows) + b']}'
+
+
+def _chunk_size():
+    return getattr(settings, 'BOOKS_STREAM_CHUNK_SIZE', 2000)
+
+
+def _encoded_chunks(queryset, values):
+    """
+    Yield lists of encoded rows, one list per database chunk.
+    """
+
+    chunk_size = _chunk_size()
+    chunk = []
+    for row in values.rows(queryset).iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            yield [_encode(item) for item in values.serialize(chunk)]
+            chunk = []
+    if chunk:
+        yield [_encode(item) for item in values.serialize(chunk)]
+
+
+def _next_chunk(rows, size):
+    return list(itertools.islice(rows, size))
+
+
+async def _aencoded_chunks(queryset, values):
+    # What aiterator() does, minus its bug: in Django 5.0 values_list()
+    # querysets run their query outside sync_to_async and fail
+    chunk_size = _chunk_size()
+    rows = values.rows(queryset).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = await sync_to_async(_next_chunk)(rows, chunk_size)
+        if chunk:
+            yield [_encode(item) for item in await values.aserialize(chunk)]
+        if len(chunk) < chunk_size:
+            break
+
+
+def iter_json(queryset, values, message):
+    """
+    ``{"status":1,"message":...,"data":[...]}`` emitted piece by piece.
+    """
+
+    yield _encode({"status": 1, "message": message})[:-1] + b',"data":['
+    first = True
+    for chunk in _encoded_chunks(queryset, values):
+        yield (b'' if first else b',') + b','.join(chunk)
+        first = False
+    yield b']}'
+
+
+def iter_ndjson(queryset, values, message):
+    """
+    The envelope (without data) on the first line, then one row per line.
+    """
+
+    yield _encode({"status": 1, "message": message}) + b'\n'
+    for chunk in _encoded_chunks(queryset, values):
+        yield b'\n'.join(chunk) + b'\n'
+
+
+async def aiter_json(queryset, values, message):
+    yield _encode({"status": 1, "message": message})[:-1] + b',"data":['
+    first = True
+    async for chunk in _aencoded_chunks(queryset, values):
+        yield (b'' if first else b',') + b','.join(chunk)
+        first = False
+    yield b']}'
+
+
+async def aiter_ndjson(queryset, values, message):
+    yield _encode({"status": 1, "message": message}) + b'\n'
+    async for chunk in _aencoded_chunks(queryset, values):
+        yield b'\n'.join(chunk) + b'\n'
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Lets content negotiation accept ``application/x-ndjson``; the list views
+    answer such requests with a streaming response, anything else that ends
+    up here is rendered as a single line.
+    """
+
+    media_type = NDJSON_CONTENT_TYPE
+    format = 'ndjson'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return encode_envelope(data) + b'\n'
+
+
+def stream_mode(request):
+    """
+    "json", "ndjson" or None (regular response) for this request.
+
+    Streaming is asked for with ``?stream=json`` / ``?stream=ndjson``, or by
+    sending ``Accept: application/x-ndjson``.
+    """
+
+    mode = request.GET.get('stream')
+    if mode in ('json', 'ndjson'):
+        return mode
+    if NDJSON_CONTENT_TYPE in request.headers.get('Accept', ''):
+        return 'ndjson'
+    return None
+
+
+def streaming_response(mode, queryset, values, message):
+    if mode == 'ndjson':
+        return StreamingHttpResponse(
+            iter_ndjson(queryset, values, message), content_type=NDJSON_CONTENT_TYPE
+        )
+    return StreamingHttpResponse(
+        iter_json(queryset, values, message), content_type='application/json'
+    )
+
+
+def astreaming_response(mode, queryset, values, message):
+    if mode == 'ndjson':
+        return StreamingHttpResponse(
+            aiter_ndjson(queryset, values, message), content_type=NDJSON_CONTENT_TYPE
+        )
+    return StreamingHttpResponse(
+        aiter_json(queryset, values, message), content_type='application/json'
+    )
@@ -1,3 +1,1937 @@
-from django.test import TestCase
+import datetime
+import json
+import os
+import re
+import statistics
+import tempfile
+import time
+import warnings
+from contextlib import contextmanager
+from decimal import Decimal
+from importlib import import_module
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.sql import emit_post_migrate_signal, emit_pre_migrate_signal
+from django.db import IntegrityError, connection, migrations, models, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+
+from BookstoreAPI import settings_api
+from books import (cache, catalog, changes, counters, denormalized, fragments, jobs, metrics, openapi, routers,
+                   search, stats)
+from books.filters import prefix_upper_bound
+from books.fragments import FragmentJSONRenderer
+from books.models import Author, AuthorStats, Book, Change, Job, RowCount, YearStats
+from books.pagination import encode_cursor
+from books.routers import ReadReplicaRouter
+from books.serializers import AuthorSerializer, BookSerializer, ValuesSerializer
+from books.signals import bulk_created
+from books.streaming import EncodedRows
+from books.urls import urlpatterns
+from books.views import BookDetailView
+
+# Savepoints are how TestCase nests the atomic blocks of the write paths;
+# budgets count the statements that read or write
+TRANSACTION_CONTROL = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT', 'BEGIN', 'COMMIT')
+
+
+class QueryBudgetMixin:
+
+    @contextmanager
+    def assertQueryBudget(self, budget):
+        """
+        Fail unless the block runs exactly ``budget`` statements, transaction control aside.
+        """
+
+        with CaptureQueriesContext(connection) as captured:
+            yield captured
+        statements = [query['sql'] for query in captured.captured_queries
+                      if not query['sql'].startswith(TRANSACTION_CONTROL)]
+        self.assertEqual(
+            len(statements), budget,
+            f"{len(statements)} statements, budget {budget}:\n" + '\n'.join(statements),
+        )
+
+    def updates(self, captured, table):
+        return [query['sql'] for query in captured.captured_queries
+                if query['sql'].startswith(f'UPDATE "{table}"')]
+
+    def send(self, method, path, data=None, **headers):
+        return getattr(self.client, method)(path, data, content_type='application/json', **headers)
+
+
+class CursorPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(name="Ann", email="ann@example.com", bio="Bio")
+        # Repeated prices, so pages split runs of equal keys
+        Book.objects.bulk_create([
+            Book(title=f"Book {i}", author=cls.author, published_date=datetime.date(2000 + i % 4, 1, 1),
+                 price=Decimal(i % 3))
+            for i in range(11)
+        ])
+
+    def walk(self, path, **params):
+        pages = [self.client.get(path, params).json()]
+        while pages[-1]['paginator']['next_cursor']:
+            pages.append(self.client.get(path, {**params, 'cursor': pages[-1]['paginator']['next_cursor']}).json())
+        return pages
+
+    def ids(self, page):
+        return [row['id'] for row in page['data']]
+
+    def test_forward_and_back(self):
+        for ordering in ('id', 'price', '-price', '-published_date'):
+            pages = self.walk('/api/listing-all-books/', page_size=3, ordering=ordering)
+            expected = list(Book.objects.order_by(ordering, '-id' if ordering.startswith('-') else 'id')
+                            .values_list('id', flat=True))
+            self.assertEqual([pk for page in pages for pk in self.ids(page)], expected, ordering)
+            self.assertIsNone(pages[0]['paginator']['prev_cursor'])
+            back = self.client.get('/api/listing-all-books/', {
+                'page_size': 3, 'ordering': ordering, 'cursor': pages[-1]['paginator']['prev_cursor'],
+            }).json()
+            self.assertEqual(self.ids(back), self.ids(pages[-2]), ordering)
+
+    def test_rows_do_not_shift(self):
+        before = list(Book.objects.order_by('price', 'id').values_list('id', flat=True))
+        first = self.client.get('/api/listing-all-books/', {'page_size': 3, 'ordering': 'price'}).json()
+        # Sorts before the cursor: an OFFSET page would repeat a row
+        Book.objects.create(title="Cheap", author=self.author, published_date=datetime.date(2000, 1, 1), price=-1)
+        second = self.client.get('/api/listing-all-books/', {
+            'page_size': 3, 'ordering': 'price', 'cursor': first['paginator']['next_cursor'],
+        }).json()
+        self.assertEqual(self.ids(second), before[3:6])
+
+    def test_post_with_cursor(self):
+        page = self.client.post('/api/listing-all-books/', {'page_size': 4, 'cursor': ''},
+                                content_type='application/json').json()
+        self.assertEqual(self.ids(page), list(Book.objects.order_by('id').values_list('id', flat=True)[:4]))
+        self.assertIn('next_cursor', page['paginator'])
+
+    def test_ordering_mismatch(self):
+        cursor = self.client.get('/api/listing-all-books/', {'page_size': 3, 'ordering': 'price'}).json()[
+            'paginator']['next_cursor']
+        response = self.client.get('/api/listing-all-books/', {'page_size': 3, 'ordering': 'title', 'cursor': cursor})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['message'], {'cursor': ["Cursor does not match the requested ordering"]})
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/listing-all-books/', {'page_size': 3, 'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('cursor', response.json()['message'])
+
+    def test_tampered_cursor(self):
+        # Well-formed cursors whose key is not a date
+        for key in ([2020, 1, 1], {'year': 2020}, "2020-13-45", 20200101):
+            with self.subTest(key=key):
+                cursor = encode_cursor('published_date', key, 1)
+                response = self.client.get('/api/listing-all-books/', {
+                    'page_size': 3, 'ordering': 'published_date', 'cursor': cursor,
+                })
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()['message'], {'cursor': ["Invalid cursor"]})
+
+
+class RowCounterTests(QueryBudgetMixin, TestCase):
+
+    def setUp(self):
+        self.author = Author.objects.create(name="Ann", email="ann@example.com", bio="Bio")
+        counters.reconcile([Author, Book])
+
+    def create_books(self, count):
+        for i in range(count):
+            Book.objects.create(title=f"Book {i}", author=self.author, published_date=datetime.date(2020, 1, 1),
+                                price=Decimal('10.00'))
+
+    def test_follows_writes(self):
+        self.create_books(3)
+        self.assertEqual(counters.row_count(Book), 3)
+        self.client.delete(f'/api/authors/{self.author.pk}/')
+        self.assertEqual((counters.row_count(Author), counters.row_count(Book)), (0, 0))
+
+    def test_batch_is_one_update(self):
+        with self.assertQueryBudget(1), counters.batch():
+            for delta in (1, 1, -3):
+                counters.adjust(Book, delta)
+        self.assertEqual(counters.row_count(Book), -1)
+
+    def test_batch_rolls_back(self):
+        with self.assertRaises(RuntimeError), transaction.atomic(), counters.batch():
+            self.create_books(2)
+            raise RuntimeError
+        self.assertEqual(Book.objects.count(), 0)
+        self.assertEqual(counters.row_count(Book), 0)
+
+    def test_reconcile(self):
+        self.create_books(2)
+        # bulk_create() sends no signal
+        Book.objects.bulk_create([Book(title="Raw", author=self.author, published_date=datetime.date(2020, 1, 1),
+                                       price=Decimal('1.00'))])
+        out = StringIO()
+        call_command('reconcile_counts', '--dry-run', stdout=out)
+        self.assertIn("books.Book: stored 2, actual 3", out.getvalue())
+        self.assertEqual(counters.row_count(Book), 2)
+        self.assertEqual(counters.reconcile([Book]), [('books.Book', 2, 3)])
+        self.assertEqual(counters.row_count(Book), 3)
+
+    def test_seeded_when_missing(self):
+        self.create_books(2)
+        RowCount.objects.all().delete()
+        self.assertEqual(counters.row_count(Book), 2)
+        self.assertTrue(RowCount.objects.filter(table='books.Book', count=2).exists())
+
+
+@override_settings(BOOKS_STREAM_CHUNK_SIZE=3)
+class StreamingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # Characters the encoder escapes, or must not
+        cls.author = Author.objects.create(name='Ann "Quote"', email="ann@example.com", bio="Line\u2028break\né")
+        Book.objects.bulk_create([
+            Book(title=f"Book {i} \\ </script>", author=cls.author, author_name=cls.author.name,
+                 published_date=datetime.date(2000 + i, 1, 1), price=Decimal(i) / 4)
+            for i in range(8)
+        ])
+
+    def streamed(self, path, **headers):
+        response = self.client.get(path, headers=headers)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_json_is_the_regular_body(self):
+        for path in ('/api/authors/', '/api/books/', '/api/books/?fields=id,title&expand=author',
+                     '/api/books/?ordering=-price&min_price=0.5', '/api/authors/?expand=books'):
+            separator = '&' if '?' in path else '?'
+            _, body = self.streamed(f'{path}{separator}stream=json')
+            self.assertEqual(body, self.client.get(path).content, path)
+
+    def test_ndjson(self):
+        regular = self.client.get('/api/books/').json()
+        for response, body in (self.streamed('/api/books/?stream=ndjson'),
+                               self.streamed('/api/books/', Accept='application/x-ndjson')):
+            self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+            head, *rows = [json.loads(line) for line in body.decode().splitlines()]
+            self.assertEqual(head, {'status': 1, 'message': regular['message']})
+            self.assertEqual(rows, regular['data'])
+
+    def test_empty(self):
+        Book.objects.all().delete()
+        _, body = self.streamed('/api/books/?stream=json')
+        self.assertEqual(body, self.client.get('/api/books/').content)
+        _, body = self.streamed('/api/books/?stream=ndjson')
+        self.assertEqual(len(body.splitlines()), 1)
+
+
+class BulkWriteTests(QueryBudgetMixin, TestCase):
+
+    def setUp(self):
+        self.author = Author.objects.create(name="Ann", email="ann@example.com", bio="Bio")
+        counters.reconcile([Author, Book])
+
+    def book(self, title, **changes):
+        return {'title': title, 'author': self.author.pk, 'published_date': '2020-01-01', 'price': '10.00', **changes}
+
+    def statuses(self, response):
+        return [item['status'] for item in response.json()['data']]
+
+    def test_per_item_errors(self):
+        response = self.send('post', '/api/books/bulk/', [
+            self.book("First"), self.book(""), self.book("Third", author=999), self.book("Fourth"),
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['message'], "2 of 4 items failed")
+        first, blank, unknown, fourth = response.json()['data']
+        self.assertEqual(blank['message'], {'title': ["This field may not be blank."]})
+        self.assertEqual(unknown['message'], {'author': ['Invalid pk "999" - object does not exist.']})
+        self.assertEqual(sorted(Book.objects.values_list('id', flat=True)), [first['id'], fourth['id']])
+        self.assertEqual(counters.row_count(Book), 2)
+
+    def test_all_failed(self):
+        response = self.send('post', '/api/authors/bulk/', [
+            {'name': "Bob", 'email': "ann@example.com", 'bio': "Bio"},
+            {'name': "Cy", 'email': "cy@example.com", 'bio': "Bio"},
+            {'name': "Cy", 'email': "cy@example.com", 'bio': "Bio"},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.statuses(response), [0, 1, 0])
+        response = self.send('post', '/api/authors/bulk/', [{'name': "Bob", 'email': "ann@example.com", 'bio': "Bio"}])
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_payload(self):
+        for payload in ({'title': "Not a list"}, []):
+            self.assertEqual(self.send('post', '/api/books/bulk/', payload).status_code, 400)
+        with override_settings(BOOKS_BULK_MAX_ITEMS=2):
+            response = self.send('post', '/api/books/bulk/', [self.book(f"Book {i}") for i in range(3)])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Book.objects.exists())
+
+    def test_update(self):
+        book = Book.objects.create(title="First", author=self.author, published_date=datetime.date(2020, 1, 1),
+                                   price=Decimal('10.00'))
+        response = self.send('put', '/api/books/bulk/', [
+            {'id': book.pk, 'price': '12.00'}, {'price': '1.00'}, {'id': book.pk, 'title': "Again"}, {'id': 999},
+        ])
+        self.assertEqual(self.statuses(response), [1, 0, 0, 0])
+        self.assertEqual([item.get('message') for item in response.json()['data']][1:], [
+            {'id': ["This field is required."]}, {'id': ["Duplicate id in request."]}, {'id': ["Not found."]},
+        ])
+        book.refresh_from_db()
+        self.assertEqual((book.title, book.price), ("First", Decimal('12.00')))
+
+    def test_delete(self):
+        book = Book.objects.create(title="First", author=self.author, published_date=datetime.date(2020, 1, 1),
+                                   price=Decimal('10.00'))
+        response = self.send('delete', '/api/books/bulk/', {'ids': [book.pk, 999, book.pk]})
+        self.assertEqual(self.statuses(response), [1, 0, 0])
+        self.assertFalse(Book.objects.exists())
+        self.assertEqual(counters.row_count(Book), 0)
+
+    @override_settings(BOOKS_BULK_BATCH_SIZE=2)
+    def test_batches_are_atomic(self):
+        def fail(sender, instances, **kwargs):
+            if any(instance.title == "Poison" for instance in instances):
+                raise IntegrityError("CHECK constraint failed")
+
+        bulk_created.connect(fail, sender=Book)
+        try:
+            response = self.send('post', '/api/books/bulk/', [
+                self.book("One"), self.book("Two"), self.book("Three"), self.book("Poison"), self.book("Five"),
+            ])
+        finally:
+            bulk_created.disconnect(fail, sender=Book)
+        self.assertEqual(self.statuses(response), [1, 1, 0, 0, 1])
+        self.assertEqual(response.json()['data'][2]['message'],
+                         {'non_field_errors': ["Batch rolled back: CHECK constraint failed"]})
+        self.assertEqual(set(Book.objects.values_list('title', flat=True)), {"One", "Two", "Five"})
+        self.assertEqual(counters.row_count(Book), 3)
+
+
+class DetailCacheTests(QueryBudgetMixin, TestCase):
+
+    def setUp(self):
+        cache.reset_detail_cache()
+        self.author = Author.objects.create(name="Ann", email="ann@example.com", bio="Bio")
+        self.book = Book.objects.create(title="First", author=self.author, published_date=datetime.date(2020, 1, 1),
+                                        price=Decimal('10.00'))
+
+    def tearDown(self):
+        cache.reset_detail_cache()
+
+    def cached(self, model, pk):
+        return cache.detail_cache().get(cache.cache_key(model, pk)) is not cache._MISSING
+
+    def warm(self):
+        self.client.get(f'/api/authors/{self.author.pk}/')
+        self.client.get(f'/api/books/{self.book.pk}/')
+        self.assertTrue(self.cached(Author, self.author.pk) and self.cached(Book, self.book.pk))
+
+    def test_hit_after_miss(self):
+        self.warm()
+        with self.assertQueryBudget(0):
+            response = self.client.get(f'/api/books/{self.book.pk}/')
+        self.assertEqual(response.json()['data']['title'], "First")
+
+    def test_patch(self):
+        self.warm()
+        self.send('patch', f'/api/books/{self.book.pk}/', {'title': "Renamed"})
+        self.assertFalse(self.cached(Book, self.book.pk))
+        self.assertEqual(self.client.get(f'/api/books/{self.book.pk}/').json()['data']['title'], "Renamed")
+
+    def test_delete(self):
+        self.warm()
+        self.client.delete(f'/api/books/{self.book.pk}/')
+        self.assertFalse(self.cached(Book, self.book.pk))
+        self.assertEqual(self.client.get(f'/api/books/{self.book.pk}/').status_code, 404)
+        # The author's book_count moved
+        self.assertFalse(self.cached(Author, self.author.pk))
+
+    def test_cascade(self):
+        self.warm()
+        self.client.delete(f'/api/authors/{self.author.pk}/')
+        self.assertFalse(self.cached(Book, self.book.pk))
+        self.assertEqual(self.client.get(f'/api/books/{self.book.pk}/').status_code, 404)
+
+    def test_bulk(self):
+        self.warm()
+        self.send('put', '/api/books/bulk/', [{'id': self.book.pk, 'price': '12.00'}])
+        self.assertFalse(self.cached(Book, self.book.pk))
+        self.assertEqual(self.client.get(f'/api/books/{self.book.pk}/').json()['data']['price'], '12.00')
+        self.client.get(f'/api/books/{self.book.pk}/')
+        self.send('delete', '/api/books/bulk/', {'ids': [self.book.pk]})
+        self.assertFalse(self.cached(Book, self.book.pk))
+
+    def test_batch_read_fills(self):
+        response = self.send('post', '/api/books/batch/', {'ids': [self.book.pk, 999]})
+        self.assertEqual(response.json()['missing'], [999])
+        self.assertTrue(self.cached(Book, self.book.pk))
+        with self.assertQueryBudget(0):
+            response = self.client.get(f'/api/books/?ids={self.book.pk}')
+        self.assertEqual(response.json()['data'][0]['title'], "First")
+
+    def test_store_after_invalidate_is_dropped(self):
+        # A read that loaded the row before a write invalidated it
+        for backend in ('books.cache.LocMemLRUCache', 'books.cache.DjangoCache'):
+            with self.subTest(backend=backend), override_settings(BOOKS_DETAIL_CACHE={'BACKEND': backend}):
+                generation = cache.generation(Book, self.book.pk)
+                stale = {'title': "First"}
+                cache.invalidate(Book, [self.book.pk])
+                cache.store(Book, self.book.pk, stale, generation)
+                self.assertIsNone(cache.peek(Book, self.book.pk))
+                cache.store_many(Book, {self.book.pk: stale}, {self.book.pk: generation})
+                self.assertIsNone(cache.peek(Book, self.book.pk))
+                cache.store(Book, self.book.pk, stale, cache.generation(Book, self.book.pk))
+                self.assertEqual(cache.peek(Book, self.book.pk), stale)
+                cache.detail_cache().clear()
+
+    @override_settings(BOOKS_DETAIL_CACHE={'OPTIONS': {'MAX_ENTRIES': 2}})
+    def test_forgotten_generations(self):
+        generation = cache.generation(Book, 1)
+        cache.invalidate(Book, [1, 2, 3])
+        cache.store(Book, 1, {}, generation)
+        self.assertIsNone(cache.peek(Book, 1))
+
+
+class ConditionalRequestTests(QueryBudgetMixin, TestCase):
+
+    def setUp(self):
+        cache.reset_detail_cache()
+        self.author = Author.objects.create(name="Ann", email="ann@example.com", bio="Bio")
+        self.book = Book.objects.create(title="First", author=self.author, published_date=datetime.date(2020, 1, 1),
+                                        price=Decimal('10.00'))
+
+    def tearDown(self):
+        cache.reset_detail_cache()
+
+    def test_detail_not_modified(self):
+        path = f'/api/books/{self.book.pk}/'
+        response = self.client.get(path)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        for headers in ({'HTTP_IF_NONE_MATCH': etag}, {'HTTP_IF_MODIFIED_SINCE': last_modified}):
+            with self.subTest(headers=headers):
+                response = self.client.get(path, **headers)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+        self.send('patch', path, {'title': "Renamed"})
+        response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_detail_not_modified_uncached(self):
+        etag = self.client.get(f'/api/authors/{self.author.pk}/')['ETag']
+        cache.detail_cache().clear()
+        with self.assertQueryBudget(1):
+            response = self.client.get(f'/api/authors/{self.author.pk}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.get('/api/authors/999/', HTTP_IF_NONE_MATCH=etag).status_code, 404)
+
+    def test_list_not_modified(self):
+        response = self.client.get('/api/books/')
+        etag = response['ETag']
+        self.assertIn('Accept', response['Vary'])
+        # max(updated_at) stays put when a row is deleted: no Last-Modified to revalidate against
+        self.assertFalse(response.has_header('Last-Modified'))
+        response = self.client.get('/api/books/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('Accept', response['Vary'])
+        # Another query string is another representation
+        self.assertNotEqual(self.client.get('/api/books/?ordering=-price')['ETag'], etag)
+        Book.objects.create(title="Second", author=self.author, published_date=datetime.date(2021, 1, 1),
+                            price=Decimal('5.00'))
+        self.assertEqual(self.client.get('/api/books/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        etag = self.client.get('/api/books/')['ETag']
+        self.book.delete()
+        self.assertEqual(self.client.get('/api/books/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_if_match(self):
+        path = f'/api/books/{self.book.pk}/'
+        etag = self.client.get(path)['ETag']
+        response = self.send('patch', path, {'title': "Renamed"}, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        # The second writer still holds the first ETag
+        response = self.send('patch', path, {'title': "Lost"}, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(response.json(), {
+            "status": 0, "message": "The resource was modified since the given ETag / date"})
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.title, "Renamed")
+        response = self.send('put', f'/api/authors/{self.author.pk}/',
+                             {'name': "Bo", 'email': "bo@example.com", 'bio': "Bio"}, HTTP_IF_MATCH='"stale"')
+        self.assertEqual(response.status_code, 412)
+
+    def test_if_match_race(self):
+        # Two writers read the same ETag; the second passes the view's check before the first commits
+        path = f'/api/books/{self.book.pk}/'
+        etag = self.client.get(path)['ETag']
+        stale = Book.objects.get(pk=self.book.pk)
+        self.assertEqual(self.send('patch', path, {'title': "Renamed"}, HTTP_IF_MATCH=etag).status_code, 200)
+        with mock.patch.object(BookDetailView, 'get_object', return_value=stale):
+            response = self.send('patch', path, {'title': "Lost"}, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 412)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.title, "Renamed")
+        # Without a precondition the last writer wins, with no extra query
+        with self.assertQueryBudget(2):
+            self.assertEqual(self.send('patch', path, {'title': "Last"}).status_code, 200)
+
+
+class ValuesSerializerTests(TestCase):
+
+    def setUp(self):
+        self.author = Author.objects.create(name="Ann \u00e9", email="ann@example.com", bio="Line\nbreak")
+        for title, price, published in (("First", '10.5', (2020, 1, 1)), ("Second", '0.01', (1999, 12, 31)),
+                                        ("Third", '12345678.90', (2021, 6, 30))):
+            Book.objects.create(title=title, author=self.author, published_date=datetime.date(*published),
+                                price=Decimal(price))
+        Author.objects.create(name="Bob", email="bob@example.com", bio="")
+
+    def assertSameOutput(self, model, serializer_class):
+        queryset = model.objects.order_by('id')
+        expected = serializer_class(queryset, many=True).data
+        values = ValuesSerializer.for_serializer(serializer_class)
+        self.assertEqual(json.dumps(values.serialize(queryset)), json.dumps(expected))
+
+    def test_same_output(self):
+        self.assertSameOutput(Author, AuthorSerializer)
+        self.assertSameOutput(Book, BookSerializer)
+
+    @override_settings(TIME_ZONE='America/New_York')
+    def test_same_output_outside_utc(self):
+        self.assertSameOutput(Author, AuthorSerializer)
+        self.assertSameOutput(Book, BookSerializer)
+
+    def test_rows_and_async(self):
+        values = ValuesSerializer.for_serializer(BookSerializer)
+        queryset = Book.objects.order_by('id')
+        expected = values.serialize(queryset)
+        self.assertEqual(values.serialize(list(values.rows(queryset))), expected)
+        self.assertEqual(async_to_sync(values.aserialize)(queryset), expected)
+
+
+class FieldsetTests(QueryBudgetMixin, TestCase):
+
+    def setUp(self):
+        self.ann = Author.objects.create(name="Ann", email="ann@example.com", bio="Bio")
+        self.bob = Author.objects.create(name="Bob", email="bob@example.com", bio="Bio")
+        for title in ("First", "Second"):
+            Book.objects.create(title=title, author=self.ann, published_date=datetime.date(2020, 1, 1),
+                                price=Decimal('10.00'))
+
+    def data(self, path):
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()['data']
+
+    def test_fields(self):
+        rows = self.data('/api/books/?fields=title,id')
+        # In the serializer's field order
+        self.assertEqual(rows, [{'id': book.pk, 'title': book.title} for book in Book.objects.order_by('id')])
+        self.assertEqual(self.data('/api/books/?fields=')[0].keys(), BookSerializer().fields.keys())
+
+    def test_expand_forward(self):
+        self.ann.refresh_from_db()
+        author = AuthorSerializer(self.ann).data
+        # Validators of both tables, then one joined query
+        with self.assertQueryBudget(5):
+            rows = self.data('/api/books/?expand=author')
+        self.assertEqual([row['author'] for row in rows], [author, author])
+        # Expanding is dropped with the field
+        rows = self.data('/api/books/?fields=id,title&expand=author')
+        self.assertNotIn('author', rows[0])
+        rows = self.data('/api/books/?fields=title,author&expand=author')
+        self.assertEqual(rows[0], {'title': "First", 'author': author})
+
+    def test_expand_reverse(self):
+        # Validators of both tables, the authors, then their books in one query
+        with self.assertQueryBudget(6):
+            rows = self.data('/api/authors/?expand=books')
+        books = BookSerializer(Book.objects.order_by('id'), many=True).data
+        self.assertEqual([row['books'] for row in rows], [books, []])
+        rows = self.data('/api/authors/?fields=name&expand=books')
+        self.assertEqual(rows[1], {'name': "Bob", 'books': []})
+
+    def test_invalid(self):
+        response = self.client.get('/api/books/?fields=title,nope')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['message'], {'fields': ["Unknown fields: nope"]})
+        response = self.client.get('/api/authors/?expand=author')
+        self.assertEqual(response.json()['message'], {'expand': ["Cannot expand: author. Allowed: books"]})
+
+    def test_expand_changes_etag(self):
+        etag = self.client.get('/api/books/?expand=author')['ETag']
+        Author.objects.filter(pk=self.ann.pk).update(bio="New")
+        self.ann.save()
+        self.assertEqual(self.client.get('/api/books/?expand=author', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class SearchTests(TestCase):
+
+    def setUp(self):
+        self.ann = Author.objects.create(name="Ann Garden", email="ann@example.com", bio="Writes about rivers")
+        self.bob = Author.objects.create(name="Bob", email="bob@example.com", bio="Gardener")
+        self.garden = Book.objects.create(
+            title="The Garden", author=self.bob, published_date=datetime.date(2020, 1, 1), price=Decimal('10.00'),
+        )
+        self.river = Book.objects.create(
+            title="The River", author=self.ann, published_date=datetime.date(2020, 1, 1), price=Decimal('10.00'),
+        )
+
+    def hits(self, q, kind='all'):
+        response = self.client.get('/api/search/', {'q': q, 'type': kind})
+        self.assertEqual(response.status_code, 200)
+        return [(hit['type'], hit['data']['id']) for hit in response.json()['data']]
+
+    def test_ranking(self):
+        # A title hit outranks a hit on the author's name
+        self.assertEqual(self.hits("garden", 'books'), [('book', self.garden.pk), ('book', self.river.pk)])
+        self.assertEqual(self.hits("garden", 'authors'), [('author', self.ann.pk), ('author', self.bob.pk)])
+
+    def test_last_word_is_a_prefix(self):
+        self.assertEqual(self.hits("the riv", 'books'), [('book', self.river.pk)])
+        self.assertEqual(self.hits("riv the", 'books'), [])
+
+    def test_syntax_is_not_interpreted(self):
+        self.assertEqual(self.hits('"river" OR NEAR(', 'books'), [])
+
+    def test_rename(self):
+        self.ann.name = "Ann Meadow"
+        self.ann.save()
+        self.assertEqual(self.hits("meadow", 'books'), [('book', self.river.pk)])
+        self.assertEqual(self.hits("garden", 'books'), [('book', self.garden.pk)])
+
+    def test_update_and_delete(self):
+        Book.objects.filter(pk=self.garden.pk).update(title="The Orchard")
+        self.assertEqual(self.hits("orchard"), [('book', self.garden.pk)])
+        self.client.delete(f'/api/authors/{self.ann.pk}/')
+        self.assertEqual(self.hits("river"), [])
+        self.assertEqual(self.hits("garden"), [('author', self.bob.pk)])
+
+
+class SearchMigrationTests(TransactionTestCase):
+    """
+    A migration that rebuilds books_book runs without the triggers, which
+    come back after it with the rows reindexed.
+    """
+
+    def test_table_rebuild(self):
+        author = Author.objects.create(name="Ann", email="ann@example.com", bio="Bio")
+        old = Book._meta.get_field('title')
+        new = models.CharField(max_length=300)
+        new.set_attributes_from_name('title')
+        new.model = Book
+        emit_pre_migrate_signal(0, False, connection.alias)
+        # SQLite copies books_book for both changes
+        with connection.schema_editor() as editor:
+            editor.alter_field(Book, old, new)
+        Book.objects.create(
+            title="Written while migrating", author=author, published_date=datetime.date(2020, 1, 1), price=Decimal('10'),
+        )
+        with connection.schema_editor() as editor:
+            editor.alter_field(Book, new, old)
+        plan = [(migrations.Migration('0010_rebuild', 'books'), False)]
+        emit_post_migrate_signal(0, False, connection.alias, plan=plan)
+
+        self.assertEqual(search.search(search.match_expression("migrating"), ('book',), 10, 0)[1], 1)
+        Book.objects.filter(title__startswith="Written").update(title="Renamed")
+        self.assertEqual(search.search(search.match_expression("renamed"), ('book',), 10, 0)[1], 1)
+
+
+class BookFilterTests(QueryBudgetMixin, TestCase):
+
+    def setUp(self):
+        self.ann = Author.objects.create(name="Ann", email="ann@example.com", bio="Bio")
+        self.bob = Author.objects.create(name="Bob", email="bob@example.com", bio="Bio")
+        for title, author, price, published in (
+            ("Apple", self.ann, '5.00', (2019, 5, 1)),
+            ("Apricot", self.bob, '15.00', (2020, 1, 1)),
+            ("Banana", self.ann, '25.00', (2021, 12, 31)),
+            ("apple", self.bob, '35.00', (2022, 6, 1)),
+            ("\ud7ff\u00e9", self.ann, '45.00', (2023, 1, 1)),
+            ("\U0010ffff\U0010ffff", self.bob, '55.00', (2024, 1, 1)),
+        ):
+            Book.objects.create(title=title, author=author, price=Decimal(price),
+                                published_date=datetime.date(*published))
+        counters.reconcile([Book])
+
+    def titles(self, query):
+        response = self.client.get(f'/api/books/?{query}')
+        self.assertEqual(response.status_code, 200, response.content)
+        return [row['title'] for row in response.json()['data']]
+
+    def test_each_filter(self):
+        for query, titles in (
+            (f'author={self.ann.pk}', ["Apple", "Banana", "\ud7ff\u00e9"]),
+            ('min_price=25', ["Banana", "apple", "\ud7ff\u00e9", "\U0010ffff\U0010ffff"]),
+            ('max_price=15', ["Apple", "Apricot"]),
+            ('published_from=2021-12-31', ["Banana", "apple", "\ud7ff\u00e9", "\U0010ffff\U0010ffff"]),
+            ('published_to=2020-01-01', ["Apple", "Apricot"]),
+            ('title_prefix=Ap', ["Apple", "Apricot"]),
+            ('title_prefix=ap', ["apple"]),
+            (f'author={self.bob.pk}&min_price=10&max_price=40&published_to=2021-01-01', ["Apricot"]),
+        ):
+            with self.subTest(query=query):
+                self.assertEqual(self.titles(query), titles)
+
+    def test_ordering(self):
+        self.assertEqual(self.titles('ordering=-price&max_price=25'), ["Banana", "Apricot", "Apple"])
+        self.assertEqual(self.titles('ordering=title&max_price=35'), ["Apple", "Apricot", "Banana", "apple"])
+        self.assertEqual(self.client.get('/api/books/?ordering=bio').status_code, 400)
+
+    def test_invalid(self):
+        for query in ('author=0', 'min_price=cheap', 'published_from=2020-13-01', f'title_prefix={"x" * 201}'):
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(f'/api/books/?{query}').status_code, 400)
+
+    def test_prefix_edges(self):
+        self.assertEqual(self.titles('title_prefix=%ED%9F%BF'), ["\ud7ff\u00e9"])
+        self.assertEqual(self.titles('title_prefix=%F4%8F%BF%BF'), ["\U0010ffff\U0010ffff"])
+        self.assertEqual(prefix_upper_bound("ab"), "ac")
+        self.assertEqual(prefix_upper_bound("a\ud7ff"), "a\ue000")
+        self.assertEqual(prefix_upper_bound("a\U0010ffff"), "b")
+        self.assertIsNone(prefix_upper_bound("\U0010ffff"))
+
+    def test_blank_values(self):
+        self.assertEqual(len(self.titles('title_prefix=&author=')), 6)
+        # Counted from the row counter, as without filters
+        with self.assertQueryBudget(2):
+            response = self.send('post', '/api/listing-all-books/', {'page': 1, 'page_size': 2, 'title_prefix': ''})
+        self.assertEqual(response.json()['paginator']['total_records'], 6)
+        response = self.send('post', '/api/listing-all-books/', {'page': 1, 'page_size': 2, 'title_prefix': 'Ap'})
+        self.assertEqual(response.json()['paginator']['total_records'], 2)
+
+
+@override_settings(BOOKS_STREAM_CHUNK_SIZE=3)
+class AsyncViewTests(TestCase):
+    """
+    The /api/async/ views answer like their synchronous counterparts.
+    """
+
+    def setUp(self):
+        cache.reset_detail_cache()
+        self.ann = Author.objects.create(name="Ann", email="ann@example.com", bio="Bio")
+        self.bob = Author.objects.create(name="Bob", email="bob@example.com", bio="Line\u2028break")
+        for i in range(7):
+            Book.objects.create(title=f"Book {i}", author=self.ann if i % 2 else self.bob,
+                                published_date=datetime.date(2000 + i, 1, 1), price=Decimal(i))
+
+    def tearDown(self):
+        cache.reset_detail_cache()
+
+    async def body(self, response):
+        if response.streaming:
+            return b''.join([chunk async for chunk in response])
+        return response.content
+
+    async def assertSameResponse(self, path, method='get', data=None, headers=None):
+        responses = []
+        for prefix in ('/api/', '/api/async/'):
+            # Both views serialize rather than share a cached detail
+            cache.detail_cache().clear()
+            response = await getattr(self.async_client, method)(
+                prefix + path, data, content_type='application/json', headers=headers)
+            responses.append((response, await self.body(response)))
+        (sync, sync_body), (async_, async_body) = responses
+        self.assertEqual(async_.status_code, sync.status_code, path)
+        self.assertEqual(async_body, sync_body, path)
+        for header in ('Last-Modified', 'Content-Type'):
+            self.assertEqual(async_.get(header), sync.get(header), f"{header} of {path}")
+        # A list's ETag hashes its URL; a row's is the same under both
+        self.assertEqual(async_.has_header('ETag'), sync.has_header('ETag'), path)
+        if re.fullmatch(r'\w+/\d+/', path):
+            self.assertEqual(async_.get('ETag'), sync.get('ETag'), path)
+        return async_
+
+    async def test_get(self):
+        for path in (
+            'authors/', 'books/', 'books/?ordering=-price&min_price=3', 'books/?fields=id,title&expand=author',
+            'authors/?expand=books', f'authors/{self.ann.pk}/', f'books/{self.ann.pk}/', 'books/999/',
+            'books/?stream=ndjson', 'books/?stream=json&ordering=-title', 'authors/?stream=json&expand=books',
+            'books/?ordering=bad', 'listing-all-authors/?page_size=1&expand=books',
+            'listing-all-books/?page_size=3&cursor=garbage',
+        ):
+            with self.subTest(path=path):
+                await self.assertSameResponse(path)
+
+    async def test_cursor(self):
+        path = 'listing-all-books/?page_size=3&ordering=-published_date'
+        response = await self.assertSameResponse(path)
+        cursor = json.loads(response.content)['paginator']['next_cursor']
+        await self.assertSameResponse(f'{path}&cursor={cursor}')
+
+    async def test_post(self):
+        for path, data in (
+            ('listing-all-authors/', {'page': 2, 'page_size': 1}),
+            ('listing-all-books/', {'page': 1, 'page_size': 3, 'author': self.ann.pk}),
+            ('listing-all-authors/', {'page_size': 2, 'cursor': ''}),
+            ('listing-all-authors/', {'page': 1, 'page_size': 2, 'expand': ['books']}),
+            ('listing-all-authors/', {'page': 0}),
+        ):
+            with self.subTest(path=path, data=data):
+                await self.assertSameResponse(path, 'post', data)
+
+    async def test_not_modified(self):
+        path = f'books/{self.ann.pk}/'
+        response = await self.assertSameResponse(path)
+        response = await self.assertSameResponse(path, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+        path = f'authors/{self.ann.pk}/'
+        response = await self.assertSameResponse(path)
+        response = await self.assertSameResponse(path, headers={'If-Modified-Since': response['Last-Modified']})
+        self.assertEqual(response.status_code, 304)
+        etag = (await self.async_client.get('/api/async/books/?author=1'))['ETag']
+        response = await self.async_client.get('/api/async/books/?author=1', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+
+class RecordingRouter(ReadReplicaRouter):
+    """
+    ReadReplicaRouter noting the alias it picks for each model read, which
+    is then served by the primary (the test 'replica' has no connection).
+    """
+
+    reads = []
+
+    def db_for_read(self, model, **hints):
+        self.reads.append((model._meta.label, super().db_for_read(model, **hints)))
+        return 'default'
+
+
+@override_settings(
+    DATABASE_ROUTERS=['books.tests.RecordingRouter'],
+    MIDDLEWARE=['books.middleware.read_replica_middleware', *settings.MIDDLEWARE],
+    BOOKS_READ_REPLICA='replica',
+)
+class ReadReplicaRouterTests(TestCase):
+
+    def setUp(self):
+        # A 'replica' alias for the router to pick
+        databases = override_settings(DATABASES={**settings.DATABASES, 'replica': settings.DATABASES['default']})
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            databases.enable()
+        self.addCleanup(databases.disable)
+        cache.reset_detail_cache()
+        self.author = Author.objects.create(name="Ann", email="ann@example.com", bio="Bio")
+        RecordingRouter.reads = []
+
+    def tearDown(self):
+        cache.reset_detail_cache()
+
+    def aliases(self):
+        return {alias for _, alias in RecordingRouter.reads}
+
+    def test_alias(self):
+        router = ReadReplicaRouter()
+        self.assertEqual(router.db_for_read(Author), 'default')
+        with routers.read_only():
+            self.assertEqual(router.db_for_read(Author), 'replica')
+            self.assertEqual(router.db_for_write(Author), 'default')
+            with routers.read_only(False):
+                self.assertEqual(router.db_for_read(Author), 'default')
+        for replica in (None, 'missing'):
+            with self.subTest(replica=replica), override_settings(BOOKS_READ_REPLICA=replica), routers.read_only():
+                self.assertEqual(router.db_for_read(Author), 'default')
+        self.assertFalse(router.allow_migrate('replica', 'books'))
+        self.assertTrue(router.allow_migrate('default', 'books'))
+
+    def test_read_only_requests(self):
+        self.client.get('/api/authors/')
+        self.client.get('/api/search/?q=Ann')
+        self.assertEqual(self.aliases(), {'replica'})
+
+    def test_streamed_bodies_read_the_primary(self):
+        response = self.client.get('/api/authors/?stream=ndjson')
+        RecordingRouter.reads = []
+        b''.join(response.streaming_content)
+        self.assertEqual(self.aliases(), {'default'})
+
+    def test_writes_read_the_primary(self):
+        self.client.patch(f'/api/authors/{self.author.pk}/', {'bio': "New"}, content_type='application/json')
+        self.assertEqual(self.aliases(), {'default'})
+
+    def test_cache_fill_reads_the_primary(self):
+        self.client.get(f'/api/authors/{self.author.pk}/')
+        self.assertEqual(RecordingRouter.reads, [('books.Author', 'default')])
+        RecordingRouter.reads = []
+        # The revalidation of a cached row reads nothing
+        self.client.get(f'/api/authors/{self.author.pk}/')
+        self.client.get(f'/api/authors/{self.author.pk}/', HTTP_IF_NONE_MATCH='"stale"')
+        self.assertEqual(RecordingRouter.reads, [])
+
+
+class SlowRequestsAccessTests(TestCase):
+
+    def test_hidden_outside_debug(self):
+        self.assertEqual(self.client.get('/api/metrics/slow/').status_code, 404)
+
+    @override_settings(DEBUG=True)
+    def test_debug(self):
+        self.assertEqual(self.client.get('/api/metrics/slow/').status_code, 200)
+        with override_settings(BOOKS_METRICS={**settings.BOOKS_METRICS, 'EXPOSE_SLOW_REQUESTS': False}):
+            self.assertEqual(self.client.get('/api/metrics/slow/').status_code, 404)
+
+    def test_staff(self):
+        user = User.objects.create_user('ann', password='secret')
+        self.client.force_login(user)
+        self.assertEqual(self.client.get('/api/metrics/slow/').status_code, 404)
+        user.is_staff = True
+        user.save()
+        response = self.client.get('/api/metrics/slow/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data'], [])
+
+    @override_settings(BOOKS_METRICS={**settings.BOOKS_METRICS, 'EXPOSE_SLOW_REQUESTS': True})
+    def test_exposed(self):
+        self.assertEqual(self.client.get('/api/metrics/slow/').status_code, 200)
+
+    @override_settings(REST_FRAMEWORK=settings_api.REST_FRAMEWORK, MIDDLEWARE=settings_api.MIDDLEWARE)
+    def test_api_only_settings(self):
+        # request.user is None there
+        self.assertEqual(self.client.get('/api/metrics/slow/').status_code, 404)
+        with override_settings(DEBUG=True):
+            self.assertEqual(self.client.get('/api/metrics/slow/').status_code, 200)
+
+
+class CatalogFeedTests(TestCase):
+
+    def setUp(self):
+        ann = Author.objects.create(name="Ann, \"the\" writer", email="ann@example.com", bio="Line\nbreak \u00e9")
+        bob = Author.objects.create(name="Bob", email="bob@example.com", bio="")
+        Author.objects.create(name="Cy", email="cy@example.com", bio="No books yet")
+        for title, author, price in (("First, again", ann, '10.50'), ("\u00c9t\u00e9", ann, '0.01'),
+                                     ("Third", bob, '99999999.99')):
+            Book.objects.create(title=title, author=author, price=Decimal(price),
+                                published_date=datetime.date(2020, 2, 29))
+
+    def snapshot(self):
+        return (
+            sorted(Author.objects.values_list('name', 'email', 'bio', 'book_count')),
+            sorted(Book.objects.values_list('id', 'title', 'published_date', 'price', 'author__email',
+                                            'author_name')),
+        )
+
+    def test_round_trip(self):
+        expected = self.snapshot()
+        for fmt in catalog.FORMATS:
+            with self.subTest(fmt=fmt), tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, f'catalog.{fmt}')
+                call_command('export_catalog', path, stdout=StringIO())
+                Author.objects.all().delete()
+                out = StringIO()
+                call_command('import_catalog', path, '--batch-size', '2', stdout=out, stderr=StringIO())
+                self.assertIn("Imported 4/4 rows", out.getvalue())
+                self.assertEqual(self.snapshot(), expected)
+                self.assertEqual(counters.row_count(Book), 3)
+                # Importing the same feed again changes nothing
+                call_command('import_catalog', path, stdout=out, stderr=StringIO())
+                self.assertIn("authors 0 created, 3 updated; books 0 created, 3 updated", out.getvalue())
+                self.assertEqual(self.snapshot(), expected)
+
+    def test_rejected_rows(self):
+        feed = StringIO(
+            '{"title": "New", "published_date": "2021-01-01", "price": "1.00", '
+            '"author_name": "Dee", "author_email": "dee@example.com"}\n'
+            'not json\n'
+            '{"title": "Bad", "published_date": "2021-02-30", "price": "x", '
+            '"author_name": "Dee", "author_email": "dee@example.com"}\n'
+            '{"author_name": "Eve"}\n'
+        )
+        result = catalog.CatalogImporter().run(catalog.read_rows(feed, 'ndjson'))
+        self.assertEqual((result.rows, result.books_created, result.authors_created), (4, 1, 1))
+        self.assertEqual([number for number, _ in result.errors], [2, 3, 4])
+        self.assertEqual(sorted(result.errors[1][1]), ['price', 'published_date'])
+        self.assertEqual(result.errors[2][1], {'author_email': ["This field is required."]})
+        self.assertTrue(Book.objects.filter(title="New", author__email="dee@example.com").exists())
+
+
+class StatsRollupTests(TestCase):
+
+    def setUp(self):
+        self.ann = Author.objects.create(name="Ann", email="ann@example.com", bio="Bio")
+        self.bob = Author.objects.create(name="Bob", email="bob@example.com", bio="Bio")
+        self.books = {
+            price: Book.objects.create(title=f"Book {price}", author=self.ann, price=Decimal(price),
+                                       published_date=datetime.date(year, 1, 1))
+            for price, year in (('5.00', 2020), ('10.00', 2020), ('20.00', 2021), ('40.00', 2020))
+        }
+        Book.objects.create(title="Bob's", author=self.bob, price=Decimal('7.00'),
+                            published_date=datetime.date(2021, 1, 1))
+
+    def assertRollups(self, **authors):
+        # The maintained rows match a recomputation from the books table
+        stored = (
+            sorted(AuthorStats.objects.values_list('author_id', *stats.AGGREGATES)),
+            sorted(YearStats.objects.filter(book_count__gt=0).values_list('year', *stats.AGGREGATES)),
+        )
+        self.assertEqual(stored, (
+            sorted(stats._author_rollups('default')), sorted(stats._year_rollups('default')),
+        ))
+        for author, (price_min, price_max) in authors.items():
+            rollup = AuthorStats.objects.get(author=getattr(self, author))
+            self.assertEqual((rollup.price_min, rollup.price_max), (price_min, price_max))
+
+    def test_delete_extremes(self):
+        self.books['5.00'].delete()
+        self.assertRollups(ann=(Decimal('10.00'), Decimal('40.00')))
+        self.books['40.00'].delete()
+        self.assertRollups(ann=(Decimal('10.00'), Decimal('20.00')))
+        self.books['20.00'].delete()
+        self.assertRollups(ann=(Decimal('10.00'), Decimal('10.00')))
+        self.books['10.00'].delete()
+        self.assertRollups(ann=(None, None))
+
+    def test_update_extremes(self):
+        book = self.books['40.00']
+        book.price = Decimal('15.00')
+        book.save()
+        self.assertRollups(ann=(Decimal('5.00'), Decimal('20.00')))
+        # Moves between authors and years
+        book = self.books['5.00']
+        book.author, book.published_date = self.bob, datetime.date(2022, 1, 1)
+        book.save()
+        self.assertRollups(ann=(Decimal('10.00'), Decimal('20.00')), bob=(Decimal('5.00'), Decimal('7.00')))
+
+    def test_bulk_delete(self):
+        self.client.delete('/api/books/bulk/', {'ids': [self.books['5.00'].pk, self.books['40.00'].pk]},
+                           content_type='application/json')
+        self.assertRollups(ann=(Decimal('10.00'), Decimal('20.00')))
+        response = self.client.get(f'/api/stats/authors/{self.ann.pk}/')
+        self.assertEqual(response.json()['data'], {
+            'book_count': 2, 'price_min': '10.00', 'price_max': '20.00', 'price_avg': '15.00', 'author': self.ann.pk,
+        })
+
+    def test_cascade(self):
+        self.ann.delete()
+        self.assertRollups()
+        self.assertEqual(YearStats.objects.get(year=2020).book_count, 0)
+
+    def test_many_authors(self):
+        authors = [Author.objects.create(name=f"A{i}", email=f"a{i}@example.com", bio="Bio")
+                   for i in range(stats.RECOMPUTE_AUTHORS + 1)]
+        books = [Book.objects.create(title="T", author=author, price=Decimal(i + 1),
+                                     published_date=datetime.date(2020, 1, 1)) for i, author in enumerate(authors)]
+        self.client.delete('/api/books/bulk/', {'ids': [book.pk for book in books]}, content_type='application/json')
+        self.assertRollups(ann=(Decimal('5.00'), Decimal('40.00')))
+
+
+class SchemaTests(TestCase):
+
+    def setUp(self):
+        openapi.code_version.cache_clear()
+        openapi._specs.clear()
+        self.addCleanup(openapi.code_version.cache_clear)
+        self.addCleanup(openapi._specs.clear)
+
+    def test_not_modified(self):
+        response = self.client.get('/swagger/?format=openapi')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['info']['title'], "Bookstore API")
+        etag = response['ETag']
+        self.assertEqual(etag, f'"{openapi.code_version()}-json"')
+        self.assertEqual(response['Cache-Control'], "public, max-age=3600")
+        response = self.client.get('/swagger/?format=openapi', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual((response['ETag'], response['Cache-Control']), (etag, "public, max-age=3600"))
+        self.assertEqual(self.client.get('/swagger/?format=openapi', HTTP_IF_NONE_MATCH='"old"').status_code, 200)
+
+    def test_version(self):
+        with override_settings(BOOKS_SCHEMA={**settings.BOOKS_SCHEMA, 'VERSION': 'v1'}):
+            openapi.code_version.cache_clear()
+            etag = self.client.get('/swagger/?format=openapi')['ETag']
+            self.assertEqual(etag, '"v1-json"')
+        openapi.code_version.cache_clear()
+        response = self.client.get('/swagger/?format=openapi', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_generated_spec_is_served(self):
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(BOOKS_SCHEMA={**settings.BOOKS_SCHEMA, 'DIR': directory}):
+            call_command('generate_schema', stdout=StringIO())
+            path = openapi.spec_path('json')
+            self.assertEqual(json.loads(path.read_bytes())['info']['title'], "Bookstore API")
+            # Served from the file, not built again
+            path.write_bytes(b'{"generated": true}')
+            self.assertEqual(self.client.get('/swagger/?format=openapi').content, b'{"generated": true}')
+
+
+class FragmentRendererTests(TestCase):
+
+    def setUp(self):
+        fragments.reset_fragment_cache()
+        self.addCleanup(fragments.reset_fragment_cache)
+        self.author = Author.objects.create(name="Ann \u00e9", email="ann@example.com", bio="Line\u2028break\n")
+        for i in range(4):
+            Book.objects.create(title=f"Book \u2029{i} \"quoted\"", author=self.author, price=Decimal(i),
+                                published_date=datetime.date(2020, 1, 1))
+
+    def assertSameBytes(self, data):
+        rows = [json.loads(row) for row in data["data"]]
+        self.assertEqual(FragmentJSONRenderer().render(data), JSONRenderer().render({**data, "data": rows}))
+
+    def test_render(self):
+        values = ValuesSerializer.for_serializer(BookSerializer)
+        rows = fragments.encode_rows(Book.objects.order_by('id'), values)
+        self.assertIsInstance(rows, EncodedRows)
+        self.assertSameBytes({"status": 1, "message": "success", "data": rows})
+        self.assertSameBytes({"status": 1, "message": "é", "paginator": {"next": None}, "data": rows})
+        self.assertSameBytes({"status": 1, "message": "success", "data": EncodedRows()})
+        self.assertSameBytes({"data": rows})
+
+    def test_formatted(self):
+        values = ValuesSerializer.for_serializer(AuthorSerializer)
+        data = {"status": 1, "message": "success", "data": fragments.encode_rows(Author.objects.all(), values)}
+        rows = [json.loads(row) for row in data["data"]]
+        context = {'indent': 2}
+        self.assertEqual(FragmentJSONRenderer().render(data, renderer_context=context),
+                         JSONRenderer().render({**data, "data": rows}, renderer_context=context))
+
+    def test_responses(self):
+        for path in ('/api/books/', '/api/authors/?fields=name,bio', '/api/listing-all-books/?page_size=3'):
+            with self.subTest(path=path):
+                cold = self.client.get(path).content
+                self.assertEqual(self.client.get(path).content, cold)
+                with override_settings(BOOKS_FRAGMENT_CACHE={'MAX_ENTRIES': 0}):
+                    self.assertEqual(self.client.get(path).content, cold)
+        # A changed row is encoded again
+        book = Book.objects.order_by('id').first()
+        book.title = "Renamed"
+        book.save()
+        with override_settings(BOOKS_FRAGMENT_CACHE={'MAX_ENTRIES': 0}):
+            expected = self.client.get('/api/books/').content
+        self.assertEqual(self.client.get('/api/books/').content, expected)
+
+
+@override_settings(BOOKS_JOBS={'WORKERS': 0, 'INLINE_MAX_ROWS': 2, 'PAUSE': 0}, BOOKS_BULK_BATCH_SIZE=2)
+class JobTests(TestCase):
+
+    def setUp(self):
+        self.author = Author.objects.create(name="Ann", email="ann@example.com", bio="Bio")
+        for i in range(3):
+            Book.objects.create(title=f"Book {i}", author=self.author, price=Decimal(i),
+                                published_date=datetime.date(2020, 1, 1))
+
+    def poll(self, response):
+        self.assertEqual(response.status_code, 202)
+        job = response.json()['data']
+        self.assertEqual(response['Location'], f'/api/jobs/{job["id"]}/')
+        response = self.client.get(response['Location'])
+        self.assertEqual(response.status_code, 200)
+        return response.json()['data']
+
+    def test_delete_author(self):
+        response = self.client.delete(f'/api/authors/{self.author.pk}/')
+        self.assertEqual(response.json()['message'], "Author deletion started")
+        job = self.poll(response)
+        self.assertEqual((job['kind'], job['status'], job['total'], job['done']), ('delete_author', 'succeeded', 4, 4))
+        self.assertEqual(job['result'], {'id': self.author.pk, 'deleted': 4})
+        self.assertFalse(Book.objects.exists())
+
+    def test_bulk(self):
+        payload = [{'title': f"New {i}", 'author': self.author.pk, 'published_date': '2021-01-01', 'price': '1.00'}
+                   for i in range(3)]
+        payload[1]['title'] = ""
+        response = self.client.post('/api/books/bulk/', payload, content_type='application/json')
+        job = self.poll(response)
+        self.assertEqual((job['kind'], job['status'], job['total']), ('bulk_create', 'succeeded', 3))
+        self.assertEqual((job['result']['succeeded'], job['result']['failed']), (2, 1))
+        self.assertEqual([item['status'] for item in job['result']['items']], [1, 0, 1])
+        response = self.client.delete('/api/books/bulk/', {'ids': list(Book.objects.values_list('id', flat=True))},
+                                      content_type='application/json')
+        job = self.poll(response)
+        self.assertEqual((job['kind'], job['status'], job['result']['succeeded']), ('bulk_delete', 'succeeded', 5))
+        # Under the threshold the write is answered inline
+        response = self.client.post('/api/books/bulk/', payload[:1], content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+
+    @override_settings(BOOKS_JOBS={'WORKERS': 1, 'INLINE_MAX_ROWS': 2, 'PAUSE': 0})
+    def test_pending_until_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            job = self.poll(self.client.delete(f'/api/authors/{self.author.pk}/'))
+        self.assertEqual((job['status'], job['done']), ('pending', 0))
+        self.assertEqual(len(callbacks), 1)
+
+    def test_failed(self):
+        def work(progress):
+            progress(1)
+            raise ValueError("Broken")
+
+        with self.assertLogs('books.jobs', 'ERROR'):
+            job = jobs.submit('test', 2, work)
+        response = self.client.get(f'/api/jobs/{job.pk}/')
+        data = response.json()['data']
+        self.assertEqual((data['status'], data['done'], data['error'], data['result']), ('failed', 1, "Broken", None))
+        self.assertEqual(self.client.get('/api/jobs/999/').status_code, 404)
+
+
+class ChangeFeedTests(TestCase):
+
+    def setUp(self):
+        self.start = changes.latest()
+
+    def feed(self, since, page_size=100):
+        response = self.client.get(f'/api/changes/?since={since}&page_size={page_size}')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def entries(self, since):
+        return [(entry['type'], entry['id'], entry['action']) for entry in self.feed(since)['data']]
+
+    def test_order(self):
+        author = Author.objects.create(name="Ann", email="ann@example.com", bio="Bio")
+        book = Book.objects.create(title="First", author=author, price=Decimal('1.00'),
+                                   published_date=datetime.date(2020, 1, 1))
+        Book.objects.filter(pk=book.pk).update(title="Renamed")
+        data = self.feed(self.start)['data']
+        self.assertEqual([(entry['type'], entry['action']) for entry in data][:2],
+                         [('author', 'created'), ('book', 'created')])
+        self.assertEqual([(entry['type'], entry['id'], entry['action']) for entry in data][-1],
+                         ('book', book.pk, 'updated'))
+        cursors = [entry['cursor'] for entry in data]
+        self.assertEqual(cursors, sorted(cursors))
+        # Entries carry the row as it is now
+        self.assertEqual({entry['data']['title'] for entry in data if entry['type'] == 'book'}, {"Renamed"})
+
+    def test_pages(self):
+        for i in range(5):
+            Author.objects.create(name=f"A{i}", email=f"a{i}@example.com", bio="Bio")
+        page = self.feed(self.start, page_size=3)
+        self.assertTrue(page['paginator']['has_more'])
+        rest = self.feed(page['paginator']['next_cursor'], page_size=3)
+        self.assertFalse(rest['paginator']['has_more'])
+        self.assertEqual(len(page['data']) + len(rest['data']), len(self.feed(self.start)['data']))
+        self.assertEqual(self.feed(rest['paginator']['next_cursor'])['data'], [])
+
+    def test_tombstones(self):
+        author = Author.objects.create(name="Ann", email="ann@example.com", bio="Bio")
+        Book.objects.create(title="First", author=author, price=Decimal('1.00'),
+                            published_date=datetime.date(2020, 1, 1))
+        cursor = changes.latest()
+        book_pk, author_pk = Book.objects.get().pk, author.pk
+        author.delete()
+        entries = self.entries(cursor)
+        self.assertIn(('book', book_pk, 'deleted'), entries)
+        self.assertIn(('author', author_pk, 'deleted'), entries)
+        self.assertTrue(all(entry['data'] is None for entry in self.feed(cursor)['data']))
+
+    def test_compaction(self):
+        author = Author.objects.create(name="Ann", email="ann@example.com", bio="Bio")
+        for name in ("Bo", "Cy"):
+            Author.objects.filter(pk=author.pk).update(name=name)
+        old = changes.latest()
+        other = Author.objects.create(name="Dee", email="dee@example.com", bio="Bio").pk
+        Author.objects.filter(pk=other).delete()
+        superseded, tombstones, horizon = changes.compact()
+        self.assertEqual((superseded, tombstones), (3, 0))
+        self.assertEqual(self.entries(self.start), [('author', author.pk, 'updated'), ('author', other, 'deleted')])
+        # Tombstones past TOMBSTONE_DAYS go, and the cursors before them with them
+        superseded, tombstones, horizon = changes.compact(keep_days=-1)
+        self.assertEqual(tombstones, 1)
+        response = self.client.get(f'/api/changes/?since={old}')
+        self.assertEqual(response.status_code, 410)
+        self.assertEqual(response.json()['latest_cursor'], horizon)
+        self.assertEqual(self.feed(horizon)['data'], [])
+
+    def test_generate_dataset(self):
+        Author.objects.create(name="Ann", email="ann@example.com", bio="Bio")
+        cursor = changes.latest()
+        call_command('generate_dataset', '--books', '20', '--books-per-author', '5', '--clear', stdout=StringIO())
+        # Neither the deletes nor the load were logged; every earlier cursor is gone
+        self.assertFalse(Change.objects.exists())
+        response = self.client.get(f'/api/changes/?since={cursor}')
+        self.assertEqual(response.status_code, 410)
+        latest = response.json()['latest_cursor']
+        self.assertGreater(latest, cursor)
+        # Logged again from there
+        Book.objects.filter(pk=1).update(title="Renamed")
+        self.assertEqual(self.entries(latest), [('book', 1, 'updated')])
+
+
+class BatchReadTests(QueryBudgetMixin, TestCase):
+
+    def setUp(self):
+        cache.reset_detail_cache()
+        self.addCleanup(cache.reset_detail_cache)
+        self.author = Author.objects.create(name="Ann", email="ann@example.com", bio="Bio")
+        self.books = [
+            Book.objects.create(title=f"Book {i}", author=self.author, price=Decimal(i),
+                                published_date=datetime.date(2020, 1, 1))
+            for i in range(4)
+        ]
+
+    def batch(self, ids):
+        response = self.send('post', '/api/books/batch/', {'ids': ids})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_order_and_missing(self):
+        first, second, third, fourth = (book.pk for book in self.books)
+        body = self.batch([third, 999, first, third, 998, fourth])
+        self.assertEqual([item['id'] for item in body['data']], [third, first, fourth])
+        self.assertEqual(body['missing'], [999, 998])
+        self.assertEqual(body['data'][0], BookSerializer(self.books[2]).data)
+
+    def test_cached_and_loaded(self):
+        first, second, third, fourth = (book.pk for book in self.books)
+        self.client.get(f'/api/books/{third}/')
+        self.client.get(f'/api/books/{first}/')
+        # One query for the rows the cache does not hold
+        with self.assertQueryBudget(1):
+            body = self.batch([fourth, third, second, first])
+        self.assertEqual([item['id'] for item in body['data']], [fourth, third, second, first])
+        with self.assertQueryBudget(0):
+            self.assertEqual(self.batch([second, fourth])['missing'], [])
+        self.books[1].delete()
+        self.assertEqual(self.batch([second, fourth])['missing'], [second])
+
+    def test_get(self):
+        response = self.client.get(f'/api/authors/?ids={self.author.pk},5')
+        self.assertEqual(([item['id'] for item in response.json()['data']], response.json()['missing']),
+                         ([self.author.pk], [5]))
+        self.assertEqual(self.client.get('/api/authors/?ids=1,x').status_code, 400)
+
+    def test_invalid(self):
+        for ids in ([], [0], ["x"], list(range(1, 1002)), "1,2"):
+            with self.subTest(ids=ids):
+                self.assertEqual(self.send('post', '/api/books/batch/', {'ids': ids}).status_code, 400)
+
+
+class WriteQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """
+    The query budgets documented on the write endpoints of books/views.py.
+    """
+
+    def setUp(self):
+        cache.reset_detail_cache()
+        self.author = Author.objects.create(name="Ann", email="ann@example.com", bio="Bio")
+        self.book = Book.objects.create(
+            title="First", author=self.author, published_date=datetime.date(2020, 1, 1), price=Decimal('10.00'),
+        )
+        # The row counters exist, as in a running catalog
+        counters.reconcile([Author, Book])
+
+    def book_payload(self, **changes):
+        return {
+            'title': "First", 'author': self.author.pk, 'published_date': '2020-01-01', 'price': '10.00', **changes,
+        }
+
+    def test_create_author(self):
+        with self.assertQueryBudget(3):
+            response = self.send('post', '/api/authors/', {'name': "Bob", 'email': "bob@example.com", 'bio': "Bio"})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['data']['email'], "bob@example.com")
+
+    def test_create_author_with_taken_email(self):
+        with self.assertQueryBudget(1):
+            response = self.send('post', '/api/authors/', {'name': "Bob", 'email': "ann@example.com", 'bio': "Bio"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['message'], {'email': ["author with this email already exists."]})
+        self.assertEqual(Author.objects.count(), 1)
+
+    def test_update_author(self):
+        with self.assertQueryBudget(2) as captured:
+            response = self.send('put', f'/api/authors/{self.author.pk}/',
+                                 {'name': "Ann", 'email': "ann@example.com", 'bio': "New bio"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data']['bio'], "New bio")
+        [update] = self.updates(captured, 'books_author')
+        self.assertIn('"bio"', update)
+        self.assertNotIn('"email"', update)
+        self.assertNotIn('"name"', update)
+
+    def test_update_author_unchanged(self):
+        with self.assertQueryBudget(1):
+            response = self.send('put', f'/api/authors/{self.author.pk}/',
+                                 {'name': "Ann", 'email': "ann@example.com", 'bio': "Bio"})
+        self.assertEqual(response.status_code, 200)
+
+    def test_update_author_with_taken_email(self):
+        Author.objects.create(name="Bob", email="bob@example.com", bio="Bio")
+        with self.assertQueryBudget(2):
+            response = self.send('patch', f'/api/authors/{self.author.pk}/', {'email': "bob@example.com"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['message'], {'email': ["author with this email already exists."]})
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.email, "ann@example.com")
+
+    def test_patch_author(self):
+        # The new name is copied to the books
+        with self.assertQueryBudget(4):
+            response = self.send('patch', f'/api/authors/{self.author.pk}/', {'name': "Anne"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data']['name'], "Anne")
+        self.assertEqual(response.json()['data']['bio'], "Bio")
+
+    def test_patch_author_invalid(self):
+        with self.assertQueryBudget(1):
+            response = self.send('patch', f'/api/authors/{self.author.pk}/', {'email': "not an email"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('email', response.json()['message'])
+
+    def test_delete_author(self):
+        with self.assertQueryBudget(16):
+            response = self.client.delete(f'/api/authors/{self.author.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Book.objects.exists())
+
+    def test_delete_author_without_books(self):
+        author = Author.objects.create(name="Bob", email="bob@example.com", bio="Bio")
+        with self.assertQueryBudget(10):
+            response = self.client.delete(f'/api/authors/{author.pk}/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_create_book(self):
+        with self.assertQueryBudget(6):
+            response = self.send('post', '/api/books/', self.book_payload(title="Second"))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['data']['author'], self.author.pk)
+
+    def test_update_book(self):
+        with self.assertQueryBudget(2) as captured:
+            response = self.send('put', f'/api/books/{self.book.pk}/', self.book_payload(title="Renamed"))
+        self.assertEqual(response.status_code, 200)
+        [update] = self.updates(captured, 'books_book')
+        self.assertIn('"title"', update)
+        self.assertNotIn('"price"', update)
+
+    def test_update_book_price(self):
+        # The author and year rollups follow the price
+        with self.assertQueryBudget(4):
+            response = self.send('put', f'/api/books/{self.book.pk}/', self.book_payload(price='12.00'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data']['price'], '12.00')
+
+    def test_update_book_unchanged(self):
+        with self.assertQueryBudget(1):
+            response = self.send('put', f'/api/books/{self.book.pk}/', self.book_payload(price='10'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_patch_book(self):
+        with self.assertQueryBudget(2):
+            response = self.send('patch', f'/api/books/{self.book.pk}/', {'title': "Renamed"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data']['title'], "Renamed")
+        self.assertEqual(response.json()['data']['price'], '10.00')
+
+    def test_delete_book(self):
+        with self.assertQueryBudget(6):
+            response = self.client.delete(f'/api/books/{self.book.pk}/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_bulk_create_authors(self):
+        items = [{'name': f"Author {i}", 'email': f"author{i}@example.com", 'bio': "Bio"} for i in range(3)]
+        with self.assertQueryBudget(4):
+            response = self.send('post', '/api/authors/bulk/', items)
+        self.assertEqual(response.status_code, 201)
+
+    def test_bulk_create_books(self):
+        items = [self.book_payload(title=f"Book {i}") for i in range(3)]
+        with self.assertQueryBudget(6):
+            response = self.send('post', '/api/books/bulk/', items)
+        self.assertEqual(response.status_code, 201)
+
+    def test_bulk_update_books(self):
+        with self.assertQueryBudget(4):
+            response = self.send('put', '/api/books/bulk/', [{'id': self.book.pk, 'price': '11.00'}])
+        self.assertEqual(response.status_code, 200)
+
+    def test_bulk_delete_books(self):
+        with self.assertQueryBudget(8):
+            response = self.send('delete', '/api/books/bulk/', {'ids': [self.book.pk]})
+        self.assertEqual(response.status_code, 200)
+
+    def test_bulk_delete_authors(self):
+        with self.assertQueryBudget(16):
+            response = self.send('delete', '/api/authors/bulk/', {'ids': [self.author.pk]})
+        self.assertEqual(response.status_code, 200)
+
+
+class ConstraintErrorTests(QueryBudgetMixin, TransactionTestCase):
+    """
+    Constraint failures in autocommit, outside of TestCase's wrapping
+    transaction, leave no row, counter or rollup behind.
+    """
+
+    def setUp(self):
+        self.author = Author.objects.create(name="Ann", email="ann@example.com", bio="Bio")
+        self.book = Book.objects.create(
+            title="First", author=self.author, published_date=datetime.date(2020, 1, 1), price=Decimal('10.00'),
+        )
+        counters.reconcile([Author, Book])
+
+    def test_create_book_with_unknown_author(self):
+        response = self.send('post', '/api/books/', {
+            'title': "Second", 'author': 999, 'published_date': '2020-01-01', 'price': '10.00',
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['message'], {'author': ['Invalid pk "999" - object does not exist.']})
+        self.assertEqual(Book.objects.count(), 1)
+        self.assertEqual(counters.row_count(Book), 1)
+
+    def test_update_book_with_unknown_author(self):
+        response = self.send('patch', f'/api/books/{self.book.pk}/', {'author': 999})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['message'], {'author': ['Invalid pk "999" - object does not exist.']})
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.author_id, self.author.pk)
+
+
+class DenormalizedColumnsTests(QueryBudgetMixin, TestCase):
+    """
+    Book.author_name and Author.book_count through every write path (books/denormalized.py).
+    """
+
+    def setUp(self):
+        cache.reset_detail_cache()
+        self.ann = Author.objects.create(name="Ann", email="ann@example.com", bio="Bio")
+        self.bob = Author.objects.create(name="Bob", email="bob@example.com", bio="Bio")
+        self.book = Book.objects.create(
+            title="First", author=self.ann, published_date=datetime.date(2020, 1, 1), price=Decimal('10.00'),
+        )
+        counters.reconcile([Author, Book])
+
+    def assertConsistent(self, **book_counts):
+        self.assertFalse(denormalized.stale_books().exists())
+        self.assertFalse(denormalized.stale_authors().exists())
+        self.assertEqual(dict(Author.objects.values_list('name', 'book_count')), {
+            name: book_counts.get(name.lower(), 0) for name in Author.objects.values_list('name', flat=True)
+        })
+
+    def payload(self, author, title="Second"):
+        return {'title': title, 'author': author.pk, 'published_date': '2021-01-01', 'price': '10.00'}
+
+    def test_create(self):
+        self.assertEqual(self.book.author_name, "Ann")
+        response = self.send('post', '/api/books/', self.payload(self.bob))
+        self.assertEqual(response.json()['data']['author_name'], "Bob")
+        self.assertConsistent(ann=1, bob=1)
+
+    def test_read_only(self):
+        response = self.send('post', '/api/books/', {**self.payload(self.bob), 'author_name': "Eve"})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['data']['author_name'], "Bob")
+        self.send('patch', f'/api/authors/{self.ann.pk}/', {'book_count': 99})
+        self.assertConsistent(ann=1, bob=1)
+
+    def test_reassign(self):
+        response = self.send('patch', f'/api/books/{self.book.pk}/', {'author': self.bob.pk})
+        self.assertEqual(response.json()['data']['author_name'], "Bob")
+        self.assertConsistent(bob=1)
+
+    def test_unknown_author(self):
+        # The author_name lookup rejects it before the INSERT / UPDATE, even inside a transaction
+        with self.assertQueryBudget(2):
+            response = self.send('post', '/api/books/', {**self.payload(self.bob), 'author': 999})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['message'], {'author': ['Invalid pk "999" - object does not exist.']})
+        response = self.send('patch', f'/api/books/{self.book.pk}/', {'author': 999})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Book.objects.get().author_id, self.ann.pk)
+        self.assertConsistent(ann=1)
+
+    def test_migration_backfill(self):
+        # Stale rows from before the columns existed get new ones and a new updated_at
+        migration = import_module('books.migrations.0009_denormalized_author_columns')
+        Book.objects.update(author_name='')
+        Author.objects.update(book_count=0)
+        stamps = {
+            model: dict(model.objects.values_list('pk', 'updated_at')) for model in (Author, Book)
+        }
+        migration.fill_columns(django_apps, connection.schema_editor())
+        self.assertConsistent(ann=1)
+        for model, before in stamps.items():
+            for pk, updated_at in model.objects.values_list('pk', 'updated_at'):
+                self.assertGreater(updated_at, before[pk])
+
+    def test_reassign_with_save(self):
+        self.book.author = self.bob
+        self.book.save(update_fields=['author'])
+        self.assertConsistent(bob=1)
+
+    def test_rename(self):
+        response = self.send('patch', f'/api/authors/{self.ann.pk}/', {'name': "Anne"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.send('get', f'/api/books/{self.book.pk}/').json()['data']['author_name'], "Anne")
+        self.assertConsistent(anne=1)
+
+    def test_rename_without_loading(self):
+        Author(
+            pk=self.ann.pk, name="Anne", email="ann@example.com", bio="Bio", book_count=1,
+            created_at=self.ann.created_at,
+        ).save()
+        self.assertConsistent(anne=1)
+
+    def test_delete(self):
+        self.send('delete', f'/api/books/{self.book.pk}/')
+        self.assertConsistent()
+
+    def test_author_cascade(self):
+        self.send('post', '/api/books/', self.payload(self.bob))
+        self.send('delete', f'/api/authors/{self.ann.pk}/')
+        self.assertFalse(Book.objects.filter(author_name="Ann").exists())
+        self.assertConsistent(bob=1)
+
+    def test_bulk_create(self):
+        items = [self.payload(author, title=f"Bulk {i}") for i, author in enumerate([self.ann, self.bob, self.bob])]
+        response = self.send('post', '/api/books/bulk/', items)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(set(Book.objects.values_list('author_name', flat=True)), {"Ann", "Bob"})
+        self.assertConsistent(ann=2, bob=2)
+
+    def test_bulk_update(self):
+        self.send('put', '/api/books/bulk/', [{'id': self.book.pk, 'author': self.bob.pk}])
+        self.assertConsistent(bob=1)
+        self.send('put', '/api/authors/bulk/', [{'id': self.bob.pk, 'name': "Robert"}])
+        self.assertEqual(Book.objects.get().author_name, "Robert")
+        self.assertConsistent(robert=1)
+
+    def test_bulk_delete(self):
+        self.send('post', '/api/books/', self.payload(self.bob))
+        self.send('delete', '/api/books/bulk/', {'ids': [self.book.pk]})
+        self.assertConsistent(bob=1)
+        self.send('delete', '/api/authors/bulk/', {'ids': [self.bob.pk]})
+        self.assertConsistent()
+
+    def test_catalog_import(self):
+        rows = [
+            {'title': "Imported", 'published_date': '2021-01-01', 'price': '9.00',
+             'author_name': "Carol", 'author_email': "carol@example.com"},
+            {'id': str(self.book.pk), 'title': "First", 'published_date': '2020-01-01', 'price': '10.00',
+             'author_name': "Robert", 'author_email': "bob@example.com"},
+        ]
+        result = catalog.CatalogImporter().run(enumerate(rows, 1))
+        self.assertEqual(result.errors, [])
+        self.assertEqual(
+            dict(Book.objects.values_list('title', 'author_name')), {"Imported": "Carol", "First": "Robert"},
+        )
+        self.assertConsistent(carol=1, robert=1)
+
+    def test_lists_read_the_columns(self):
+        # Neither list joins or counts the other table
+        for path, table, field, value in (
+            ('/api/books/', 'books_author', 'author_name', "Ann"),
+            ('/api/authors/', 'books_book', 'book_count', 1),
+        ):
+            with CaptureQueriesContext(connection) as captured:
+                response = self.send('get', path)
+            self.assertIn(value, [row[field] for row in response.json()['data']])
+            self.assertFalse([query['sql'] for query in captured.captured_queries if f'"{table}"' in query['sql']])
+
+    def test_ordering(self):
+        self.send('post', '/api/books/', self.payload(self.bob))
+        response = self.send('get', '/api/books/?ordering=-author_name')
+        self.assertEqual([row['author_name'] for row in response.json()['data']], ["Bob", "Ann"])
+
+    def test_reconcile(self):
+        Book.objects.update(author_name="Stale")
+        Author.objects.filter(pk=self.bob.pk).update(book_count=5)
+        out = StringIO()
+        call_command('reconcile_denormalized', '--dry-run', stdout=out)
+        self.assertIn("Book.author_name: 1 rows stale", out.getvalue())
+        self.assertTrue(denormalized.stale_books().exists())
+        self.assertEqual(denormalized.rebuild(), (1, 1))
+        self.assertConsistent(ann=1)
+
+
+# Regression harness: every route of books/urls.py, against catalogs of
+# several sizes. A request must stay within its pinned number of queries at
+# every size (an N+1 grows with the catalog), none of its statements may read
+# a large table with a full scan, and its time is compared to BASELINE.
+#
+# Timings depend on the machine, so they are only compared with
+#   BOOKS_PERF_TIMINGS=1 python manage.py test books.tests.LargeCatalogRegressionTests
+# on the machine that wrote the baseline; after a deliberate change, rewrite it with
+#   BOOKS_PERF_BASELINE=update python manage.py test books.tests.LargeCatalogRegressionTests
+# BOOKS_PERF_TOLERANCE (default 1.0) is the slowdown allowed, as a fraction
+# of the baseline. The query counts and plans are checked on every run.
+
+BASELINE = Path(__file__).with_name('perf_baseline.json')
+
+# Tables that grow with the catalog. A step of a plan that reads one of them
+# without an index ("SCAN books_book", not "SCAN books_book USING INDEX ..."
+# nor "SEARCH ...") is a full scan
+LARGE_TABLES = ('books_book', 'books_author', 'books_change', 'books_authorstats')
+FULL_SCAN = re.compile(rf"\bSCAN ({'|'.join(LARGE_TABLES)})\b(?! USING (?:COVERING )?INDEX)")
+
+# A page that walks the table in rowid (id) order stops after LIMIT rows, as
+# check_query_plans allows; without a temporary B-tree the scan gives the order
+PAGE = re.compile(r'\bLIMIT \d+( OFFSET \d+)?$')
+
+# The lock_for_write() statement of books/bulk.py reads no row
+NO_OP = re.compile(r'\bWHERE 0$')
+
+# Timings below this many milliseconds are noise
+TIMING_FLOOR_MS = 2.0
+TIMING_RUNS = 5
+
+
+class Endpoint:
+    """
+    One request against ``route``: ``make(case)`` returns ``(path, body)``.
+    ``queries`` is the pinned maximum, ``scans`` the large tables the
+    endpoint reads whole by design (the unpaginated lists).
+    """
+
+    def __init__(self, name, route, method, make, queries, scans=()):
+        self.name = name
+        self.route = route
+        self.method = method
+        self.make = make
+        self.queries = queries
+        self.scans = scans
+
+
+def _book(case, **changes):
+    return {
+        'title': "Harness", 'author': case.author.pk, 'published_date': '2001-02-03', 'price': '12.50', **changes,
+    }
+
+
+def _author(serial):
+    return {'name': f"Harness {serial}", 'email': f"harness{serial}@example.com", 'bio': "Bio"}
+
+
+ENDPOINTS = [
+    Endpoint('authors.list', 'authors/', 'GET', lambda case: ("/api/authors/", None), 4, scans=['books_author']),
+    Endpoint('authors.list.fields', 'authors/', 'GET', lambda case: ("/api/authors/?fields=id,name", None), 4,
+             scans=['books_author']),
+    Endpoint('authors.list.expand', 'authors/', 'GET', lambda case: ("/api/authors/?expand=books", None), 6,
+             scans=['books_author']),
+    Endpoint('authors.list.ndjson', 'authors/', 'GET', lambda case: ("/api/authors/?stream=ndjson", None), 3,
+             scans=['books_author']),
+    Endpoint('authors.list.ids', 'authors/', 'GET',
+             lambda case: (f"/api/authors/?ids={case.author.pk},{case.other.pk}", None), 1),
+    Endpoint('authors.create', 'authors/', 'POST', lambda case: ("/api/authors/", _author(1)), 3),
+    Endpoint('authors.detail', 'authors/<int:id>/', 'GET', lambda case: (f"/api/authors/{case.author.pk}/", None), 1),
+    Endpoint('authors.update', 'authors/<int:id>/', 'PUT',
+             lambda case: (f"/api/authors/{case.author.pk}/", {**_author(2), 'email': case.author.email}), 4),
+    Endpoint('authors.patch', 'authors/<int:id>/', 'PATCH',
+             lambda case: (f"/api/authors/{case.author.pk}/", {'bio': "Patched"}), 2),
+    Endpoint('authors.delete', 'authors/<int:id>/', 'DELETE',
+             lambda case: (f"/api/authors/{case.author.pk}/", None), 18),
+    Endpoint('authors.bulk.create', 'authors/bulk/', 'POST',
+             lambda case: ("/api/authors/bulk/", [_author(serial) for serial in range(3, 6)]), 4),
+    Endpoint('authors.bulk.update', 'authors/bulk/', 'PUT',
+             lambda case: ("/api/authors/bulk/", [{'id': pk, 'bio': "Bulk"} for pk in (case.author.pk, case.other.pk)]),
+             2),
+    Endpoint('authors.bulk.delete', 'authors/bulk/', 'DELETE',
+             lambda case: ("/api/authors/bulk/", {'ids': [case.author.pk, case.other.pk]}), 19),
+    Endpoint('authors.batch', 'authors/batch/', 'POST',
+             lambda case: ("/api/authors/batch/", {'ids': [case.author.pk, case.other.pk]}), 1),
+    Endpoint('books.list', 'books/', 'GET', lambda case: ("/api/books/", None), 4, scans=['books_book']),
+    Endpoint('books.list.author', 'books/', 'GET', lambda case: (f"/api/books/?author={case.author.pk}", None), 3),
+    Endpoint('books.list.filtered', 'books/', 'GET',
+             lambda case: ("/api/books/?min_price=10&max_price=20&ordering=-published_date", None), 3),
+    Endpoint('books.list.expand', 'books/', 'GET',
+             lambda case: (f"/api/books/?author={case.author.pk}&expand=author", None), 4),
+    Endpoint('books.list.json', 'books/', 'GET', lambda case: ("/api/books/?stream=json", None), 3,
+             scans=['books_book']),
+    Endpoint('books.list.ids', 'books/', 'GET',
+             lambda case: (f"/api/books/?ids={case.book.pk},{case.book.pk + 1}", None), 1),
+    Endpoint('books.create', 'books/', 'POST', lambda case: ("/api/books/", _book(case)), 7),
+    Endpoint('books.detail', 'books/<int:id>/', 'GET', lambda case: (f"/api/books/{case.book.pk}/", None), 1),
+    Endpoint('books.update', 'books/<int:id>/', 'PUT',
+             lambda case: (f"/api/books/{case.book.pk}/", _book(case, author=case.other.pk)), 10),
+    Endpoint('books.patch', 'books/<int:id>/', 'PATCH',
+             lambda case: (f"/api/books/{case.book.pk}/", {'title': "Patched"}), 2),
+    Endpoint('books.delete', 'books/<int:id>/', 'DELETE', lambda case: (f"/api/books/{case.book.pk}/", None), 6),
+    Endpoint('books.bulk.create', 'books/bulk/', 'POST',
+             lambda case: ("/api/books/bulk/", [_book(case, title=f"Bulk {i}") for i in range(3)]), 7),
+    Endpoint('books.bulk.update', 'books/bulk/', 'PUT',
+             lambda case: ("/api/books/bulk/", [{'id': case.book.pk, 'price': '11.00'},
+                                                {'id': case.book.pk + 1, 'title': "Bulk"}]), 4),
+    Endpoint('books.bulk.delete', 'books/bulk/', 'DELETE',
+             lambda case: ("/api/books/bulk/", {'ids': [case.book.pk, case.book.pk + 1]}), 9),
+    Endpoint('books.batch', 'books/batch/', 'POST',
+             lambda case: ("/api/books/batch/", {'ids': [case.book.pk, case.book.pk + 1]}), 1),
+    Endpoint('authors.page.offset', 'listing-all-authors/', 'POST',
+             lambda case: ("/api/listing-all-authors/", {'page': 2, 'page_size': 2}), 3),
+    Endpoint('authors.page.cursor', 'listing-all-authors/', 'GET',
+             lambda case: ("/api/listing-all-authors/?page_size=2&expand=books", None), 6),
+    Endpoint('books.page.offset', 'listing-all-books/', 'POST',
+             lambda case: ("/api/listing-all-books/", {'page': 2, 'page_size': 5, 'min_price': '10.00'}), 3),
+    Endpoint('books.page.cursor', 'listing-all-books/', 'GET',
+             lambda case: ("/api/listing-all-books/?page_size=5&ordering=price&expand=author", None), 5),
+    Endpoint('jobs.detail', 'jobs/<int:id>/', 'GET', lambda case: (f"/api/jobs/{case.job.pk}/", None), 1),
+    Endpoint('changes', 'changes/', 'GET', lambda case: ("/api/changes/?since=0&page_size=50", None), 4),
+    Endpoint('cache.stats', 'cache/stats/', 'GET', lambda case: ("/api/cache/stats/", None), 0),
+    Endpoint('metrics.slow', 'metrics/slow/', 'GET', lambda case: ("/api/metrics/slow/", None), 0),
+    Endpoint('search', 'search/', 'GET', lambda case: ("/api/search/?q=garden", None), 6),
+    Endpoint('stats', 'stats/', 'GET', lambda case: ("/api/stats/", None), 2),
+    Endpoint('stats.years', 'stats/years/', 'GET', lambda case: ("/api/stats/years/", None), 1),
+    Endpoint('stats.authors', 'stats/authors/', 'GET',
+             lambda case: ("/api/stats/authors/?page_size=5&ordering=-books", None), 2),
+    Endpoint('stats.authors.detail', 'stats/authors/<int:id>/', 'GET',
+             lambda case: (f"/api/stats/authors/{case.author.pk}/", None), 1),
+    Endpoint('async.authors.list', 'async/authors/', 'GET', lambda case: ("/api/async/authors/", None), 3,
+             scans=['books_author']),
+    Endpoint('async.authors.detail', 'async/authors/<int:id>/', 'GET',
+             lambda case: (f"/api/async/authors/{case.author.pk}/", None), 1),
+    Endpoint('async.books.list', 'async/books/', 'GET',
+             lambda case: (f"/api/async/books/?author={case.author.pk}", None), 2),
+    Endpoint('async.books.detail', 'async/books/<int:id>/', 'GET',
+             lambda case: (f"/api/async/books/{case.book.pk}/", None), 1),
+    Endpoint('async.authors.page', 'async/listing-all-authors/', 'GET',
+             lambda case: ("/api/async/listing-all-authors/?page_size=2", None), 3),
+    Endpoint('async.books.page', 'async/listing-all-books/', 'GET',
+             lambda case: ("/api/async/listing-all-books/?page_size=5&ordering=price", None), 3),
+]
+
+
+async def _drain(chunks):
+    async for _ in chunks:
+        pass
+
+
+class EndpointRegressionMixin:
+    """
+    The catalog has ``AUTHORS`` authors of ``BOOKS_PER_AUTHOR`` books each;
+    ``author`` is the first of them, ``book`` their first book. Each author's
+    books span the same three years at every size: writes update one rollup
+    per year, which a per-book query would outgrow.
+    """
+
+    AUTHORS = 0
+    BOOKS_PER_AUTHOR = 0
+
+    @classmethod
+    def setUpTestData(cls):
+        authors = Author.objects.bulk_create(
+            Author(name=f"Author {i}", email=f"author{i}@example.com", bio=f"Writes about the garden, {i}")
+            for i in range(cls.AUTHORS)
+        )
+        Book.objects.bulk_create(
+            Book(title=f"{['The Garden', 'Silent Night', 'Kafka'][i % 3]} {i}", author=author,
+                 published_date=datetime.date(1990 + i % 3, 1 + i % 12, 1), price=Decimal(5 + i * 7 % 40))
+            for author in authors for i in range(cls.BOOKS_PER_AUTHOR)
+        )
+        # bulk_create() sends no signals
+        counters.reconcile([Author, Book])
+        stats.rebuild()
+        cls.author, cls.other = authors[0], authors[1]
+        cls.book = Book.objects.filter(author=cls.author).order_by('pk').first()
+        cls.job = Job.objects.create(kind='delete_author', total=1)
+
+    def reset(self):
+        # Every request starts cold
+        cache.reset_detail_cache()
+        fragments.reset_fragment_cache()
+        metrics.reset()
+
+    def request(self, endpoint):
+        path, body = endpoint.make(self)
+        if endpoint.method == 'GET':
+            response = self.client.get(path)
+        else:
+            response = getattr(self.client, endpoint.method.lower())(
+                path, json.dumps(body) if body is not None else None, content_type='application/json'
+            )
+        if response.streaming:
+            if hasattr(response.streaming_content, '__aiter__'):
+                async_to_sync(_drain)(response.streaming_content)
+            else:
+                for _ in response.streaming_content:
+                    pass
+        self.assertLess(response.status_code, 300, f"{endpoint.name}: {response.status_code} {path}")
+        return response
+
+    @contextmanager
+    def rolled_back(self):
+        # Writes are undone, so every request sees the same catalog
+        with transaction.atomic():
+            yield
+            transaction.set_rollback(True)
+
+    def capture(self, endpoint):
+        self.reset()
+        with self.rolled_back(), CaptureQueriesContext(connection) as captured:
+            self.request(endpoint)
+        return [query['sql'] for query in captured.captured_queries
+                if not query['sql'].startswith(TRANSACTION_CONTROL)]
+
+    def test_every_route_is_covered(self):
+        covered = {endpoint.route for endpoint in ENDPOINTS}
+        self.assertEqual([str(pattern.pattern) for pattern in urlpatterns if str(pattern.pattern) not in covered], [])
+
+    def test_query_counts(self):
+        for endpoint in ENDPOINTS:
+            with self.subTest(endpoint.name):
+                statements = self.capture(endpoint)
+                self.assertLessEqual(
+                    len(statements), endpoint.queries,
+                    f"{endpoint.name}: {len(statements)} queries, at most {endpoint.queries} pinned:\n"
+                    + '\n'.join(statements),
+                )
+
+    def test_no_full_scans(self):
+        for endpoint in ENDPOINTS:
+            with self.subTest(endpoint.name):
+                for sql in self.capture(endpoint):
+                    if NO_OP.search(sql):
+                        continue
+                    with connection.cursor() as cursor:
+                        cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+                        plan = '\n'.join(row[-1] for row in cursor.fetchall())
+                    scans = {table for table in FULL_SCAN.findall(plan) if table not in endpoint.scans}
+                    if PAGE.search(sql) and 'USE TEMP B-TREE' not in plan:
+                        scans = set()
+                    self.assertFalse(scans, f"{endpoint.name} scans {', '.join(sorted(scans))}:\n{sql}\n{plan}")
+
+
+# The slow request log is staff only outside DEBUG
+EXPOSE_SLOW_REQUESTS = {**settings.BOOKS_METRICS, 'EXPOSE_SLOW_REQUESTS': True}
+
+
+@override_settings(BOOKS_METRICS=EXPOSE_SLOW_REQUESTS)
+class SmallCatalogRegressionTests(EndpointRegressionMixin, TestCase):
+    AUTHORS = 3
+    BOOKS_PER_AUTHOR = 3
+
+
+@override_settings(BOOKS_METRICS=EXPOSE_SLOW_REQUESTS)
+class LargeCatalogRegressionTests(EndpointRegressionMixin, TestCase):
+    AUTHORS = 60
+    BOOKS_PER_AUTHOR = 12
+
+    def timings(self):
+        timings = {}
+        for endpoint in ENDPOINTS:
+            runs = []
+            for _ in range(TIMING_RUNS + 1):
+                self.reset()
+                with self.rolled_back():
+                    start = time.perf_counter()
+                    self.request(endpoint)
+                    runs.append((time.perf_counter() - start) * 1000)
+            # The first run warms up the imports and the connection
+            timings[endpoint.name] = round(statistics.median(runs[1:]), 3)
+        return timings
+
+    def test_timings(self):
+        update = os.environ.get('BOOKS_PERF_BASELINE') == 'update'
+        if not update and os.environ.get('BOOKS_PERF_TIMINGS') != '1':
+            self.skipTest("Timings are compared with BOOKS_PERF_TIMINGS=1")
+        timings = self.timings()
+        if update:
+            BASELINE.write_text(json.dumps({
+                'authors': self.AUTHORS, 'books_per_author': self.BOOKS_PER_AUTHOR, 'runs': TIMING_RUNS,
+                'timings_ms': timings,
+            }, indent=2) + '\n')
+            return
+        self.assertTrue(BASELINE.exists(), f"No {BASELINE.name}; write it with BOOKS_PERF_BASELINE=update")
+        baseline = json.loads(BASELINE.read_text())['timings_ms']
+        tolerance = float(os.environ.get('BOOKS_PERF_TOLERANCE', '1.0'))
+        for name, elapsed in timings.items():
+            with self.subTest(name):
+                self.assertIn(name, baseline, f"{name} has no baseline; rewrite it with BOOKS_PERF_BASELINE=update")
+                limit = max(baseline[name] * (1 + tolerance), TIMING_FLOOR_MS)
+                self.assertLessEqual(elapsed, limit, f"{name}: {elapsed:.2f} ms, baseline {baseline[name]:.2f} ms")
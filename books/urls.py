@@ -1,12 +1,36 @@
 from django.urls import path
 from books.views import (AuthorListView, AuthorDetailView, BookListView, BookDetailView, 
-                        GetAuthorList, GetBookList)
+                        GetAuthorList, GetBookList, AuthorBulkView, BookBulkView, AuthorBatchView, BookBatchView,
+                        CacheStatsView, SlowRequestsView, SearchView, CatalogStatsView,
+                        YearStatsView, AuthorStatsListView, AuthorStatsDetailView, JobDetailView,
+                        ChangesView)
+from books.async_views import (AsyncAuthorListView, AsyncAuthorDetailView, AsyncBookListView,
+                               AsyncBookDetailView, AsyncGetAuthorList, AsyncGetBookList)
 
 urlpatterns = [
     path('authors/', AuthorListView.as_view()),
     path('authors/<int:id>/', AuthorDetailView.as_view()),
+    path('authors/bulk/', AuthorBulkView.as_view()),
+    path('authors/batch/', AuthorBatchView.as_view()),
     path('books/', BookListView.as_view()),
     path('books/<int:id>/', BookDetailView.as_view()),
+    path('books/bulk/', BookBulkView.as_view()),
+    path('books/batch/', BookBatchView.as_view()),
     path('listing-all-authors/', GetAuthorList.as_view()),
     path('listing-all-books/', GetBookList.as_view()),
+    path('jobs/<int:id>/', JobDetailView.as_view(), name='job-detail'),
+    path('changes/', ChangesView.as_view()),
+    path('cache/stats/', CacheStatsView.as_view()),
+    path('metrics/slow/', SlowRequestsView.as_view()),
+    path('search/', SearchView.as_view()),
+    path('stats/', CatalogStatsView.as_view()),
+    path('stats/years/', YearStatsView.as_view()),
+    path('stats/authors/', AuthorStatsListView.as_view()),
+    path('stats/authors/<int:id>/', AuthorStatsDetailView.as_view()),
+    path('async/authors/', AsyncAuthorListView.as_view()),
+    path('async/authors/<int:id>/', AsyncAuthorDetailView.as_view()),
+    path('async/books/', AsyncBookListView.as_view()),
+    path('async/books/<int:id>/', AsyncBookDetailView.as_view()),
+    path('async/listing-all-authors/', AsyncGetAuthorList.as_view()),
+    path('async/listing-all-books/', AsyncGetBookList.as_view()),
 ]
\ No newline at end of file
@@ -1,32 +1,125 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from books.models import Author, Book
-from books.serializers import AuthorSerializer, BookSerializer, PaginationSerializer
+from books.models import Author, AuthorStats, Book, Change, Job, YearStats
+from books.serializers import (AuthorSerializer, BookSerializer, PaginationSerializer,
+                               CursorPaginationSerializer, BulkAuthorSerializer, BulkBookSerializer,
+                               BulkDeleteSerializer, BatchReadSerializer, FieldsetSerializer,
+                               AuthorWriteSerializer, BookWriteSerializer, SearchSerializer,
+                               ValuesSerializer, StatsQuerySerializer, CatalogStatsSerializer,
+                               YearStatsSerializer, AuthorStatsSerializer, JobSerializer, ChangesQuerySerializer,
+                               STATS_ORDERINGS)
+from books.pagination import InvalidCursor, cursor_paginate
+from books.filters import BookFilterSerializer, ORDERINGS
 from django.http import Http404
-from drf_yasg import openapi
-from drf_yasg.utils import swagger_auto_schema
+from django.urls import reverse
+from books.docs import openapi, swagger_auto_schema
 from books.utilities import round_up
+from books import bulk, cache, changes, conditional, fragments, jobs, metrics, routers, search, stats, writes
+from django.db import DEFAULT_DB_ALIAS, connections, router
+from books.counters import row_count
+from books.streaming import NDJSONRenderer, stream_mode, streaming_response
+
+def job_accepted(job, message):
+    # 202 for a write handed to books/jobs.py, pointing at its status resource
+    response = Response({
+        "status": 1,
+        "message": message,
+        "data": JobSerializer(job).data}, status = status.HTTP_202_ACCEPTED
+    )
+    response['Location'] = reverse('job-detail', args=[job.pk])
+    return response
+
+def batch_read(model, serializer_class, params, label):
+    # The rows of params["ids"] in the requested order: the detail cache
+    # first, then one in_bulk() query for the others
+    serializer = BatchReadSerializer(data=params)
+    if not serializer.is_valid():
+        return Response({
+            "status": 0,
+            "message": serializer.errors}, status = status.HTTP_400_BAD_REQUEST
+        )
+    ids = list(dict.fromkeys(serializer.validated_data['ids']))
+    data = cache.peek_many(model, ids)
+    generations = cache.generations(model, [pk for pk in ids if pk not in data])
+    # Rows that fill the cache come from the primary
+    with routers.read_only(False):
+        loaded = model.objects.in_bulk(list(generations))
+        if loaded:
+            with metrics.timed('serialize'):
+                fresh = {pk: dict(serializer_class(instance).data) for pk, instance in loaded.items()}
+    if loaded:
+        cache.store_many(model, fresh, generations)
+        data.update(fresh)
+    return Response({
+        "status": 1,
+        "message": f"{label} details retrieved successfully",
+        "data": [data[pk] for pk in ids if pk in data],
+        "missing": [pk for pk in ids if pk not in data]}, status = status.HTTP_200_OK
+    )
+
+def ids_param(request):
+    # ?ids=1,2,3
+    return {"ids": request.query_params['ids'].split(',')}
 
 class AuthorListView(APIView):
+    renderer_classes = fragments.renderer_classes(NDJSONRenderer)
    
     #Listing all the author
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter('stream', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=['json', 'ndjson']),
+            openapi.Parameter('fields', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+            openapi.Parameter('expand', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=['books']),
+            openapi.Parameter('ids', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+        ]
+    )
     def get(self, request):
         """
         API endpoint for listing all authors without pagination
 
         - Method: GET
         - Response: List of all authors with details.
+        - Sends ETag / Last-Modified from the collection version, 304 when unchanged
+        - ?fields=id,name,... returns (and selects) only those fields, ?expand=books inlines
+          the books of each author with one extra query
+        - Streaming: ?stream=json (chunked JSON array) or ?stream=ndjson /
+          Accept: application/x-ndjson (envelope line, then one author per line)
+        - ?ids=1,2,3 (max 1000) returns those authors in that order and the ids not found
+          under "missing", the other parameters aside; POST /api/authors/batch/ for long lists
         - URL: /api/authors/
         """
 
+        if 'ids' in request.query_params:
+            return batch_read(Author, AuthorSerializer, ids_param(request), "Author")
+
+        fieldset = FieldsetSerializer(data=request.query_params, context={'serializer_class': AuthorSerializer})
+        if not fieldset.is_valid():
+            return Response({
+                "status": 0,
+                "message": fieldset.errors}, status = status.HTTP_400_BAD_REQUEST
+            )
+        values = fieldset.values_serializer()
+
         authors = Author.objects.all()
-        serializer = AuthorSerializer(authors, many=True)
-        return Response({
+        not_modified, etag = conditional.evaluate_collection(request, authors, values)
+        if not_modified:
+            return not_modified
+
+        mode = stream_mode(request)
+        if mode:
+            response = streaming_response(
+                mode, authors.order_by('id'), values, "Author details retrieved successfully"
+            )
+            return conditional.set_validators(response, etag)
+
+        data = fragments.encode_rows(authors.order_by('id'), values)
+        response = Response({
             "status":  1,
             "message": "Author details retrieved successfully",
-            "data": serializer.data}, status = status.HTTP_200_OK
+            "data": data}, status = status.HTTP_200_OK
         )
+        return conditional.set_validators(response, etag)
     
     #Create a new author
     @swagger_auto_schema(
@@ -48,20 +141,27 @@ class AuthorListView(APIView):
         - Method: POST
         - Input: Author details (name, email, bio)
         - Response: Details of the created author.
+        - Query budget: 3 (INSERT, row counter, rollup row); a taken email is reported by
+          the UNIQUE constraint, not looked up first
         - URL: /api/authors/
         """
 
-        serializer = AuthorSerializer(data=request.data)
-        if serializer.is_valid():
-            serializer.save()
+        serializer = AuthorWriteSerializer(data=request.data)
+        if not serializer.is_valid():
             return Response({
-                "status": 1,
-                "message": "New author details created successfully",
-                "data": serializer.data}, status = status.HTTP_201_CREATED
+                "status": 0,
+                "message": serializer.errors}, status = status.HTTP_400_BAD_REQUEST
+            )
+        author, errors = writes.create(serializer)
+        if errors:
+            return Response({
+                "status": 0,
+                "message": errors}, status = status.HTTP_400_BAD_REQUEST
             )
         return Response({
-            "status": 0,
-            "message": serializer.errors}, status = status.HTTP_400_BAD_REQUEST
+            "status": 1,
+            "message": "New author details created successfully",
+            "data": AuthorSerializer(author).data}, status = status.HTTP_201_CREATED
         )
 
 class AuthorDetailView(APIView):
@@ -79,16 +179,32 @@ class AuthorDetailView(APIView):
 
         - Method: GET
         - Response: Retrieve a single author with details.
+        - Sends ETag / Last-Modified, answers If-None-Match / If-Modified-Since with 304
         - URL: /api/authors/<int:id>/
         """
 
-        author = self.get_object(id)
-        serializer = AuthorSerializer(author)
-        return Response({
+        data = cache.peek(Author, id)
+
+        # Revalidate against updated_at before serializing anything
+        if data is not None or conditional.has_revalidation(request):
+            updated_at = data["updated_at"] if data is not None else conditional.current_updated_at(Author, id)
+            not_modified = conditional.evaluate_row(request, Author, id, updated_at)
+            if not_modified:
+                return not_modified
+
+        if data is None:
+            generation = cache.generation(Author, id)
+            with routers.read_only(False):
+                instance = self.get_object(id)
+                with metrics.timed('serialize'):
+                    data = dict(AuthorSerializer(instance).data)
+            cache.store(Author, id, data, generation)
+        response = Response({
             "status": 1, 
             "message": "success", 
-            "data":serializer.data}, status = status.HTTP_200_OK
+            "data":data}, status = status.HTTP_200_OK
         )
+        return conditional.set_row_validators(response, Author, id, data["updated_at"])
 
     #Updating an author
     @swagger_auto_schema(
@@ -110,22 +226,72 @@ class AuthorDetailView(APIView):
         - Method: PUT
         - Input: Author details (name, email, bio)
         - Response: Details of the updated author.
+        - Send If-Match with the ETag you read to get 412 instead of overwriting a newer change;
+          the write checks it again under the write lock, +1 query
+        - Query budget: 2 (SELECT, UPDATE of the changed columns only), +2 when the name
+          changes (author_name of the books); 1 when nothing changed
+        - URL: /api/authors/<int:id>/
+        """
+
+        return self.update(request, id)
+
+    #Partially updating an author
+    @swagger_auto_schema(
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'name': openapi.Schema(type=openapi.TYPE_STRING),
+                'email': openapi.Schema(type=openapi.TYPE_STRING),
+                'bio': openapi.Schema(type=openapi.TYPE_STRING),
+            },
+        ),
+        responses={status.HTTP_200_OK: AuthorSerializer()}
+    )
+    def patch(self, request, id):
+        """
+        API endpoint for updating some fields of an author.
+
+        - Method: PATCH
+        - Input: Any of the author details (name, email, bio)
+        - Response: Details of the updated author.
+        - Send If-Match with the ETag you read to get 412 instead of overwriting a newer change;
+          the write checks it again under the write lock, +1 query
+        - Query budget: 2 (SELECT, UPDATE of the changed columns only), +2 when the name
+          changes (author_name of the books); 1 when nothing changed
         - URL: /api/authors/<int:id>/
         """
 
+        return self.update(request, id, partial=True)
+
+    def update(self, request, id, partial=False):
         author = self.get_object(id)
-        serializer = AuthorSerializer(author, data=request.data)
-        if serializer.is_valid():
-            serializer.save()
+
+        # If-Match / If-Unmodified-Since: reject lost updates with 412
+        precondition_failed = conditional.evaluate_row(request, Author, id, author.updated_at)
+        if precondition_failed:
+            return precondition_failed
+
+        serializer = AuthorWriteSerializer(author, data=request.data, partial=partial)
+        if not serializer.is_valid():
+            errors = serializer.errors
+        else:
+            # The check above is repeated by the write itself, under the write lock
+            unchanged_since = author.updated_at if conditional.has_precondition(request) else None
+            try:
+                errors = writes.update(serializer, author, unchanged_since)
+            except writes.PreconditionFailed:
+                return conditional.precondition_failed()
+        if errors:
             return Response({
-                "status": 1, 
-                "message": "Author details updated successfully", 
-                "data":serializer.data}, status = status.HTTP_200_OK
+                "status": 0,
+                "message": errors}, status = status.HTTP_400_BAD_REQUEST
             )
-        return Response({
-            "status": 0,
-            "message": serializer.errors}, status = status.HTTP_400_BAD_REQUEST
+        response = Response({
+            "status": 1, 
+            "message": "Author details updated successfully", 
+            "data": AuthorSerializer(author).data}, status = status.HTTP_200_OK
         )
+        return conditional.set_row_validators(response, Author, id, author.updated_at)
 
     #Deleting an author --> Hard delete
     def delete(self, request, id):
@@ -134,16 +300,25 @@ class AuthorDetailView(APIView):
 
         - Method: DELETE
         - Response: Deleting an author.
+        - An author with more than BOOKS_JOBS['INLINE_MAX_ROWS'] books is deleted by a
+          background job: 202 with the job, its status at /api/jobs/<id>/ (Location header)
+        - Query budget: 2 (SELECT, count of the books), 8 per BOOKS_BULK_BATCH_SIZE books
+          (2 without books), then 6 for the author: 10 without books, 16 up to 500
         - URL: /api/authors/<int:id>/
         """
 
         author = self.get_object(id)
-        author.delete()
+        rows = 1 + Book.objects.filter(author_id=author.pk).count()
+        if not jobs.inline(rows):
+            job = jobs.submit('delete_author', rows, jobs.delete_author, author.pk)
+            return job_accepted(job, "Author deletion started")
+        bulk.delete_authors([author.pk])
         return Response({
             "status": 1, 
             "message": "Author details deleted successfully"}, status = status.HTTP_200_OK
         )
 class GetAuthorList(APIView):
+    renderer_classes = fragments.renderer_classes()
 
     #Listing all author details ---> Pagination Added
     @swagger_auto_schema(
@@ -152,8 +327,11 @@ class GetAuthorList(APIView):
             properties={
                 'page': openapi.Schema(type=openapi.TYPE_INTEGER),
                 'page_size': openapi.Schema(type=openapi.TYPE_INTEGER),
+                'cursor': openapi.Schema(type=openapi.TYPE_STRING),
+                'fields': openapi.Schema(type=openapi.TYPE_STRING),
+                'expand': openapi.Schema(type=openapi.TYPE_STRING),
             },
-            required=['page', 'page_size']
+            required=['page_size']
         ),
         responses={status.HTTP_200_OK: AuthorSerializer()}
     )
@@ -164,9 +342,23 @@ class GetAuthorList(APIView):
 
         - Method: POST
         - Input: Pagination details (page, page_size)
+        - Input: Cursor details (page_size, cursor) --> Keyset pagination, send an empty
+          cursor for the first page and then the next_cursor/prev_cursor returned
+        - Input: Optional fields / expand (books), as for /api/authors/
         - Response:  List of all authors with details.
         - URL: /api/listing-all-authors/
         """
+        fieldset = FieldsetSerializer(data=request.data, context={'serializer_class': AuthorSerializer})
+        if not fieldset.is_valid():
+            return Response({
+                "status": 0,
+                "message": fieldset.errors}, status = status.HTTP_400_BAD_REQUEST
+            )
+        values = fieldset.values_serializer()
+
+        if 'cursor' in request.data:
+            return self.cursor_page(request.data, values)
+
         serializer = PaginationSerializer(data=request.data)
         if not serializer.is_valid():
             return Response({
@@ -180,9 +372,8 @@ class GetAuthorList(APIView):
         skip = (page - 1) * page_size
 
         # Retrieve paginated authors
-        authors = Author.objects.all()[skip: skip + page_size]
-        serializer = AuthorSerializer(authors, many=True)
-        total_records = Author.objects.all().count()
+        data = fragments.encode_rows(Author.objects.order_by('id')[skip: skip + page_size], values)
+        total_records = row_count(Author)
         num_pages = (total_records / page_size)
         num_pages = round_up(num_pages)
         return Response({
@@ -192,32 +383,151 @@ class GetAuthorList(APIView):
                 "total_records": total_records,
                 "total_pages":num_pages,
                 "current_page":page,
-                "current_page_size": len(serializer.data),
+                "current_page_size": len(data),
                 'next_page': None if (num_pages == page or total_records == 0) else (page+1),
                 'previous_page': (page-1),
             },
-            "data": serializer.data}, status = status.HTTP_200_OK
+            "data": data}, status = status.HTTP_200_OK
+        )
+
+    #Listing author details by cursor ---> Keyset pagination, cacheable GET form
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter('page_size', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, required=True),
+            openapi.Parameter('cursor', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+            openapi.Parameter('fields', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+            openapi.Parameter('expand', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=['books']),
+        ],
+        responses={status.HTTP_200_OK: AuthorSerializer()}
+    )
+    def get(self, request):
+        """
+        API endpoint for listing author details with keyset (cursor) pagination
+
+        - Method: GET
+        - Input: Cursor details (page_size, cursor) as query parameters
+        - Input: Optional fields / expand (books), as for /api/authors/
+        - Response:  One page of authors with next_cursor/prev_cursor.
+        - Sends ETag / Last-Modified from the collection version, 304 when unchanged
+        - URL: /api/listing-all-authors/?page_size=<int>&cursor=<str>
+        """
+
+        fieldset = FieldsetSerializer(data=request.query_params, context={'serializer_class': AuthorSerializer})
+        if not fieldset.is_valid():
+            return Response({
+                "status": 0,
+                "message": fieldset.errors}, status = status.HTTP_400_BAD_REQUEST
+            )
+        values = fieldset.values_serializer()
+
+        not_modified, etag = conditional.evaluate_collection(request, Author.objects.all(), values)
+        if not_modified:
+            return not_modified
+        response = self.cursor_page(request.query_params, values)
+        if response.status_code == status.HTTP_200_OK:
+            conditional.set_validators(response, etag)
+        return response
+
+    def cursor_page(self, params, values):
+        serializer = CursorPaginationSerializer(data=params)
+        if not serializer.is_valid():
+            return Response({
+                "status": 0,
+                "message": serializer.errors}, status = status.HTTP_400_BAD_REQUEST
+            )
+        page_size = serializer.validated_data.get('page_size')
+        cursor = serializer.validated_data.get('cursor')
+
+        # Seek from the cursor position instead of skipping rows
+        try:
+            data, paginator = cursor_paginate(Author.objects.all(), values, page_size, cursor)
+        except InvalidCursor as e:
+            return Response({
+                "status": 0,
+                "message": {"cursor": [str(e)]}}, status = status.HTTP_400_BAD_REQUEST
+            )
+        return Response({
+            "status":  1,
+            "message": "Author details retrieved successfully",
+            "paginator": paginator,
+            "data": data}, status = status.HTTP_200_OK
         )
 
 class BookListView(APIView):
+    renderer_classes = fragments.renderer_classes(NDJSONRenderer)
   
     #Listing all the books
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter('stream', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=['json', 'ndjson']),
+            openapi.Parameter('fields', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+            openapi.Parameter('expand', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=['author']),
+            openapi.Parameter('author', openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+            openapi.Parameter('min_price', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+            openapi.Parameter('max_price', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+            openapi.Parameter('published_from', openapi.IN_QUERY, type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE),
+            openapi.Parameter('published_to', openapi.IN_QUERY, type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE),
+            openapi.Parameter('title_prefix', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+            openapi.Parameter('ordering', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=ORDERINGS),
+            openapi.Parameter('ids', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+        ]
+    )
     def get(self, request):
         """
         API endpoint for listing all books.
 
         - Method: GET
         - Response: List of all books with details.
+        - Sends ETag / Last-Modified from the collection version, 304 when unchanged
+        - ?fields=id,name,... returns (and selects) only those fields, ?expand=author inlines
+          the author through a single join
+        - Filters: ?author=<id>, ?min_price= / ?max_price=, ?published_from= / ?published_to=
+          (YYYY-MM-DD), ?title_prefix=; ?ordering= on id, title, price, published_date,
+          author (id) or author_name, "-" for descending
+        - Streaming: ?stream=json (chunked JSON array) or ?stream=ndjson /
+          Accept: application/x-ndjson (envelope line, then one book per line)
+        - ?ids=1,2,3 (max 1000) returns those books in that order and the ids not found
+          under "missing", the other parameters aside; POST /api/books/batch/ for long lists
         - URL: /api/books/
         """
 
-        books = Book.objects.all()
-        serializer = BookSerializer(books, many=True)
-        return Response({
+        if 'ids' in request.query_params:
+            return batch_read(Book, BookSerializer, ids_param(request), "Book")
+
+        fieldset = FieldsetSerializer(data=request.query_params, context={'serializer_class': BookSerializer})
+        if not fieldset.is_valid():
+            return Response({
+                "status": 0,
+                "message": fieldset.errors}, status = status.HTTP_400_BAD_REQUEST
+            )
+        values = fieldset.values_serializer()
+        filters = BookFilterSerializer(data=request.query_params)
+        if not filters.is_valid():
+            return Response({
+                "status": 0,
+                "message": filters.errors}, status = status.HTTP_400_BAD_REQUEST
+            )
+
+        books = filters.filter_queryset(Book.objects.all())
+        not_modified, etag = conditional.evaluate_collection(request, books, values)
+        if not_modified:
+            return not_modified
+
+        books = books.order_by(*filters.order_by())
+        mode = stream_mode(request)
+        if mode:
+            response = streaming_response(
+                mode, books, values, "Book details retrieved successfully"
+            )
+            return conditional.set_validators(response, etag)
+
+        data = fragments.encode_rows(books, values)
+        response = Response({
             "status":  1,
             "message": "Book details retrieved successfully",
-            "data": serializer.data}, status = status.HTTP_200_OK
+            "data": data}, status = status.HTTP_200_OK
         )
+        return conditional.set_validators(response, etag)
 
     #Create a new book
     @swagger_auto_schema(
@@ -240,20 +550,27 @@ class BookListView(APIView):
         - Method: POST
         - Input: Book details (title, author, published_date, price)
         - Response: Details of the created book.
+        - Query budget: 6 (author_name, INSERT, row counter, book_count of the author, author
+          and year rollups); the author_name lookup also rejects an unknown author
         - URL: /api/books/
         """
 
-        serializer = BookSerializer(data=request.data)
-        if serializer.is_valid():
-            serializer.save()
+        serializer = BookWriteSerializer(data=request.data)
+        if not serializer.is_valid():
             return Response({
-                "status": 1,
-                "message": "New Book details created successfully",
-                "data": serializer.data}, status = status.HTTP_201_CREATED
+                "status": 0,
+                "message": serializer.errors}, status = status.HTTP_400_BAD_REQUEST
+            )
+        book, errors = writes.create(serializer)
+        if errors:
+            return Response({
+                "status": 0,
+                "message": errors}, status = status.HTTP_400_BAD_REQUEST
             )
         return Response({
-            "status": 0,
-            "message": serializer.errors}, status = status.HTTP_400_BAD_REQUEST
+            "status": 1,
+            "message": "New Book details created successfully",
+            "data": BookSerializer(book).data}, status = status.HTTP_201_CREATED
         )
 
 class BookDetailView(APIView):
@@ -271,16 +588,32 @@ class BookDetailView(APIView):
 
         - Method: GET
         - Response: Retrieve a single book with details.
+        - Sends ETag / Last-Modified, answers If-None-Match / If-Modified-Since with 304
         - URL: /api/books/<int:id>/
         """
 
-        book = self.get_object(id)
-        serializer = BookSerializer(book)
-        return Response({
+        data = cache.peek(Book, id)
+
+        # Revalidate against updated_at before serializing anything
+        if data is not None or conditional.has_revalidation(request):
+            updated_at = data["updated_at"] if data is not None else conditional.current_updated_at(Book, id)
+            not_modified = conditional.evaluate_row(request, Book, id, updated_at)
+            if not_modified:
+                return not_modified
+
+        if data is None:
+            generation = cache.generation(Book, id)
+            with routers.read_only(False):
+                instance = self.get_object(id)
+                with metrics.timed('serialize'):
+                    data = dict(BookSerializer(instance).data)
+            cache.store(Book, id, data, generation)
+        response = Response({
             "status": 1, 
             "message": "success", 
-            "data":serializer.data}, status = status.HTTP_200_OK
+            "data":data}, status = status.HTTP_200_OK
         )
+        return conditional.set_row_validators(response, Book, id, data["updated_at"])
 
     #Updating a book
     @swagger_auto_schema(
@@ -303,22 +636,74 @@ class BookDetailView(APIView):
         - Method: PUT
         - Input: Book details (title, author, published_date, price)
         - Response: Details of the updated book.
+        - Send If-Match with the ETag you read to get 412 instead of overwriting a newer change;
+          the write checks it again under the write lock, +1 query
+        - Query budget: 2 (SELECT, UPDATE of the changed columns only), 4 when the author,
+          date or price changes (author and year rollups), +3 when the author does
+          (author_name, which also rejects an unknown author, book_count of both authors);
+          1 when nothing changed
         - URL: /api/books/<int:id>/
         """
 
+        return self.update(request, id)
+
+    #Partially updating a book
+    @swagger_auto_schema(
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'title': openapi.Schema(type=openapi.TYPE_STRING),
+                'author': openapi.Schema(type=openapi.TYPE_INTEGER),
+                'published_date': openapi.Schema(type=openapi.TYPE_STRING),
+                'price': openapi.Schema(type=openapi.TYPE_STRING),
+            },
+        ),
+        responses={status.HTTP_200_OK: BookSerializer()}
+    )
+    def patch(self, request, id):
+        """
+        API endpoint for updating some fields of a book.
+
+        - Method: PATCH
+        - Input: Any of the book details (title, author, published_date, price)
+        - Response: Details of the updated book.
+        - Send If-Match with the ETag you read to get 412 instead of overwriting a newer change;
+          the write checks it again under the write lock, +1 query
+        - Query budget: as PUT
+        - URL: /api/books/<int:id>/
+        """
+
+        return self.update(request, id, partial=True)
+
+    def update(self, request, id, partial=False):
         book = self.get_object(id)
-        serializer = BookSerializer(book, data=request.data)
-        if serializer.is_valid():
-            serializer.save()
+
+        # If-Match / If-Unmodified-Since: reject lost updates with 412
+        precondition_failed = conditional.evaluate_row(request, Book, id, book.updated_at)
+        if precondition_failed:
+            return precondition_failed
+
+        serializer = BookWriteSerializer(book, data=request.data, partial=partial)
+        if not serializer.is_valid():
+            errors = serializer.errors
+        else:
+            # The check above is repeated by the write itself, under the write lock
+            unchanged_since = book.updated_at if conditional.has_precondition(request) else None
+            try:
+                errors = writes.update(serializer, book, unchanged_since)
+            except writes.PreconditionFailed:
+                return conditional.precondition_failed()
+        if errors:
             return Response({
-                "status": 1, 
-                "message": "Book details updated successfully", 
-                "data":serializer.data}, status = status.HTTP_200_OK
+                "status": 0,
+                "message": errors}, status = status.HTTP_400_BAD_REQUEST
             )
-        return Response({
-            "status": 0,
-            "message": serializer.errors}, status = status.HTTP_400_BAD_REQUEST
+        response = Response({
+            "status": 1, 
+            "message": "Book details updated successfully", 
+            "data": BookSerializer(book).data}, status = status.HTTP_200_OK
         )
+        return conditional.set_row_validators(response, Book, id, book.updated_at)
 
     #Deleting a book --> Hard delete
     def delete(self, request, id):
@@ -327,17 +712,20 @@ class BookDetailView(APIView):
 
         - Method: DELETE
         - Response: Deleting a book.
+        - Query budget: 6 (SELECT, DELETE, row counter, book_count of the author, author and
+          year rollups)
         - URL: /api/books/<int:id>/
         """
 
         book = self.get_object(id)
-        book.delete()
+        writes.delete(book)
         return Response({
             "status": 1, 
             "message": "Book details deleted successfully"}, status = status.HTTP_200_OK
         )
 
 class GetBookList(APIView):
+    renderer_classes = fragments.renderer_classes()
     
     #Listing all book details ---> Pagination Added
     @swagger_auto_schema(
@@ -346,8 +734,18 @@ class GetBookList(APIView):
             properties={
                 'page': openapi.Schema(type=openapi.TYPE_INTEGER),
                 'page_size': openapi.Schema(type=openapi.TYPE_INTEGER),
+                'cursor': openapi.Schema(type=openapi.TYPE_STRING),
+                'fields': openapi.Schema(type=openapi.TYPE_STRING),
+                'expand': openapi.Schema(type=openapi.TYPE_STRING),
+                'author': openapi.Schema(type=openapi.TYPE_INTEGER),
+                'min_price': openapi.Schema(type=openapi.TYPE_STRING),
+                'max_price': openapi.Schema(type=openapi.TYPE_STRING),
+                'published_from': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE),
+                'published_to': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE),
+                'title_prefix': openapi.Schema(type=openapi.TYPE_STRING),
+                'ordering': openapi.Schema(type=openapi.TYPE_STRING, enum=ORDERINGS),
             },
-            required=['page', 'page_size']
+            required=['page_size']
         ),
         responses={status.HTTP_200_OK: BookSerializer()}
     )
@@ -358,9 +756,29 @@ class GetBookList(APIView):
 
         - Method: POST
         - Input: Pagination details (page, page_size)
+        - Input: Cursor details (page_size, cursor) --> Keyset pagination, send an empty
+          cursor for the first page and then the next_cursor/prev_cursor returned
+        - Input: Optional fields / expand (author), filters and ordering, as for /api/books/
         - Response:  List of all book with details.
         - URL: /api/listing-all-books/
         """
+        fieldset = FieldsetSerializer(data=request.data, context={'serializer_class': BookSerializer})
+        if not fieldset.is_valid():
+            return Response({
+                "status": 0,
+                "message": fieldset.errors}, status = status.HTTP_400_BAD_REQUEST
+            )
+        values = fieldset.values_serializer()
+        filters = BookFilterSerializer(data=request.data)
+        if not filters.is_valid():
+            return Response({
+                "status": 0,
+                "message": filters.errors}, status = status.HTTP_400_BAD_REQUEST
+            )
+
+        if 'cursor' in request.data:
+            return self.cursor_page(request.data, values, filters)
+
         serializer = PaginationSerializer(data=request.data)
         if not serializer.is_valid():
             return Response({
@@ -374,9 +792,9 @@ class GetBookList(APIView):
         skip = (page - 1) * page_size
 
         # Retrieve paginated books
-        books = Book.objects.all()[skip: skip + page_size]
-        serializer = BookSerializer(books, many=True)
-        total_records = Book.objects.all().count()
+        books = filters.filter_queryset(Book.objects.all())
+        data = fragments.encode_rows(books.order_by(*filters.order_by())[skip: skip + page_size], values)
+        total_records = books.count() if filters.is_filtered else row_count(Book)
         num_pages = (total_records / page_size)
         num_pages = round_up(num_pages)
         return Response({
@@ -386,9 +804,601 @@ class GetBookList(APIView):
                 "total_records": total_records,
                 "total_pages":num_pages,
                 "current_page":page,
-                "current_page_size": len(serializer.data),
+                "current_page_size": len(data),
                 'next_page': None if (num_pages == page or total_records == 0) else (page+1),
                 'previous_page': (page-1),
             },
-            "data": serializer.data}, status = status.HTTP_200_OK
-        )
\ No newline at end of file
+            "data": data}, status = status.HTTP_200_OK
+        )
+
+    #Listing book details by cursor ---> Keyset pagination, cacheable GET form
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter('page_size', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, required=True),
+            openapi.Parameter('cursor', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+            openapi.Parameter('fields', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+            openapi.Parameter('expand', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=['author']),
+            openapi.Parameter('author', openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+            openapi.Parameter('min_price', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+            openapi.Parameter('max_price', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+            openapi.Parameter('published_from', openapi.IN_QUERY, type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE),
+            openapi.Parameter('published_to', openapi.IN_QUERY, type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE),
+            openapi.Parameter('title_prefix', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+            openapi.Parameter('ordering', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=ORDERINGS),
+        ],
+        responses={status.HTTP_200_OK: BookSerializer()}
+    )
+    def get(self, request):
+        """
+        API endpoint for listing book details with keyset (cursor) pagination
+
+        - Method: GET
+        - Input: Cursor details (page_size, cursor) as query parameters
+        - Input: Optional fields / expand (author), filters and ordering, as for /api/books/
+        - Response:  One page of books with next_cursor/prev_cursor.
+        - Sends ETag / Last-Modified from the collection version, 304 when unchanged
+        - URL: /api/listing-all-books/?page_size=<int>&cursor=<str>
+        """
+
+        fieldset = FieldsetSerializer(data=request.query_params, context={'serializer_class': BookSerializer})
+        if not fieldset.is_valid():
+            return Response({
+                "status": 0,
+                "message": fieldset.errors}, status = status.HTTP_400_BAD_REQUEST
+            )
+        values = fieldset.values_serializer()
+        filters = BookFilterSerializer(data=request.query_params)
+        if not filters.is_valid():
+            return Response({
+                "status": 0,
+                "message": filters.errors}, status = status.HTTP_400_BAD_REQUEST
+            )
+
+        books = filters.filter_queryset(Book.objects.all())
+        not_modified, etag = conditional.evaluate_collection(request, books, values)
+        if not_modified:
+            return not_modified
+        response = self.cursor_page(request.query_params, values, filters)
+        if response.status_code == status.HTTP_200_OK:
+            conditional.set_validators(response, etag)
+        return response
+
+    def cursor_page(self, params, values, filters):
+        serializer = CursorPaginationSerializer(data=params)
+        if not serializer.is_valid():
+            return Response({
+                "status": 0,
+                "message": serializer.errors}, status = status.HTTP_400_BAD_REQUEST
+            )
+        page_size = serializer.validated_data.get('page_size')
+        cursor = serializer.validated_data.get('cursor')
+
+        # Seek from the cursor position instead of skipping rows
+        try:
+            data, paginator = cursor_paginate(
+                filters.filter_queryset(Book.objects.all()), values, page_size, cursor,
+                ordering=filters.validated_data['ordering'],
+            )
+        except InvalidCursor as e:
+            return Response({
+                "status": 0,
+                "message": {"cursor": [str(e)]}}, status = status.HTTP_400_BAD_REQUEST
+            )
+        return Response({
+            "status":  1,
+            "message": "Book details retrieved successfully",
+            "paginator": paginator,
+            "data": data}, status = status.HTTP_200_OK
+        )
+
+class BulkWriteView(APIView):
+    """
+    Shared handlers of the batch endpoints, see books/bulk.py.
+    """
+
+    model = None
+    item_serializer_class = None
+    check = None
+    label = None
+
+    def bulk_response(self, result, message, success_status):
+        if result.failed == 0:
+            return Response({
+                "status": 1,
+                "message": message,
+                "data": result.items}, status = success_status
+            )
+        return Response({
+            "status": 0,
+            "message": f"{result.failed} of {len(result.items)} items failed",
+            "data": result.items}, status = status.HTTP_200_OK if result.succeeded else status.HTTP_400_BAD_REQUEST
+        )
+
+    def invalid_payload(self, message):
+        return Response({
+            "status": 0,
+            "message": message}, status = status.HTTP_400_BAD_REQUEST
+        )
+
+    #Creating many objects
+    @swagger_auto_schema(
+        request_body=openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_OBJECT))
+    )
+    def post(self, request):
+        """
+        API endpoint for creating objects in batches.
+
+        - Method: POST
+        - Input: List of objects, same fields as the single create endpoint
+        - Response: Per item status with the id created or the validation errors.
+        - More than BOOKS_JOBS['INLINE_MAX_ROWS'] items: 202 with a background job, whose
+          result holds the per item status
+        - Query budget: 1 (emails / authors checked for all items at once), then per batch
+          of BOOKS_BULK_BATCH_SIZE items 3 for authors (INSERT, row counter, rollup rows),
+          4 for books (INSERT, row counter, author and year rollups) +1 per distinct number of
+          books the authors get (book_count); author_name comes with the authors check
+        """
+
+        error = bulk.payload_error(request.data)
+        if error:
+            return self.invalid_payload(error)
+        if not jobs.inline(len(request.data)):
+            job = jobs.submit(
+                'bulk_create', len(request.data), jobs.bulk_write,
+                bulk.bulk_create, self.model, self.item_serializer_class, request.data, self.check,
+            )
+            return job_accepted(job, f"{self.label} creation started")
+        result = bulk.bulk_create(self.model, self.item_serializer_class, request.data, self.check)
+        return self.bulk_response(result, f"{self.label} details created successfully", status.HTTP_201_CREATED)
+
+    #Updating many objects
+    @swagger_auto_schema(
+        request_body=openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_OBJECT))
+    )
+    def put(self, request):
+        """
+        API endpoint for updating objects in batches.
+
+        - Method: PUT
+        - Input: List of objects with their id and the fields to change
+        - Response: Per item status with the id updated or the validation errors.
+        - More than BOOKS_JOBS['INLINE_MAX_ROWS'] items: 202 with a background job, whose
+          result holds the per item status
+        - Query budget: 1 (the rows, loaded at once; +1 to check the emails of authors or
+          the authors of books, which also gives author_name), then 1 UPDATE per batch of
+          BOOKS_BULK_BATCH_SIZE items, +2 rollups when the author, date or price of books
+          change, +1 per distinct change of book_count when the author does
+        """
+
+        error = bulk.payload_error(request.data)
+        if error:
+            return self.invalid_payload(error)
+        if not jobs.inline(len(request.data)):
+            job = jobs.submit(
+                'bulk_update', len(request.data), jobs.bulk_write,
+                bulk.bulk_update, self.model, self.item_serializer_class, request.data, self.check,
+            )
+            return job_accepted(job, f"{self.label} update started")
+        result = bulk.bulk_update(self.model, self.item_serializer_class, request.data, self.check)
+        return self.bulk_response(result, f"{self.label} details updated successfully", status.HTTP_200_OK)
+
+    #Deleting many objects --> Hard delete
+    @swagger_auto_schema(request_body=BulkDeleteSerializer())
+    def delete(self, request):
+        """
+        API endpoint for deleting objects in batches.
+
+        - Method: DELETE
+        - Input: {"ids": [...]}
+        - Response: Per id status, ids that do not exist are reported as errors.
+        - More than BOOKS_JOBS['INLINE_MAX_ROWS'] rows, cascades included: 202 with a
+          background job, whose result holds the per id status
+        - Query budget: 1 (the ids that exist), then 6 per batch of BOOKS_BULK_BATCH_SIZE
+          books (write lock, SELECT, DELETE, row counter, author and year rollups) +1 per
+          distinct number of books the authors lose (book_count); authors: 2 (their books
+          counted, the ids that exist), 8 per batch of their books (2 without books), then 6
+          per batch of authors
+        """
+
+        serializer = BulkDeleteSerializer(data=request.data)
+        if not serializer.is_valid():
+            return self.invalid_payload(serializer.errors)
+        ids = serializer.validated_data['ids']
+        error = bulk.payload_error(ids)
+        if error:
+            return self.invalid_payload({"ids": [error]})
+        rows = len(ids)
+        if self.model is Author:
+            rows += Book.objects.filter(author_id__in=ids).count()
+        if not jobs.inline(rows):
+            job = jobs.submit('bulk_delete', rows, jobs.bulk_write, bulk.bulk_delete, self.model, ids)
+            return job_accepted(job, f"{self.label} deletion started")
+        result = bulk.bulk_delete(self.model, ids)
+        return self.bulk_response(result, f"{self.label} details deleted successfully", status.HTTP_200_OK)
+
+class AuthorBulkView(BulkWriteView):
+    """
+    - URL: /api/authors/bulk/
+    """
+
+    model = Author
+    item_serializer_class = BulkAuthorSerializer
+    check = staticmethod(bulk.check_author_emails)
+    label = "Author"
+
+class BookBulkView(BulkWriteView):
+    """
+    - URL: /api/books/bulk/
+    """
+
+    model = Book
+    item_serializer_class = BulkBookSerializer
+    check = staticmethod(bulk.check_book_authors)
+    label = "Book"
+
+class BatchReadView(APIView):
+    """
+    Shared POST handler of the batch reads; subclasses set ``model``,
+    ``serializer_class`` and ``label``.
+    """
+
+    model = None
+    serializer_class = None
+    label = None
+
+    #Reading many rows by id
+    @swagger_auto_schema(
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'ids': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_INTEGER)),
+            },
+            required=['ids']
+        )
+    )
+    def post(self, request):
+        """
+        API endpoint for reading many rows by id with a single query.
+
+        - Method: POST
+        - Input: {"ids": [...]} (max 1000)
+        - Response: The rows in the requested order, and the ids not found under "missing".
+        - URL: /api/authors/batch/, /api/books/batch/
+        """
+
+        return batch_read(self.model, self.serializer_class, request.data, self.label)
+
+class AuthorBatchView(BatchReadView):
+    model = Author
+    serializer_class = AuthorSerializer
+    label = "Author"
+
+class BookBatchView(BatchReadView):
+    model = Book
+    serializer_class = BookSerializer
+    label = "Book"
+
+class JobDetailView(APIView):
+
+    #Status of a background job
+    def get(self, request, id):
+        """
+        API endpoint for the status of a background write (author delete, large bulk request).
+
+        - Method: GET
+        - Response: The job: kind, status (pending, running, succeeded, failed), total
+          and done rows, result once succeeded, error once failed.
+        - URL: /api/jobs/<int:id>/
+        """
+
+        try:
+            job = Job.objects.get(id=id)
+        except Job.DoesNotExist:
+            raise Http404
+        return Response({
+            "status": 1,
+            "message": "success",
+            "data": JobSerializer(job).data}, status = status.HTTP_200_OK
+        )
+
+class ChangesView(APIView):
+
+    #Changes to authors and books since a cursor
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter('since', openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+            openapi.Parameter('page_size', openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+        ]
+    )
+    def get(self, request):
+        """
+        API endpoint for the created, updated and deleted authors and books since a cursor.
+
+        - Method: GET
+        - Input: since (the next_cursor of the previous page, 0 at first), page_size (max 1000)
+        - Response: Changes oldest first, each with its cursor, type, id, action (created,
+          updated, deleted) and the row as it is now (null once deleted), and the next_cursor.
+          410 when the changes after since were compacted: resync from the lists and
+          continue from latest_cursor.
+        - URL: /api/changes/?since=<int>&page_size=<int>
+        """
+
+        serializer = ChangesQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response({
+                "status": 0,
+                "message": serializer.errors}, status = status.HTTP_400_BAD_REQUEST
+            )
+        using = router.db_for_read(Change) or DEFAULT_DB_ALIAS
+        if not changes.supported(connections[using]):
+            return Response({
+                "status": 0,
+                "message": "The change log needs SQLite triggers"}, status = status.HTTP_501_NOT_IMPLEMENTED
+            )
+        since = serializer.validated_data['since']
+        page_size = serializer.validated_data['page_size']
+        if since < changes.horizon(using):
+            return Response({
+                "status": 0,
+                "message": "Changes after this cursor were compacted, resync from the lists",
+                "latest_cursor": changes.latest(using)}, status = status.HTTP_410_GONE
+            )
+
+        entries = changes.since(since, page_size + 1, using)
+        has_more = len(entries) > page_size
+        entries = entries[:page_size]
+
+        # One query per kind for the current rows
+        rows = {}
+        for kind, model, serializer_class in (('book', Book, BookSerializer), ('author', Author, AuthorSerializer)):
+            ids = {entry.object_id for entry in entries if entry.kind == kind and entry.action != Change.DELETED}
+            if ids:
+                values = ValuesSerializer.for_serializer(serializer_class)
+                for item in values.serialize(model.objects.using(using).filter(id__in=ids)):
+                    rows[kind, item['id']] = item
+        data = [
+            {
+                "cursor": entry.id,
+                "type": entry.kind,
+                "id": entry.object_id,
+                "action": entry.action,
+                "changed_at": entry.changed_at,
+                "data": rows.get((entry.kind, entry.object_id)),
+            }
+            for entry in entries
+        ]
+        return Response({
+            "status": 1,
+            "message": "Changes retrieved successfully",
+            "paginator": {
+                "current_page_size": len(data),
+                "next_cursor": data[-1]["cursor"] if data else since,
+                "has_more": has_more,
+            },
+            "data": data}, status = status.HTTP_200_OK
+        )
+
+class CacheStatsView(APIView):
+
+    #Detail cache counters
+    def get(self, request):
+        """
+        API endpoint for the hit/miss counters of the author/book detail cache.
+
+        - Method: GET
+        - Response: Backend, number of entries, hits, misses and hit ratio, and the
+          same for the list row fragments under "fragments"
+        - URL: /api/cache/stats/
+        """
+
+        return Response({
+            "status": 1,
+            "message": "success",
+            "data": {
+                **cache.detail_cache().stats(),
+                "fragments": fragments.fragment_cache().stats(),
+            }}, status = status.HTTP_200_OK
+        )
+
+class SlowRequestsView(APIView):
+
+    #Slowest sampled requests
+    def get(self, request):
+        """
+        API endpoint for the slowest of the sampled requests, with their SQL.
+
+        - Method: GET
+        - Response: Path, method, route, status, durations and queries of each request, slowest first.
+        - Staff only unless BOOKS_METRICS['EXPOSE_SLOW_REQUESTS'] (default: DEBUG), 404 otherwise
+        - URL: /api/metrics/slow/
+        """
+
+        if not metrics.slow_requests_exposed(request.user):
+            raise Http404
+        return Response({
+            "status": 1,
+            "message": "success",
+            "data": metrics.slow_requests()}, status = status.HTTP_200_OK
+        )
+
+class CatalogStatsView(APIView):
+
+    #Catalog totals
+    def get(self, request):
+        """
+        API endpoint for the totals of the whole catalog, read from the statistics rollups.
+
+        - Method: GET
+        - Response: Number of books and authors, price min/max/avg.
+        - URL: /api/stats/
+        """
+
+        totals = stats.totals()
+        totals["author_count"] = row_count(Author)
+        return Response({
+            "status": 1,
+            "message": "success",
+            "data": CatalogStatsSerializer(totals).data}, status = status.HTTP_200_OK
+        )
+
+class YearStatsView(APIView):
+
+    #Books per publication year
+    def get(self, request):
+        """
+        API endpoint for the books-per-year histogram.
+
+        - Method: GET
+        - Response: Per publication year: number of books, price min/max/avg.
+        - URL: /api/stats/years/
+        """
+
+        years = YearStats.objects.filter(book_count__gt=0).order_by('year')
+        return Response({
+            "status": 1,
+            "message": "success",
+            "data": YearStatsSerializer(years, many=True).data}, status = status.HTTP_200_OK
+        )
+
+class AuthorStatsListView(APIView):
+
+    #Per-author statistics, paginated
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter('page', openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+            openapi.Parameter('page_size', openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+            openapi.Parameter('ordering', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=list(STATS_ORDERINGS)),
+        ]
+    )
+    def get(self, request):
+        """
+        API endpoint for the statistics of every author.
+
+        - Method: GET
+        - Input: page, page_size (max 1000), ordering (author, books, -books) as query parameters
+        - Response: Per author: number of books, price min/max/avg.
+        - URL: /api/stats/authors/?page=<int>&page_size=<int>&ordering=-books
+        """
+
+        serializer = StatsQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response({
+                "status": 0,
+                "message": serializer.errors}, status = status.HTTP_400_BAD_REQUEST
+            )
+        page = serializer.validated_data['page']
+        page_size = serializer.validated_data['page_size']
+        skip = (page - 1) * page_size
+
+        # Every author has a rollup row, so the author counter counts them
+        rows = AuthorStats.objects.order_by(*STATS_ORDERINGS[serializer.validated_data['ordering']])
+        data = AuthorStatsSerializer(rows[skip: skip + page_size], many=True).data
+        total_records = row_count(Author)
+        num_pages = round_up(total_records / page_size)
+        return Response({
+            "status": 1,
+            "message": "success",
+            "paginator": {
+                "total_records": total_records,
+                "total_pages": num_pages,
+                "current_page": page,
+                "current_page_size": len(data),
+                "next_page": None if (num_pages <= page or total_records == 0) else (page+1),
+                "previous_page": (page-1),
+            },
+            "data": data}, status = status.HTTP_200_OK
+        )
+
+class AuthorStatsDetailView(APIView):
+
+    #Statistics of a single author
+    def get(self, request, id):
+        """
+        API endpoint for the statistics of one author.
+
+        - Method: GET
+        - Response: Number of books, price min/max/avg of the author.
+        - URL: /api/stats/authors/<id>/
+        """
+
+        try:
+            author_stats = AuthorStats.objects.get(author_id=id)
+        except AuthorStats.DoesNotExist:
+            raise Http404
+        return Response({
+            "status": 1,
+            "message": "success",
+            "data": AuthorStatsSerializer(author_stats).data}, status = status.HTTP_200_OK
+        )
+
+class SearchView(APIView):
+
+    #Full-text search over books and authors
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter('q', openapi.IN_QUERY, type=openapi.TYPE_STRING, required=True),
+            openapi.Parameter('type', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=['all', 'books', 'authors']),
+            openapi.Parameter('page', openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+            openapi.Parameter('page_size', openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+        ]
+    )
+    def get(self, request):
+        """
+        API endpoint for searching book titles, author names and author bios.
+
+        - Method: GET
+        - Input: q (words to match, the last one as a prefix), type (all, books, authors),
+          page, page_size
+        - Response: Hits ranked by bm25, best first, each with its type, score and details.
+        - URL: /api/search/?q=<str>
+        """
+
+        serializer = SearchSerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response({
+                "status": 0,
+                "message": serializer.errors}, status = status.HTTP_400_BAD_REQUEST
+            )
+        using = router.db_for_read(Book) or DEFAULT_DB_ALIAS
+        if not search.supported(connections[using]):
+            return Response({
+                "status": 0,
+                "message": "Search needs the SQLite FTS5 index"}, status = status.HTTP_501_NOT_IMPLEMENTED
+            )
+        page = serializer.validated_data.get('page')
+        page_size = serializer.validated_data.get('page_size')
+        kinds = {'all': ('book', 'author'), 'books': ('book',), 'authors': ('author',)}[
+            serializer.validated_data.get('type')]
+
+        hits, total_records = [], 0
+        expression = search.match_expression(serializer.validated_data.get('q'))
+        if expression:
+            hits, total_records = search.search(expression, kinds, page_size, (page - 1) * page_size, using)
+
+        # One query per kind for the details of the hits on this page
+        details = {}
+        for kind, model, serializer_class in (('book', Book, BookSerializer), ('author', Author, AuthorSerializer)):
+            ids = [pk for hit_kind, pk, _ in hits if hit_kind == kind]
+            if ids:
+                values = ValuesSerializer.for_serializer(serializer_class)
+                for item in values.serialize(model.objects.filter(id__in=ids)):
+                    details[kind, item['id']] = item
+        data = [
+            {"type": kind, "score": score, "data": details[kind, pk]}
+            for kind, pk, score in hits if (kind, pk) in details
+        ]
+
+        num_pages = round_up(total_records / page_size)
+        return Response({
+            "status":  1,
+            "message": "Search results retrieved successfully",
+            "paginator":  {
+                "total_records": total_records,
+                "total_pages":num_pages,
+                "current_page":page,
+                "current_page_size": len(data),
+                'next_page': None if (num_pages <= page or total_records == 0) else (page+1),
+                'previous_page': (page-1),
+            },
+            "data": data}, status = status.HTTP_200_OK
+        )
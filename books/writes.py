@@ -0,0 +1,114 @@
+"""
+Single-row writes that leave the integrity checks to the database.
+
+AuthorSerializer and BookSerializer run a query per check before writing: a
+SELECT for the uniqueness of an author's email, a SELECT of a book's author.
+The write serializers (AuthorWriteSerializer, BookWriteSerializer) check the
+payload only, and ``create()`` / ``update()`` let the UNIQUE and FOREIGN KEY
+constraints reject the row. Their IntegrityError becomes the same error
+payload those SELECTs gave, so only a failing write pays for a lookup.
+A book's author is the exception: saving a book already looks it up to copy
+its name (books/denormalized.py), and that lookup raises the FOREIGN KEY
+IntegrityError itself, before anything is written.
+
+``update()`` writes the columns that changed, plus ``updated_at``, and
+nothing at all when none did. The row, its counters and its rollups (see
+books/signals.py) are written in one transaction. Given the ``updated_at``
+a request's If-Match / If-Unmodified-Since was checked against, that
+transaction starts with an UPDATE of the row WHERE it still has it, which
+takes the write lock: of two writers that passed the check with the same
+ETag, the second finds no row and gets PreconditionFailed.
+"""
+
+import re
+
+from django.db import IntegrityError, router, transaction
+from rest_framework.relations import PrimaryKeyRelatedField
+
+
+def create(serializer):
+    """
+    Insert the row of the valid write ``serializer``. Returns ``(instance,
+    errors)``, errors being None once saved.
+    """
+
+    instance = serializer.Meta.model(**serializer.validated_data)
+    return instance, _save(instance)
+
+
+class PreconditionFailed(Exception):
+    """
+    The row no longer has the ``updated_at`` the request's preconditions
+    were checked against.
+    """
+
+
+def update(serializer, instance, unchanged_since=None):
+    """
+    Write the changes the valid write ``serializer`` brings to ``instance``.
+    Returns the errors, None once saved. With ``unchanged_since``, raises
+    PreconditionFailed instead of writing when the row's ``updated_at`` is
+    no longer that.
+    """
+
+    changed = []
+    for name, value in serializer.validated_data.items():
+        if getattr(instance, name) != value:
+            setattr(instance, name, value)
+            changed.append(name)
+    if not changed:
+        return None
+    return _save(instance, update_fields=[*changed, 'updated_at'], unchanged_since=unchanged_since)
+
+
+def delete(instance):
+    """
+    Delete ``instance`` with its counters and rollups in one transaction.
+    """
+
+    with transaction.atomic(using=router.db_for_write(type(instance))):
+        instance.delete()
+
+
+def _save(instance, update_fields=None, unchanged_since=None):
+    model = type(instance)
+    try:
+        with transaction.atomic(using=router.db_for_write(model)):
+            if unchanged_since is not None:
+                claimed = model._base_manager.filter(pk=instance.pk, updated_at=unchanged_since).update(
+                    updated_at=unchanged_since,
+                )
+                if not claimed:
+                    raise PreconditionFailed
+            instance.save(update_fields=update_fields)
+    except IntegrityError as e:
+        errors = constraint_errors(instance, e)
+        if errors is None:
+            raise
+        return errors
+    return None
+
+
+def constraint_errors(instance, error):
+    """
+    The serializer error payload for the constraint ``instance`` failed with
+    ``error``, or None when it is not a UNIQUE / FOREIGN KEY one.
+    """
+
+    message = str(error)
+    meta = instance._meta
+    if 'UNIQUE' in message or 'duplicate key' in message:
+        for field in meta.concrete_fields:
+            if field.unique and not field.primary_key and re.search(rf'\b{field.column}\b', message):
+                return {field.name: [field.error_messages['unique'] % {
+                    'model_name': meta.verbose_name, 'field_label': field.verbose_name,
+                }]}
+    if 'FOREIGN KEY' in message or 'foreign key' in message:
+        # The message does not name the column: look for the missing row
+        for field in meta.concrete_fields:
+            value = getattr(instance, field.attname)
+            if field.many_to_one and not field.related_model._base_manager.filter(pk=value).exists():
+                return {field.name: [
+                    PrimaryKeyRelatedField.default_error_messages['does_not_exist'].format(pk_value=value)
+                ]}
+    return None